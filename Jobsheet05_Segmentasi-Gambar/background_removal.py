@@ -5,43 +5,37 @@
 # Press 'q' to quit
 # -----------------------------------------------------
 
-import os, cv2, numpy as np, requests
+import os, cv2, numpy as np
 import mediapipe as mp
 from mediapipe.tasks.python import vision
 
-MODEL_PATH = os.environ.get("MP_SEG_MODEL", "models/selfie_multiclass_256x256.tflite")
-MODEL_URL = "https://storage.googleapis.com/mediapipe-models/image_segmenter/selfie_multiclass_256x256/float32/latest/selfie_multiclass_256x256.tflite"
+from lowres_pipeline import to_mp_image_lowres, foreground_lowres, guided_upsample, composite
+import model_store
+
+MODEL_PATH = os.environ.get("MP_SEG_MODEL", "selfie_multiclass_256x256.tflite")
+MODEL_URL = "https://storage.googleapis.com/mediapipe-models/image_segmenter/selfie_multiclass_256x256/float32/1/selfie_multiclass_256x256.tflite"
+MODEL_SHA256 = os.environ.get("MP_SEG_MODEL_SHA256")
 
 def ensure_model(path=MODEL_PATH, url=MODEL_URL):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    if not os.path.exists(path):
-        print(f"[INFO] Downloading model to {path} ...")
-        r = requests.get(url, timeout=60)
-        r.raise_for_status()
-        with open(path, "wb") as f:
-            f.write(r.content)
-        print("[OK] Model downloaded.")
-    return path
+    # Resumable, SHA-256 checked download into the shared store (model_store.py).
+    return model_store.fetch(url, path, sha256=MODEL_SHA256)
 
 def build_segmenter(running_mode: vision.RunningMode):
     BaseOptions = mp.tasks.BaseOptions
     ImageSegmenter = mp.tasks.vision.ImageSegmenter
     ImageSegmenterOptions = mp.tasks.vision.ImageSegmenterOptions
     options = ImageSegmenterOptions(
-        base_options=BaseOptions(model_asset_path=ensure_model()),
+        base_options=BaseOptions(model_asset_buffer=model_store.load_buffer(ensure_model())),
         running_mode=running_mode,
         output_category_mask=True,
         output_confidence_masks=False
     )
     return ImageSegmenter.create_from_options(options)
 
-def to_mp_image_bgr(img_bgr):
-    return mp.Image(image_format=mp.ImageFormat.SRGB,
-                    data=cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB))
-
-def composite_foreground(img_bgr, mask_u8):
-    """Return binary mask where non-background = 255."""
-    return (mask_u8 > 0).astype(np.uint8) * 255
+def composite_foreground(img_bgr, mask_u8, small_bgr):
+    """Return soft alpha (float32, full-res) where non-background = 1.0."""
+    fg_small = foreground_lowres(mask_u8)      # stays at 256x256
+    return guided_upsample(fg_small, small_bgr, img_bgr.shape, guide_full_bgr=img_bgr)
 
 def main():
     cap = cv2.VideoCapture(2)   # <-- OBS virtual camera
@@ -62,13 +56,12 @@ def main():
             if black is None:
                 black = np.zeros_like(frame)
 
-            mp_img = to_mp_image_bgr(frame)
+            mp_img, small = to_mp_image_lowres(frame)
             res = seg.segment_for_video(mp_img, int(ts))
             mask = res.category_mask.numpy_view()
 
-            fg_mask = composite_foreground(frame, mask)
-            fg_mask_3 = cv2.merge([fg_mask, fg_mask, fg_mask])
-            out = np.where(fg_mask_3 > 0, frame, black)
+            alpha = composite_foreground(frame, mask, small)
+            out = composite(frame, black, alpha)
 
             cv2.imshow("Background Removal (OBS)", out)
             if cv2.waitKey(1) & 0xFF == ord('q'):
@@ -7,41 +7,34 @@
 # - Falls back to random image or generated text if not found
 # -----------------------------------------------------
 
-import os, cv2, random, numpy as np, requests
+import os, cv2, random, numpy as np
 import mediapipe as mp
 from mediapipe.tasks.python import vision
 
-MODEL_PATH = os.environ.get("MP_SEG_MODEL", "models/selfie_multiclass_256x256.tflite")
-MODEL_URL = "https://storage.googleapis.com/mediapipe-models/image_segmenter/selfie_multiclass_256x256/float32/latest/selfie_multiclass_256x256.tflite"
+from lowres_pipeline import to_mp_image_lowres, foreground_lowres, guided_upsample, composite
+import model_store
+
+MODEL_PATH = os.environ.get("MP_SEG_MODEL", "selfie_multiclass_256x256.tflite")
+MODEL_URL = "https://storage.googleapis.com/mediapipe-models/image_segmenter/selfie_multiclass_256x256/float32/1/selfie_multiclass_256x256.tflite"
+MODEL_SHA256 = os.environ.get("MP_SEG_MODEL_SHA256")
 VALID_EXTS = (".png", ".jpg", ".jpeg", ".webp", ".bmp")
 
 def ensure_model(path=MODEL_PATH, url=MODEL_URL):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    if not os.path.exists(path):
-        print(f"[INFO] Downloading model to {path} ...")
-        r = requests.get(url, timeout=60)
-        r.raise_for_status()
-        with open(path, "wb") as f:
-            f.write(r.content)
-        print("[OK] Model downloaded.")
-    return path
+    # Resumable, SHA-256 checked download into the shared store (model_store.py).
+    return model_store.fetch(url, path, sha256=MODEL_SHA256)
 
 def build_segmenter(running_mode: vision.RunningMode):
     BaseOptions = mp.tasks.BaseOptions
     ImageSegmenter = mp.tasks.vision.ImageSegmenter
     ImageSegmenterOptions = mp.tasks.vision.ImageSegmenterOptions
     options = ImageSegmenterOptions(
-        base_options=BaseOptions(model_asset_path=ensure_model()),
+        base_options=BaseOptions(model_asset_buffer=model_store.load_buffer(ensure_model())),
         running_mode=running_mode,
         output_category_mask=True,
         output_confidence_masks=False
     )
     return ImageSegmenter.create_from_options(options)
 
-def to_mp_image_bgr(img_bgr):
-    return mp.Image(image_format=mp.ImageFormat.SRGB,
-                    data=cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB))
-
 def load_background(folder_path="."):
     """Find 'background' image or random one, else generate fallback."""
     candidates = [f for f in os.listdir(folder_path)
@@ -76,10 +69,11 @@ def fit_background(bg_bgr, target_shape):
     th, tw = target_shape[:2]
     return cv2.resize(bg_bgr, (tw, th), interpolation=cv2.INTER_CUBIC)
 
-def replace_bg_frame(frame_bgr, mask_u8, bg_bgr):
-    fg_mask = (mask_u8 > 0).astype(np.uint8) * 255
-    fg_mask_3 = cv2.merge([fg_mask, fg_mask, fg_mask])
-    return np.where(fg_mask_3 > 0, frame_bgr, bg_bgr)
+def replace_bg_frame(frame_bgr, mask_u8, bg_bgr, small_bgr):
+    # Threshold at 256x256, upsample edge-aware only for the final blend.
+    fg_small = foreground_lowres(mask_u8)
+    alpha = guided_upsample(fg_small, small_bgr, frame_bgr.shape, guide_full_bgr=frame_bgr)
+    return composite(frame_bgr, bg_bgr, alpha)
 
 def main():
     cap = cv2.VideoCapture(2)  # OBS virtual camera
@@ -93,6 +87,7 @@ def main():
     fps = cap.get(cv2.CAP_PROP_FPS) or 30
     print("[INFO] Running Background Replace from OBS camera...")
 
+    fitted_bg = None
     with build_segmenter(vision.RunningMode.VIDEO) as seg:
         ts = 0
         while True:
@@ -100,10 +95,13 @@ def main():
             if not ret:
                 break
 
-            fitted_bg = fit_background(bg_bgr, frame.shape)
-            res = seg.segment_for_video(to_mp_image_bgr(frame), int(ts))
+            # Camera size is fixed, so fit the background only once.
+            if fitted_bg is None or fitted_bg.shape != frame.shape:
+                fitted_bg = fit_background(bg_bgr, frame.shape)
+            mp_img, small = to_mp_image_lowres(frame)
+            res = seg.segment_for_video(mp_img, int(ts))
             mask = res.category_mask.numpy_view()
-            comp = replace_bg_frame(frame, mask, fitted_bg)
+            comp = replace_bg_frame(frame, mask, fitted_bg, small)
 
             cv2.imshow("Background Replace (OBS)", comp)
             if cv2.waitKey(1) & 0xFF == ord('q'):
@@ -0,0 +1,362 @@
+# MediaPipe Image Segmenter demos (Python)
+# -----------------------------------------------------
+# Task 5: Batch segmentation over a folder of images and videos
+#
+# Walks INPUT_DIR recursively and runs 'selfie_multiclass_256x256' on every
+# image (IMAGE mode) and every video (VIDEO mode) using a pool of worker
+# processes. Each worker owns its own segmenter(s); jobs are handed out
+# through a bounded queue so the directory walk never runs far ahead.
+# Inside a worker, video frames are decoded and written by helper threads
+# connected through bounded queues, so disk I/O overlaps with inference.
+#
+# Output tree (mirrors the input tree):
+#   OUTPUT_DIR/masks/<rel>.png             category mask (class ids 0..5)
+#   OUTPUT_DIR/composites/<rel>.jpg        coloured overlay
+#   OUTPUT_DIR/masks/<rel>/000000.png      per-frame masks for a video
+#   OUTPUT_DIR/composites/<rel>.mp4        overlay video
+#   OUTPUT_DIR/done.txt                    finished inputs (for resume)
+#
+# With --mask-format rle, masks are stored run-length encoded instead
+# (see mask_codec.py): <rel>.rle.json per image, <rel>.rlem stream per video.
+#
+# Re-running the same command skips everything listed in done.txt, so an
+# interrupted overnight run continues where it stopped. A video that was
+# interrupted half-way is processed again from the start.
+#
+# Usage:
+#   python batch_segmentation.py INPUT_DIR OUTPUT_DIR [--workers 8] [--mask-format rle]
+#
+# © For educational use.
+
+import os, sys, json, time, queue, argparse, threading
+import multiprocessing
+import cv2
+import mediapipe as mp
+from mediapipe.tasks.python import vision
+
+from lowres_pipeline import to_mp_image_lowres
+from multiclass_render import build_lut, render_classes
+import mask_codec
+import model_store
+
+MODEL_PATH = os.environ.get("MP_SEG_MODEL", "selfie_multiclass_256x256.tflite")
+MODEL_URL = "https://storage.googleapis.com/mediapipe-models/image_segmenter/selfie_multiclass_256x256/float32/1/selfie_multiclass_256x256.tflite"
+MODEL_SHA256 = os.environ.get("MP_SEG_MODEL_SHA256")
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".webp", ".bmp")
+VIDEO_EXTS = (".mp4", ".avi", ".mov", ".mkv", ".webm")
+DONE_FILE = "done.txt"
+FRAME_QUEUE_SIZE = 16   # decoded / to-be-written frames buffered per worker
+
+def ensure_model(path=MODEL_PATH, url=MODEL_URL):
+    # Resumable, SHA-256 checked download into the shared store (model_store.py).
+    return model_store.fetch(url, path, sha256=MODEL_SHA256)
+
+def build_segmenter(running_mode: vision.RunningMode):
+    BaseOptions = mp.tasks.BaseOptions
+    ImageSegmenter = mp.tasks.vision.ImageSegmenter
+    ImageSegmenterOptions = mp.tasks.vision.ImageSegmenterOptions
+    options = ImageSegmenterOptions(
+        base_options=BaseOptions(model_asset_buffer=model_store.load_buffer(ensure_model())),
+        running_mode=running_mode,
+        output_category_mask=True,
+        output_confidence_masks=False
+    )
+    return ImageSegmenter.create_from_options(options)
+
+# ==========================
+# FILE HELPERS
+# ==========================
+def iter_inputs(input_dir, skip_dir=None):
+    """Yield (kind, relative_path) for every image/video under input_dir, sorted."""
+    skip = os.path.abspath(skip_dir) if skip_dir else None
+    for root, dirs, files in os.walk(input_dir):
+        # Never walk into the output tree if it lives inside the input tree.
+        dirs[:] = sorted(d for d in dirs if os.path.abspath(os.path.join(root, d)) != skip)
+        for name in sorted(files):
+            ext = os.path.splitext(name)[1].lower()
+            if ext in IMAGE_EXTS:
+                kind = "image"
+            elif ext in VIDEO_EXTS:
+                kind = "video"
+            else:
+                continue
+            yield kind, os.path.relpath(os.path.join(root, name), input_dir)
+
+def load_done(output_dir):
+    path = os.path.join(output_dir, DONE_FILE)
+    if not os.path.exists(path):
+        return set()
+    with open(path, "r", encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+def atomic_imwrite(path, img):
+    """Write via temp file + rename so a crash never leaves a truncated output."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    ext = os.path.splitext(path)[1]
+    ok, buf = cv2.imencode(ext, img)
+    if not ok:
+        raise RuntimeError(f"Encoding failed: {path}")
+    tmp = path + ".part"
+    with open(tmp, "wb") as f:
+        f.write(buf.tobytes())
+    os.replace(tmp, path)
+
+def atomic_write_json(path, obj):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".part"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+def out_paths(output_dir, rel):
+    stem = os.path.splitext(rel)[0]
+    return (os.path.join(output_dir, "masks", stem),
+            os.path.join(output_dir, "composites", stem))
+
+# ==========================
+# SEGMENTATION
+# ==========================
+def segment_full_res(seg, frame, ts=None):
+    """Infer at model resolution, return a category mask at frame resolution."""
+    mp_img, _ = to_mp_image_lowres(frame)
+    if ts is None:
+        res = seg.segment(mp_img)
+    else:
+        res = seg.segment_for_video(mp_img, ts)
+    mask_small = res.category_mask.numpy_view()
+    h, w = frame.shape[:2]
+    return cv2.resize(mask_small, (w, h), interpolation=cv2.INTER_NEAREST)
+
+def process_image(seg, lut, input_dir, output_dir, rel, mask_format="png"):
+    frame = cv2.imread(os.path.join(input_dir, rel), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise RuntimeError("cannot decode image")
+    mask = segment_full_res(seg, frame)
+    vis, _, _ = render_classes(frame, mask, lut)
+    mask_base, comp_base = out_paths(output_dir, rel)
+    if mask_format == "rle":
+        atomic_write_json(mask_base + ".rle.json", mask_codec.encode_multiclass(mask))
+    else:
+        atomic_imwrite(mask_base + ".png", mask)
+    atomic_imwrite(comp_base + ".jpg", vis)
+    return 1
+
+def _read_frames(cap, frames_q, stop):
+    """Decoder thread: push frames into a bounded queue, None at the end."""
+    try:
+        while not stop.is_set():
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames_q.put(frame)
+    finally:
+        frames_q.put(None)
+
+def _write_frames(writer, mask_dir, stream, out_q, stop, errors):
+    """
+    Encoder thread: write (index, mask, vis) items until None arrives.
+    A failure is kept in `errors` and sets `stop`; later items are still
+    taken off the queue (and dropped) so the producer never blocks on it.
+    """
+    while True:
+        item = out_q.get()
+        if item is None:
+            break
+        if errors:
+            continue
+        idx, mask, vis = item
+        try:
+            if stream is not None:
+                stream.append(idx, mask, multiclass=True)
+            else:
+                atomic_imwrite(os.path.join(mask_dir, f"{idx:06d}.png"), mask)
+            writer.write(vis)
+        except Exception as exc:
+            errors.append(exc)
+            stop.set()
+
+def process_video(seg, lut, input_dir, output_dir, rel, ts_offset, mask_format="png"):
+    """Returns (frames_done, next_ts_offset). Timestamps stay monotonic per segmenter."""
+    cap = cv2.VideoCapture(os.path.join(input_dir, rel))
+    if not cap.isOpened():
+        raise RuntimeError("cannot open video")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    mask_dir, comp_base = out_paths(output_dir, rel)
+    os.makedirs(os.path.dirname(comp_base), exist_ok=True)
+    stream = None
+    if mask_format == "rle":
+        os.makedirs(os.path.dirname(mask_dir), exist_ok=True)
+        stream_path = mask_dir + ".rlem"
+        if os.path.exists(stream_path):
+            os.remove(stream_path)   # half-finished run: start the stream again
+        stream = mask_codec.MaskStreamWriter(stream_path)
+    else:
+        os.makedirs(mask_dir, exist_ok=True)
+    comp_tmp = comp_base + ".part.mp4"
+    writer = cv2.VideoWriter(comp_tmp, cv2.VideoWriter_fourcc(*"mp4v"), fps, (w, h))
+
+    frames_q = queue.Queue(maxsize=FRAME_QUEUE_SIZE)
+    out_q = queue.Queue(maxsize=FRAME_QUEUE_SIZE)
+    stop = threading.Event()
+    save_errors = []
+    reader = threading.Thread(target=_read_frames, args=(cap, frames_q, stop), daemon=True)
+    saver = threading.Thread(target=_write_frames, args=(writer, mask_dir, stream, out_q, stop, save_errors),
+                             daemon=True)
+    reader.start()
+    saver.start()
+
+    step = max(1, int(1000 / fps))
+    ts = ts_offset
+    idx = 0
+    finished = False
+    try:
+        while True:
+            frame = frames_q.get()
+            if frame is None or save_errors:
+                break
+            mask = segment_full_res(seg, frame, ts)
+            vis, _, _ = render_classes(frame, mask, lut)
+            out_q.put((idx, mask, vis))
+            idx += 1
+            ts += step
+        finished = not save_errors
+    finally:
+        stop.set()
+        # Drain so the reader can always deliver its final None.
+        while reader.is_alive():
+            try:
+                frames_q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        out_q.put(None)
+        saver.join()
+        writer.release()
+        if stream is not None:
+            stream.close()
+        cap.release()
+        if not finished and os.path.exists(comp_tmp):
+            os.remove(comp_tmp)   # released above: no half-written composite left behind
+
+    if save_errors:
+        raise RuntimeError(f"writing frames failed: {save_errors[0]}") from save_errors[0]
+    os.replace(comp_tmp, comp_base + ".mp4")
+    return idx, ts + step
+
+def worker_main(input_dir, output_dir, mask_format, jobs_q, results_q):
+    """One process: owns one IMAGE and one VIDEO segmenter, created lazily."""
+    lut = build_lut()
+    image_seg = None
+    video_seg = None
+    ts_offset = 0
+    try:
+        while True:
+            job = jobs_q.get()
+            if job is None:
+                break
+            kind, rel = job
+            t0 = time.perf_counter()
+            try:
+                if kind == "image":
+                    if image_seg is None:
+                        image_seg = build_segmenter(vision.RunningMode.IMAGE)
+                    n = process_image(image_seg, lut, input_dir, output_dir, rel, mask_format)
+                else:
+                    if video_seg is None:
+                        video_seg = build_segmenter(vision.RunningMode.VIDEO)
+                    n, ts_offset = process_video(video_seg, lut, input_dir, output_dir, rel,
+                                                 ts_offset, mask_format)
+                results_q.put((rel, True, n, time.perf_counter() - t0, ""))
+            except Exception as exc:  # keep the worker alive for the next job
+                if kind == "video" and video_seg is not None:
+                    # The segmenter already saw timestamps past ts_offset: start a
+                    # fresh one so the next video's timestamps are monotonic again.
+                    video_seg.close()
+                    video_seg = None
+                    ts_offset = 0
+                results_q.put((rel, False, 0, time.perf_counter() - t0, str(exc)))
+    finally:
+        if image_seg is not None:
+            image_seg.close()
+        if video_seg is not None:
+            video_seg.close()
+
+# ==========================
+# MAIN
+# ==========================
+def run(input_dir, output_dir, workers, queue_size, mask_format="png"):
+    os.makedirs(output_dir, exist_ok=True)
+    ensure_model()   # download once, before the workers start
+    done = load_done(output_dir)
+    pending = [(k, r) for k, r in iter_inputs(input_dir, output_dir) if r not in done]
+    print(f"[INFO] {len(pending)} file(s) to process, {len(done)} already done, {workers} worker(s).")
+    if not pending:
+        return
+
+    ctx = multiprocessing.get_context("spawn")   # MediaPipe is not fork-safe
+    jobs_q = ctx.Queue(maxsize=queue_size)
+    results_q = ctx.Queue()
+    procs = [ctx.Process(target=worker_main, args=(input_dir, output_dir, mask_format, jobs_q, results_q))
+             for _ in range(workers)]
+    for p in procs:
+        p.start()
+
+    def feed():
+        for job in pending:
+            jobs_q.put(job)       # blocks while the queue is full
+        for _ in procs:
+            jobs_q.put(None)
+    feeder = threading.Thread(target=feed, daemon=True)
+    feeder.start()
+
+    t_start = time.perf_counter()
+    frames = failed = 0
+    with open(os.path.join(output_dir, DONE_FILE), "a", encoding="utf-8") as done_f:
+        for i in range(len(pending)):
+            while True:
+                try:
+                    rel, ok, n, dt, err = results_q.get(timeout=1.0)
+                    break
+                except queue.Empty:
+                    if not any(p.is_alive() for p in procs):
+                        print("[ERROR] All workers exited early; re-run to resume.")
+                        return
+            if ok:
+                done_f.write(rel + "\n")
+                done_f.flush()
+                frames += n
+            else:
+                failed += 1
+                print(f"[WARN] {rel}: {err}")
+            elapsed = time.perf_counter() - t_start
+            print(f"[{i + 1}/{len(pending)}] {rel} ({n} frame(s), {dt:.2f}s) "
+                  f"- {frames / max(elapsed, 1e-6):.1f} frames/s")
+
+    feeder.join()
+    for p in procs:
+        p.join()
+    print(f"[OK] {frames} frame(s) in {time.perf_counter() - t_start:.1f}s, {failed} failed.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch selfie_multiclass segmentation")
+    parser.add_argument("input_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--queue-size", type=int, default=0,
+                        help="max pending jobs (default: 2 x workers)")
+    parser.add_argument("--mask-format", choices=("png", "rle"), default="png",
+                        help="store masks as PNG files or run-length encoded")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.input_dir):
+        print(f"[ERROR] Input folder not found: {args.input_dir}")
+        sys.exit(1)
+    workers = max(1, args.workers)
+    run(args.input_dir, args.output_dir, workers, args.queue_size or 2 * workers,
+        args.mask_format)
+
+if __name__ == "__main__":
+    main()
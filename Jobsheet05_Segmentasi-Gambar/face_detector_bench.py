@@ -0,0 +1,160 @@
+# Face detector benchmark for SAM2 prompt generation (Python)
+# -----------------------------------------------------
+# Runs every backend from face_detectors.py over a folder of frames and
+# reports, per detector:
+#   - latency per detect() call (mean / p50 / p95, after a warm-up) and the
+#     amortised cost per frame when detection only runs every DETECT_EVERY
+#     frames (sam2.py tracks the box in between)
+#   - detection rate
+#   - prompt quality against a reference detector: IoU of the face boxes
+#     and distance between the forehead prompt points, as a fraction of
+#     the reference face width
+# Detectors whose p50 exceeds --budget-ms (what one SAM2 call costs on this
+# machine) are flagged: the prompt step should stay well below it.
+#
+# Usage:
+#   python face_detector_bench.py FRAMES_DIR [--detectors mediapipe,yunet,haar,mtcnn]
+#       [--reference mtcnn] [--scale 0.5] [--detect-every 5] [--budget-ms 300]
+#       [--output bench.json]
+#
+# © For educational use.
+
+import os, sys, json, time, argparse
+import cv2
+import numpy as np
+
+import face_detectors
+from head_roi import forehead_point
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".webp", ".bmp")
+
+
+def load_frames(folder, max_frames=0):
+    names = sorted(n for n in os.listdir(folder) if n.lower().endswith(IMAGE_EXTS))
+    if max_frames:
+        names = names[:max_frames]
+    frames = []
+    for name in names:
+        img = cv2.imread(os.path.join(folder, name), cv2.IMREAD_COLOR)
+        if img is not None:
+            frames.append((name, img))
+    return frames
+
+
+def box_iou(a, b):
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def run_detector(det, frames, warmup):
+    """Boxes per frame and per-call latencies in ms."""
+    for _, img in frames[:warmup]:
+        det.detect(img)
+    boxes, times = [], []
+    for _, img in frames:
+        t0 = time.perf_counter()
+        boxes.append(det.detect(img))
+        times.append((time.perf_counter() - t0) * 1000.0)
+    return boxes, times
+
+
+def prompt_quality(boxes, ref_boxes):
+    """Mean box IoU and prompt-point error (fraction of face width) where both found a face."""
+    ious, errs = [], []
+    for box, ref in zip(boxes, ref_boxes):
+        if box is None or ref is None:
+            continue
+        ious.append(box_iou(box, ref))
+        p, q = forehead_point(box), forehead_point(ref)
+        errs.append(float(np.hypot(p[0] - q[0], p[1] - q[1])) / max(1.0, ref[2] - ref[0]))
+    if not ious:
+        return None, None
+    return float(np.mean(ious)), float(np.mean(errs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark face detectors for SAM2 prompts")
+    parser.add_argument("frames_dir")
+    parser.add_argument("--detectors", default=",".join(face_detectors.DETECTORS),
+                        help="comma-separated list (default: all)")
+    parser.add_argument("--reference", default="mtcnn",
+                        help="detector whose boxes count as ground truth for prompt quality")
+    parser.add_argument("--scale", type=float, default=0.5, help="downscale before detection (as sam2.py)")
+    parser.add_argument("--detect-every", type=int, default=5, help="for the amortised cost column")
+    parser.add_argument("--budget-ms", type=float, default=300.0, help="SAM2 cost per frame to compare against")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--max-frames", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.frames_dir):
+        print(f"[ERROR] Frames folder not found: {args.frames_dir}")
+        sys.exit(1)
+    frames = load_frames(args.frames_dir, args.max_frames)
+    if not frames:
+        print(f"[ERROR] No images in {args.frames_dir}")
+        sys.exit(1)
+    print(f"[INFO] {len(frames)} frame(s) from {args.frames_dir}")
+
+    names = [n.strip() for n in args.detectors.split(",") if n.strip()]
+    if args.reference not in names:
+        names.append(args.reference)
+    runs = {}
+    for name in names:
+        try:
+            det = face_detectors.create(name, scale=args.scale)
+        except Exception as exc:   # missing optional dependency or model
+            print(f"[WARN] {name}: unavailable ({exc})")
+            continue
+        print(f"[INFO] Running {name}...")
+        try:
+            runs[name] = run_detector(det, frames, args.warmup)
+        finally:
+            det.close()
+
+    if not runs:
+        print("[ERROR] No detector could be loaded")
+        sys.exit(1)
+    ref_boxes = runs.get(args.reference, (None,))[0]
+    if ref_boxes is None:
+        print(f"[WARN] Reference '{args.reference}' unavailable: prompt quality not computed")
+
+    results = {}
+    for name, (boxes, times) in runs.items():
+        t = np.asarray(times)
+        iou = err = None
+        if ref_boxes is not None and name != args.reference:
+            iou, err = prompt_quality(boxes, ref_boxes)
+        results[name] = {
+            "mean_ms": float(t.mean()),
+            "p50_ms": float(np.percentile(t, 50)),
+            "p95_ms": float(np.percentile(t, 95)),
+            "amortised_ms": float(t.mean()) / max(1, args.detect_every),
+            "detection_rate": sum(b is not None for b in boxes) / len(boxes),
+            "iou_vs_reference": iou,
+            "prompt_error_vs_reference": err,
+            "over_budget": bool(np.percentile(t, 50) > args.budget_ms),
+        }
+
+    fmt = lambda v, spec: "-" if v is None else format(v, spec)
+    print(f"\n{'detector':<10} {'mean':>8} {'p50':>8} {'p95':>8} {'amort.':>8} {'found':>6} {'IoU':>6} {'err':>6}")
+    for name, r in sorted(results.items(), key=lambda kv: kv[1]["p50_ms"]):
+        flag = "  > budget" if r["over_budget"] else ""
+        print(f"{name:<10} {r['mean_ms']:8.1f} {r['p50_ms']:8.1f} {r['p95_ms']:8.1f} {r['amortised_ms']:8.1f} "
+              f"{r['detection_rate']:6.0%} {fmt(r['iou_vs_reference'], '6.2f'):>6} "
+              f"{fmt(r['prompt_error_vs_reference'], '6.2f'):>6}{flag}")
+    print(f"(ms per detect(); amortised = mean / {args.detect_every}; IoU and err vs '{args.reference}', "
+          f"err = prompt distance / face width)")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"frames": len(frames), "reference": args.reference, "scale": args.scale,
+                       "budget_ms": args.budget_ms, "results": results}, f, indent=2)
+        print(f"[OK] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# Face detectors for SAM2 prompt generation (Python)
+# -----------------------------------------------------
+# sam2.py only needs one face box per frame to place a prompt point above
+# the forehead, so the detector should cost far less than the SAM2 call it
+# feeds. All backends share one interface:
+#
+#   det = face_detectors.create("mediapipe")     # or yunet / haar / mtcnn
+#   box = det.detect(frame_bgr)                  # (x1, y1, x2, y2) or None
+#   det.close()
+#
+# - mediapipe: BlazeFace short-range (MediaPipe Tasks FaceDetector), the
+#   cheapest on CPU and already a project dependency
+# - yunet: OpenCV's FaceDetectorYN (small ONNX CNN, opencv-python >= 4.8)
+# - haar: OpenCV Haar cascade shipped with opencv-python (no download,
+#   frontal faces only, more false positives)
+# - mtcnn: facenet-pytorch MTCNN cascade in torch (the old default)
+#
+# Every detector runs on the frame downscaled by `scale` and returns the
+# largest (for MediaPipe/YuNet/MTCNN: most confident) face in frame pixels.
+# Model files come from the shared store (model_store.py).
+# face_detector_bench.py compares them on a folder of frames.
+#
+# © For educational use.
+
+import os
+import cv2
+import numpy as np
+
+import model_store
+
+BLAZEFACE_PATH = os.environ.get("MP_FACE_MODEL", "blaze_face_short_range.tflite")
+BLAZEFACE_URL = "https://storage.googleapis.com/mediapipe-models/face_detector/blaze_face_short_range/float16/1/blaze_face_short_range.tflite"
+YUNET_PATH = os.environ.get("YUNET_MODEL", "face_detection_yunet_2023mar.onnx")
+YUNET_URL = "https://github.com/opencv/opencv_zoo/raw/main/models/face_detection_yunet/face_detection_yunet_2023mar.onnx"
+HAAR_FILE = "haarcascade_frontalface_default.xml"
+MIN_SCORE = 0.5
+
+
+class FaceDetector:
+    """Base class: downscale, run `_detect_small`, map the box back."""
+
+    name = "base"
+
+    def __init__(self, scale=0.5, min_score=MIN_SCORE):
+        self.scale = scale
+        self.min_score = min_score
+
+    def _detect_small(self, img_bgr):
+        """Best face (x1, y1, x2, y2) in `img_bgr` pixels, or None."""
+        raise NotImplementedError
+
+    def detect(self, frame_bgr):
+        small = frame_bgr
+        if self.scale != 1.0:
+            small = cv2.resize(frame_bgr, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        box = self._detect_small(small)
+        if box is None:
+            return None
+        return tuple(float(v) / self.scale for v in box)
+
+    def close(self):
+        pass
+
+
+class MediaPipeFaceDetector(FaceDetector):
+    name = "mediapipe"
+
+    def __init__(self, scale=0.5, min_score=MIN_SCORE):
+        super().__init__(scale, min_score)
+        import mediapipe as mp   # optional dependency, only for this backend
+        self._mp = mp
+        options = mp.tasks.vision.FaceDetectorOptions(
+            base_options=mp.tasks.BaseOptions(model_asset_buffer=model_store.load_buffer(
+                model_store.fetch(BLAZEFACE_URL, BLAZEFACE_PATH))),
+            running_mode=mp.tasks.vision.RunningMode.IMAGE,
+            min_detection_confidence=min_score,
+        )
+        self._detector = mp.tasks.vision.FaceDetector.create_from_options(options)
+
+    def _detect_small(self, img_bgr):
+        rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
+        result = self._detector.detect(self._mp.Image(image_format=self._mp.ImageFormat.SRGB, data=rgb))
+        if not result.detections:
+            return None
+        best = max(result.detections, key=lambda d: d.categories[0].score)
+        b = best.bounding_box
+        return b.origin_x, b.origin_y, b.origin_x + b.width, b.origin_y + b.height
+
+    def close(self):
+        self._detector.close()
+
+
+class YuNetFaceDetector(FaceDetector):
+    name = "yunet"
+
+    def __init__(self, scale=0.5, min_score=MIN_SCORE):
+        super().__init__(scale, min_score)
+        if not hasattr(cv2, "FaceDetectorYN"):
+            raise RuntimeError("YuNet needs opencv-python >= 4.8 (cv2.FaceDetectorYN)")
+        self._detector = cv2.FaceDetectorYN.create(
+            model_store.fetch(YUNET_URL, YUNET_PATH), "", (320, 320), min_score
+        )
+        self._size = (320, 320)
+
+    def _detect_small(self, img_bgr):
+        h, w = img_bgr.shape[:2]
+        if (w, h) != self._size:
+            self._detector.setInputSize((w, h))
+            self._size = (w, h)
+        _, faces = self._detector.detect(img_bgr)
+        if faces is None or len(faces) == 0:
+            return None
+        x, y, fw, fh = faces[int(np.argmax(faces[:, -1])), :4]
+        return x, y, x + fw, y + fh
+
+
+class HaarFaceDetector(FaceDetector):
+    name = "haar"
+
+    def __init__(self, scale=0.5, min_score=MIN_SCORE):
+        super().__init__(scale, min_score)
+        self._cascade = cv2.CascadeClassifier(os.path.join(cv2.data.haarcascades, HAAR_FILE))
+        if self._cascade.empty():
+            raise RuntimeError(f"Could not load {HAAR_FILE} from {cv2.data.haarcascades}")
+
+    def _detect_small(self, img_bgr):
+        gray = cv2.equalizeHist(cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY))
+        faces = self._cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(24, 24))
+        if len(faces) == 0:
+            return None
+        x, y, fw, fh = max(faces, key=lambda f: f[2] * f[3])
+        return x, y, x + fw, y + fh
+
+
+class MTCNNFaceDetector(FaceDetector):
+    name = "mtcnn"
+
+    def __init__(self, scale=0.5, min_score=MIN_SCORE, device="cpu"):
+        super().__init__(scale, min_score)
+        from facenet_pytorch import MTCNN   # optional dependency, only for this backend
+        self._mtcnn = MTCNN(keep_all=False, device=device)
+
+    def _detect_small(self, img_bgr):
+        boxes, probs = self._mtcnn.detect(cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB))  # MTCNN expects RGB
+        if boxes is None or probs[0] is None or probs[0] < self.min_score:
+            return None
+        return tuple(boxes[0])
+
+
+DETECTORS = {
+    cls.name: cls for cls in (MediaPipeFaceDetector, YuNetFaceDetector, HaarFaceDetector, MTCNNFaceDetector)
+}
+
+
+def create(name, **kwargs):
+    """Detector by name: mediapipe | yunet | haar | mtcnn."""
+    try:
+        cls = DETECTORS[name.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown face detector '{name}'; use one of {', '.join(DETECTORS)}") from None
+    return cls(**kwargs)
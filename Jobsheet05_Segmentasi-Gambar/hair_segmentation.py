@@ -5,7 +5,7 @@
 # 0=background, 1=hair, 2=body-skin, 3=face-skin, 4=clothes, 5=others.
 #
 # Model (auto-download on first run):
-#   https://storage.googleapis.com/mediapipe-models/image_segmenter/selfie_multiclass_256x256/float32/latest/selfie_multiclass_256x256.tflite
+#   https://storage.googleapis.com/mediapipe-models/image_segmenter/selfie_multiclass_256x256/float32/1/selfie_multiclass_256x256.tflite
 #
 # Install dependencies:
 #   pip install mediapipe opencv-python numpy requests
@@ -13,41 +13,43 @@
 # Notes:
 # - This version automatically opens VideoCapture(2) → OBS virtual camera.
 # - Press 'q' to quit the window.
+# - Press '1'..'5' to toggle a class on/off, 'a' to show all classes.
 #
 # © For educational use.
 
 # Task 2: Hair segmentation (or any class segmentation)
 # -----------------------------------------------------
-# Uses the multiclass selfie model and selects CLASS_ID (default = 1).
+# Uses the multiclass selfie model. All classes in SHOW_CLASSES are coloured
+# in one pass via multiclass_render (palette LUT, bbox-only blend), so the
+# cost per frame does not depend on how many classes are shown.
 
-import os, cv2, numpy as np, requests
+import os, cv2, numpy as np
 import mediapipe as mp
 from mediapipe.tasks.python import vision
 
-MODEL_PATH = os.environ.get("MP_SEG_MODEL", "models/selfie_multiclass_256x256.tflite")
-MODEL_URL = "https://storage.googleapis.com/mediapipe-models/image_segmenter/selfie_multiclass_256x256/float32/latest/selfie_multiclass_256x256.tflite"
+from multiclass_render import build_lut, render_classes, draw_area_legend
+import model_store
+
+MODEL_PATH = os.environ.get("MP_SEG_MODEL", "selfie_multiclass_256x256.tflite")
+MODEL_URL = "https://storage.googleapis.com/mediapipe-models/image_segmenter/selfie_multiclass_256x256/float32/1/selfie_multiclass_256x256.tflite"
+MODEL_SHA256 = os.environ.get("MP_SEG_MODEL_SHA256")
 
 # === Change this ID if you want other segmentation parts ===
 # 1 = Hair, 2 = Body-skin, 3 = Face-skin, 4 = Clothes, 5 = Others
 CLASS_ID = 3
+# Classes rendered at start-up (None = all non-background classes)
+SHOW_CLASSES = None
 
 def ensure_model(path=MODEL_PATH, url=MODEL_URL):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    if not os.path.exists(path):
-        print(f"[INFO] Downloading model to {path} ...")
-        r = requests.get(url, timeout=60)
-        r.raise_for_status()
-        with open(path, "wb") as f:
-            f.write(r.content)
-        print("[OK] Model downloaded.")
-    return path
+    # Resumable, SHA-256 checked download into the shared store (model_store.py).
+    return model_store.fetch(url, path, sha256=MODEL_SHA256)
 
 def build_segmenter(running_mode: vision.RunningMode):
     BaseOptions = mp.tasks.BaseOptions
     ImageSegmenter = mp.tasks.vision.ImageSegmenter
     ImageSegmenterOptions = mp.tasks.vision.ImageSegmenterOptions
     options = ImageSegmenterOptions(
-        base_options=BaseOptions(model_asset_path=ensure_model()),
+        base_options=BaseOptions(model_asset_buffer=model_store.load_buffer(ensure_model())),
         running_mode=running_mode,
         output_category_mask=True,
         output_confidence_masks=False
@@ -63,20 +65,18 @@ def to_mp_image_bgr(img_bgr):
 def extract_class(img_bgr, mask_u8, class_id=CLASS_ID):
     """Highlight a specific class (e.g. hair) using tint overlay."""
     class_mask = (mask_u8 == class_id).astype(np.uint8) * 255
-
-    # Avoid error if no pixel detected
-    if np.count_nonzero(class_mask) == 0:
-        return img_bgr.copy(), class_mask
-
-    tint = cv2.applyColorMap(class_mask, cv2.COLORMAP_OCEAN)
-    result = img_bgr.copy()
-
-    # Only apply blend where mask is detected
-    mask_indices = class_mask > 0
-    blended = cv2.addWeighted(result, 1.0, tint, 0.6, 0)
-    result[mask_indices] = blended[mask_indices]
+    result, _, _ = render_classes(img_bgr, mask_u8, build_lut((class_id,)))
     return result, class_mask
 
+def toggle_class(visible, key):
+    """Update the visible class set from a key press ('1'..'5' toggle, 'a' = all)."""
+    if key == ord('a'):
+        return set(range(1, 6))
+    if ord('1') <= key <= ord('5'):
+        cid = key - ord('0')
+        return visible ^ {cid}
+    return visible
+
 def main():
     cap = cv2.VideoCapture(1)  # OBS virtual camera
     if not cap.isOpened():
@@ -84,7 +84,9 @@ def main():
         return
 
     fps = cap.get(cv2.CAP_PROP_FPS) or 30
-    print(f"[INFO] Running segmentation from OBS camera (class_id={CLASS_ID})...")
+    visible = set(range(1, 6)) if SHOW_CLASSES is None else set(SHOW_CLASSES)
+    lut = build_lut(visible)
+    print(f"[INFO] Running segmentation from OBS camera (classes={sorted(visible)})...")
 
     with build_segmenter(vision.RunningMode.VIDEO) as seg:
         ts = 0
@@ -97,11 +99,17 @@ def main():
             res = seg.segment_for_video(mp_img, int(ts))
             mask = res.category_mask.numpy_view()
 
-            vis, _ = extract_class(frame, mask, CLASS_ID)
-            cv2.imshow(f"Segmentation (Class ID {CLASS_ID})", vis)
+            vis, areas, _ = render_classes(frame, mask, lut)
+            draw_area_legend(vis, areas, lut)
+            cv2.imshow("Multiclass Segmentation", vis)
 
-            if cv2.waitKey(1) & 0xFF == ord('q'):
+            key = cv2.waitKey(1) & 0xFF
+            if key == ord('q'):
                 break
+            new_visible = toggle_class(visible, key)
+            if new_visible != visible:
+                visible = new_visible
+                lut = build_lut(visible)
             ts += int(1000 / fps)
 
     cap.release()
@@ -0,0 +1,132 @@
+# Head-ROI helpers for the live SAM2 hair segmenter (sam2.py)
+# -----------------------------------------------------
+# SAM2 only needs to see the head to segment hair, so instead of resizing
+# the whole camera frame the segmenter crops an expanded box around the
+# face and feeds just that crop to the model. This module:
+# - grows a face box into a square head ROI (hair sits above and beside
+#   the face), clamped to the frame
+# - maps the forehead prompt point into ROI coordinates
+# - runs the (expensive) face detector only every N frames and follows the
+#   box in between by template matching the face patch inside a small
+#   search window, which costs about a millisecond
+# - follows an older face box into the current frame, so a mask computed
+#   on a previous frame can be shifted to where the head is now
+#
+# © For educational use.
+
+import cv2
+
+# Face box grown by these multiples of its width/height: left, top, right, bottom.
+ROI_EXPAND = (0.6, 1.0, 0.6, 0.4)
+FOREHEAD_OFFSET = 15    # prompt point this many px above the face box
+
+
+def head_roi(face_box, frame_shape, expand=ROI_EXPAND):
+    """Square head box (x0, y0, x1, y1) around the face, clamped to the frame."""
+    x1, y1, x2, y2 = face_box
+    fw, fh = x2 - x1, y2 - y1
+    left, top, right, bottom = expand
+    bx0, by0 = x1 - left * fw, y1 - top * fh
+    bx1, by1 = x2 + right * fw, y2 + bottom * fh
+    side = max(bx1 - bx0, by1 - by0)
+    cx, cy = (bx0 + bx1) / 2, (by0 + by1) / 2
+    h, w = frame_shape[:2]
+    x0 = int(max(0, cx - side / 2))
+    y0 = int(max(0, cy - side / 2))
+    return x0, y0, int(min(w, cx + side / 2)), int(min(h, cy + side / 2))
+
+
+def forehead_point(face_box, offset=FOREHEAD_OFFSET):
+    """Point slightly above the top of the face → hair area (frame coords)."""
+    x1, y1, x2, _ = face_box
+    return int((x1 + x2) / 2), max(0, int(y1) - offset)
+
+
+def to_roi_point(point, roi, scale=1.0):
+    """Frame point → pixel in the (resized by `scale`) ROI crop."""
+    return (point[0] - roi[0]) * scale, (point[1] - roi[1]) * scale
+
+
+class FaceBoxTracker:
+    """
+    Face box per frame from `detect(frame_bgr) -> (x1, y1, x2, y2) | None`,
+    called every `detect_every` frames (and whenever tracking is lost).
+    In between, the face patch from the last detection is template-matched
+    (grayscale, downscaled to `match_width` px) within the old box grown by
+    `search_margin`; a match below `min_score` triggers a new detection.
+    """
+
+    def __init__(self, detect, detect_every=5, search_margin=0.5, min_score=0.6, match_width=48):
+        self.detect = detect
+        self.detect_every = max(1, detect_every)
+        self.search_margin = search_margin
+        self.min_score = min_score
+        self.match_width = match_width
+        self.detections = 0
+        self.reset()
+
+    def reset(self):
+        self.box = None
+        self._template = None
+        self._scale = 1.0
+        self._since_detect = 0
+
+    def _set_template(self, gray, box):
+        x1, y1, x2, y2 = (int(round(v)) for v in box)
+        patch = gray[max(0, y1):y2, max(0, x1):x2]
+        if patch.size == 0:
+            self._template = None
+            return
+        self._scale = self.match_width / max(1, x2 - x1)
+        self._template = cv2.resize(patch, None, fx=self._scale, fy=self._scale, interpolation=cv2.INTER_AREA)
+
+    def _track(self, gray):
+        if self._template is None:
+            return None
+        x1, y1, x2, y2 = self.box
+        mx, my = (x2 - x1) * self.search_margin, (y2 - y1) * self.search_margin
+        h, w = gray.shape
+        sx0, sy0 = int(max(0, x1 - mx)), int(max(0, y1 - my))
+        sx1, sy1 = int(min(w, x2 + mx)), int(min(h, y2 + my))
+        search = cv2.resize(gray[sy0:sy1, sx0:sx1], None, fx=self._scale, fy=self._scale,
+                            interpolation=cv2.INTER_AREA)
+        th, tw = self._template.shape
+        if search.shape[0] < th or search.shape[1] < tw:
+            return None
+        result = cv2.matchTemplate(search, self._template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (bx, by) = cv2.minMaxLoc(result)
+        if score < self.min_score:
+            return None
+        nx, ny = sx0 + bx / self._scale, sy0 + by / self._scale
+        return nx, ny, nx + (x2 - x1), ny + (y2 - y1)
+
+    def update(self, frame_bgr):
+        gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+        box = None
+        if self.box is not None and self._since_detect < self.detect_every:
+            box = self._track(gray)
+        if box is None:
+            box = self.detect(frame_bgr)
+            self.detections += 1
+            self._since_detect = 0
+            if box is not None:
+                box = tuple(float(v) for v in box)
+                self._set_template(gray, box)
+        self._since_detect += 1
+        self.box = box
+        return box
+
+    def anchor(self, frame_bgr, box):
+        """Start following `box` (as seen in `frame_bgr`) without the detector."""
+        self.reset()
+        self.box = tuple(float(v) for v in box)
+        self._set_template(cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY), self.box)
+
+    def follow(self, frame_bgr):
+        """Anchored box tracked into `frame_bgr`; None once lost. Never detects."""
+        if self.box is None:
+            return None
+        box = self._track(cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY))
+        if box is not None:
+            self.box = box
+        return box
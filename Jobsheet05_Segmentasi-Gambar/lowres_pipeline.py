@@ -0,0 +1,88 @@
+# MediaPipe Image Segmenter helpers (Python)
+# -----------------------------------------------------
+# Low-resolution inference path for 'selfie_multiclass_256x256'.
+#
+# The model only sees 256x256 pixels, so converting a full 1080p frame
+# to RGB before every call is wasted work. This module:
+# - downsamples the BGR frame ONCE to the model input size, then converts
+#   only that small image to RGB for mp.Image
+# - keeps every mask at 256x256 while thresholding / merging classes
+# - upsamples the final soft mask with a fast guided filter that uses the
+#   full-resolution frame as edge guide, so boundaries follow real edges
+#   instead of the blocky 256px grid
+#
+# Used by selfie_segmentation.py, background_removal.py and
+# background_replace.py.
+#
+# © For educational use.
+
+import cv2
+import numpy as np
+import mediapipe as mp
+
+MODEL_INPUT_SIZE = (256, 256)   # (w, h) of selfie_multiclass_256x256
+GUIDE_RADIUS = 4                # box radius at model resolution
+GUIDE_EPS = 1e-3                # guided filter regulariser (smaller = sharper)
+
+
+def to_mp_image_lowres(img_bgr, size=MODEL_INPUT_SIZE):
+    """Resize to model size first, then BGR->RGB. Returns (mp_image, small_bgr)."""
+    small_bgr = cv2.resize(img_bgr, size, interpolation=cv2.INTER_AREA)
+    small_rgb = cv2.cvtColor(small_bgr, cv2.COLOR_BGR2RGB)
+    mp_img = mp.Image(image_format=mp.ImageFormat.SRGB, data=small_rgb)
+    return mp_img, small_bgr
+
+
+def foreground_lowres(mask_u8, class_ids=None):
+    """Binary float32 mask at model resolution (non-background or selected classes)."""
+    if class_ids is None:
+        return (mask_u8 > 0).astype(np.float32)
+    return np.isin(mask_u8, class_ids).astype(np.float32)
+
+
+def _gray_f32(img_bgr):
+    return cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY).astype(np.float32) * (1.0 / 255.0)
+
+
+def guided_upsample(mask_small, guide_small_bgr, full_shape,
+                    guide_full_bgr=None, radius=GUIDE_RADIUS, eps=GUIDE_EPS):
+    """
+    Fast guided filter upsampling (He & Sun, 2015).
+    Linear coefficients (a, b) are solved at model resolution, only (a, b)
+    are resized, and the full-res guide is touched once: alpha = A*I + B.
+    Returns float32 alpha in [0, 1] with shape full_shape[:2].
+    """
+    H, W = full_shape[:2]
+    ksize = (2 * radius + 1, 2 * radius + 1)
+
+    I = _gray_f32(guide_small_bgr)
+    p = mask_small.astype(np.float32)
+
+    mean_I = cv2.boxFilter(I, -1, ksize)
+    mean_p = cv2.boxFilter(p, -1, ksize)
+    corr_Ip = cv2.boxFilter(I * p, -1, ksize)
+    corr_II = cv2.boxFilter(I * I, -1, ksize)
+
+    var_I = corr_II - mean_I * mean_I
+    cov_Ip = corr_Ip - mean_I * mean_p
+    a = cov_Ip / (var_I + eps)
+    b = mean_p - a * mean_I
+
+    mean_a = cv2.boxFilter(a, -1, ksize)
+    mean_b = cv2.boxFilter(b, -1, ksize)
+
+    if guide_full_bgr is None:
+        # No full-res guide: filter at low-res, then plain bilinear upsampling.
+        q = mean_a * I + mean_b
+        q = cv2.resize(q, (W, H), interpolation=cv2.INTER_LINEAR)
+        return np.clip(q, 0.0, 1.0, out=q)
+
+    A = cv2.resize(mean_a, (W, H), interpolation=cv2.INTER_LINEAR)
+    B = cv2.resize(mean_b, (W, H), interpolation=cv2.INTER_LINEAR)
+    alpha = A * _gray_f32(guide_full_bgr) + B
+    return np.clip(alpha, 0.0, 1.0, out=alpha)
+
+
+def composite(fg_bgr, bg_bgr, alpha):
+    """Soft alpha blend at full resolution: fg*alpha + bg*(1-alpha)."""
+    return cv2.blendLinear(fg_bgr, bg_bgr, alpha, 1.0 - alpha)
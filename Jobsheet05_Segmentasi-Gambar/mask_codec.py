@@ -0,0 +1,333 @@
+# Segmentation mask codec (Python)
+# -----------------------------------------------------
+# Run-length encoding for masks produced by the Jobsheet05 scripts and by
+# sam2_web_py, so masks can be stored per frame or sent over the network
+# without PNG-encoding full-size uint8 arrays.
+#
+# Binary masks use the COCO RLE layout (pycocotools compatible):
+#   {"size": [h, w], "counts": "<compressed string>"}
+# pixels are read column-major and counts start with a run of zeros.
+#
+# Multi-class label maps (e.g. selfie_multiclass 0..5) use the same
+# column-major runs plus the value of every run:
+#   {"size": [h, w], "values": [...], "counts": "<compressed string>"}
+#
+# Area and bbox are computed from the runs directly (no decoding).
+# Everything is vectorized (OpenCV transpose + NumPy), including the COCO
+# string codec.
+#
+# Mask streams: append-only binary files with one record per frame,
+# see MaskStreamWriter / read_mask_stream.
+#
+# © For educational use.
+
+import os
+import struct
+import threading
+
+import cv2
+import numpy as np
+
+# ==========================
+# RUN EXTRACTION
+# ==========================
+# Per-thread scratch buffers: re-using them instead of allocating two fresh
+# 2 MB arrays per 1080p frame avoids page faults and halves encode time.
+_scratch = threading.local()
+
+
+def _buffers(h, w):
+    key = (h, w)
+    if getattr(_scratch, "key", None) != key:
+        _scratch.key = key
+        _scratch.t = np.empty((w, h), dtype=np.uint8)
+        _scratch.ne = np.empty(h * w - 1 if h * w else 0, dtype=bool)
+    return _scratch.t, _scratch.ne
+
+
+def _column_major_runs(mask_u8, binarize=False):
+    """
+    Column-major runs of a uint8 (h, w) array.
+    Returns (flat, starts, lengths); `flat` is a scratch view, use it before
+    the next call on this thread.
+    """
+    t, ne = _buffers(*mask_u8.shape[:2])
+    # cv2.transpose is ~4x faster than np.ascontiguousarray(mask.T) on 1080p.
+    cv2.transpose(mask_u8, dst=t)
+    flat = t.ravel()
+    if binarize:
+        # Any non-zero value is foreground (0/1 and 0/255 masks both work).
+        cv2.threshold(flat, 0, 1, cv2.THRESH_BINARY, dst=flat)
+    n = flat.size
+    np.not_equal(flat[1:], flat[:-1], out=ne)
+    change = np.flatnonzero(ne) + 1
+    starts = np.empty(change.size + 1, dtype=np.int64)
+    starts[0] = 0
+    starts[1:] = change
+    lengths = np.diff(starts, append=n)
+    return flat, starts, lengths
+
+
+# ==========================
+# COCO COMPRESSED STRING
+# ==========================
+_MAX_CHUNKS = 13   # 5 bits per chunk covers int64 deltas
+
+
+def counts_to_string(counts):
+    """Vectorized port of COCO's rleToString (bytes, ASCII)."""
+    cnts = np.asarray(counts, dtype=np.int64)
+    if cnts.size == 0:
+        return b""
+    x = cnts.copy()
+    x[3:] -= cnts[1:-2]           # delta against the run two places back
+
+    shifts = 5 * np.arange(_MAX_CHUNKS, dtype=np.int64)
+    chunks = (x[:, None] >> shifts) & 0x1F
+    rest = x[:, None] >> (shifts + 5)
+    sign = np.where(chunks & 0x10, -1, 0)
+    done = rest == sign
+    n_chunks = done.argmax(axis=1) + 1
+
+    keep = np.arange(_MAX_CHUNKS) < n_chunks[:, None]
+    more = np.arange(_MAX_CHUNKS) < (n_chunks - 1)[:, None]
+    chars = (chunks | np.where(more, 0x20, 0)) + 48
+    return chars[keep].astype(np.uint8).tobytes()
+
+
+def string_to_counts(s):
+    """Vectorized port of COCO's rleFrString. Accepts str or bytes."""
+    if isinstance(s, str):
+        s = s.encode("ascii")
+    c = np.frombuffer(s, dtype=np.uint8).astype(np.int64) - 48
+    if c.size == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    ends = np.flatnonzero((c & 0x20) == 0)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    group_len = ends - starts + 1
+    pos = np.arange(c.size) - np.repeat(starts, group_len)
+    x = np.add.reduceat((c & 0x1F) << (5 * pos), starts)
+    negative = (c[ends] & 0x10) != 0
+    x[negative] |= -1 << (5 * group_len[negative])
+
+    cnts = x.copy()
+    if cnts.size > 3:
+        cnts[3::2] = np.cumsum(x[3::2]) + x[1]
+        cnts[4::2] = np.cumsum(x[4::2]) + x[2]
+    return cnts
+
+
+# ==========================
+# BINARY (COCO) RLE
+# ==========================
+def encode(mask):
+    """Binary mask (h, w) -> COCO RLE dict with compressed counts string."""
+    h, w = mask.shape[:2]
+    if mask.dtype == bool:
+        flat, _, lengths = _column_major_runs(mask.view(np.uint8))
+    else:
+        flat, _, lengths = _column_major_runs(mask.astype(np.uint8, copy=False), binarize=True)
+    if flat.size and flat[0]:
+        lengths = np.concatenate(([0], lengths))
+    return {"size": [h, w], "counts": counts_to_string(lengths).decode("ascii")}
+
+
+def _counts(rle):
+    counts = rle["counts"]
+    if isinstance(counts, (str, bytes)):
+        return string_to_counts(counts)
+    return np.asarray(counts, dtype=np.int64)
+
+
+def decode(rle):
+    """COCO RLE (compressed or uncompressed counts) -> uint8 mask (h, w) of 0/1."""
+    h, w = rle["size"]
+    counts = _counts(rle)
+    values = np.zeros(counts.size, dtype=np.uint8)
+    values[1::2] = 1
+    flat = np.repeat(values, counts)
+    if flat.size != h * w:
+        raise ValueError(f"RLE covers {flat.size} pixels, expected {h * w}")
+    return flat.reshape(w, h).T
+
+
+def area(rle):
+    """Foreground pixel count, straight from the runs."""
+    return int(_counts(rle)[1::2].sum())
+
+
+def _bbox_from_runs(h, run_starts, run_lengths):
+    """[x, y, w, h] covering the given column-major runs (COCO rleToBbox)."""
+    keep = run_lengths > 0
+    s = run_starts[keep]
+    e = s + run_lengths[keep] - 1
+    if s.size == 0:
+        return [0, 0, 0, 0]
+    x0, x1 = int(s[0] // h), int(e[-1] // h)
+    crosses = (s // h) != (e // h)
+    if crosses.any():
+        y0, y1 = 0, h - 1
+    else:
+        y0, y1 = int((s % h).min()), int((e % h).max())
+    return [x0, y0, x1 - x0 + 1, y1 - y0 + 1]
+
+
+def bbox(rle):
+    """COCO-style [x, y, w, h] of the foreground, straight from the runs."""
+    h, _ = rle["size"]
+    counts = _counts(rle)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return _bbox_from_runs(h, starts[1::2], counts[1::2])
+
+
+# ==========================
+# MULTI-CLASS RLE
+# ==========================
+def encode_multiclass(label_map):
+    """uint8 label map (h, w) -> {"size", "values", "counts"} (column-major runs)."""
+    h, w = label_map.shape[:2]
+    flat, starts, lengths = _column_major_runs(label_map.astype(np.uint8, copy=False))
+    return {
+        "size": [h, w],
+        "values": flat[starts].tolist(),
+        "counts": counts_to_string(lengths).decode("ascii"),
+    }
+
+
+def decode_multiclass(rle):
+    h, w = rle["size"]
+    values = np.asarray(rle["values"], dtype=np.uint8)
+    flat = np.repeat(values, _counts(rle))
+    if flat.size != h * w:
+        raise ValueError(f"RLE covers {flat.size} pixels, expected {h * w}")
+    return flat.reshape(w, h).T
+
+
+def class_areas(rle, num_classes=None):
+    """Pixel count per class id from a multi-class RLE."""
+    values = np.asarray(rle["values"], dtype=np.int64)
+    return np.bincount(values, weights=_counts(rle), minlength=num_classes or 0).astype(np.int64)
+
+
+def class_bbox(rle, class_id):
+    h, _ = rle["size"]
+    counts = _counts(rle)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    sel = np.asarray(rle["values"]) == class_id
+    return _bbox_from_runs(h, starts[sel], counts[sel])
+
+
+def class_to_binary(rle, class_id):
+    """Extract one class as a binary COCO RLE without decoding the label map."""
+    counts = _counts(rle)
+    fg = (np.asarray(rle["values"]) == class_id).astype(np.int8)
+    # Merge neighbouring runs that collapse to the same binary value.
+    change = np.flatnonzero(fg[1:] != fg[:-1]) + 1
+    group_starts = np.concatenate(([0], change))
+    merged = np.add.reduceat(counts, group_starts) if counts.size else counts
+    if fg.size and fg[0]:
+        merged = np.concatenate(([0], merged))
+    return {"size": list(rle["size"]), "counts": counts_to_string(merged).decode("ascii")}
+
+
+# ==========================
+# MASK STREAM FILE
+# ==========================
+# File  : MAGIC, then records
+# Record: <I frame, H h, H w, B kind, I n_values, I n_bytes> + values + counts string
+STREAM_MAGIC = b"RLEMASK1"
+_RECORD = struct.Struct("<IHHBII")
+KIND_BINARY = 0
+KIND_MULTICLASS = 1
+
+
+def _complete_length(f):
+    """Byte offset just past the last complete record of an open stream."""
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    f.seek(0)
+    if f.read(len(STREAM_MAGIC)) != STREAM_MAGIC:
+        raise ValueError(f"Not a mask stream: {f.name}")
+    end = len(STREAM_MAGIC)
+    while end + _RECORD.size <= size:
+        f.seek(end)
+        _, _, _, _, n_values, n_bytes = _RECORD.unpack(f.read(_RECORD.size))
+        record_end = end + _RECORD.size + n_values + n_bytes
+        if record_end > size:
+            break
+        end = record_end
+    return end
+
+
+class MaskStreamWriter:
+    """
+    Append-only per-video mask stream. Reopening a file left behind by an
+    interruption first cuts off a half-written last record, so frames
+    appended afterwards stay readable.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if os.path.exists(path) and os.path.getsize(path) >= len(STREAM_MAGIC):
+            self._f = open(path, "r+b")
+            try:
+                self._f.truncate(_complete_length(self._f))
+            except ValueError:
+                self._f.close()
+                raise
+            self._f.seek(0, os.SEEK_END)
+        else:   # new, empty, or interrupted before the magic was written
+            self._f = open(path, "wb")
+            self._f.write(STREAM_MAGIC)
+
+    def append(self, frame_idx, mask, multiclass=False):
+        """Encode and append one frame. Returns bytes written."""
+        if multiclass:
+            rle = encode_multiclass(mask)
+            values = np.asarray(rle["values"], dtype=np.uint8).tobytes()
+            kind = KIND_MULTICLASS
+        else:
+            rle = encode(mask)
+            values = b""
+            kind = KIND_BINARY
+        counts = rle["counts"].encode("ascii")
+        h, w = rle["size"]
+        header = _RECORD.pack(frame_idx, h, w, kind, len(values), len(counts))
+        self._f.write(header + values + counts)
+        return len(header) + len(values) + len(counts)
+
+    def flush(self):
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_mask_stream(path):
+    """
+    Yield (frame_idx, rle) for every complete record.
+    A truncated last record (crash while writing) is ignored.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(STREAM_MAGIC)) != STREAM_MAGIC:
+            raise ValueError(f"Not a mask stream: {path}")
+        while True:
+            header = f.read(_RECORD.size)
+            if len(header) < _RECORD.size:
+                return
+            frame_idx, h, w, kind, n_values, n_bytes = _RECORD.unpack(header)
+            values = f.read(n_values)
+            counts = f.read(n_bytes)
+            if len(values) < n_values or len(counts) < n_bytes:
+                return
+            rle = {"size": [h, w], "counts": counts.decode("ascii")}
+            if kind == KIND_MULTICLASS:
+                rle["values"] = np.frombuffer(values, dtype=np.uint8).tolist()
+            yield frame_idx, rle
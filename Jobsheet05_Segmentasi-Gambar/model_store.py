@@ -0,0 +1,283 @@
+# Local model store (Python)
+# -----------------------------------------------------
+# One place that downloads and caches model files for the Jobsheet05
+# MediaPipe scripts and for sam2_web_py (SAM2 checkpoints + configs).
+#
+#   path = model_store.fetch(url, "selfie_multiclass_256x256.tflite")
+#   buf  = model_store.load_buffer(path)     # bytes for model_asset_buffer
+#
+# - Single cache directory: MODEL_STORE_DIR (default: ./models next to
+#   this file), or an explicit destination path.
+# - Streaming download into "<file>.part"; an interrupted download resumes
+#   with an HTTP Range request on the next run. The ETag/Last-Modified of
+#   the first response is kept next to it ("<file>.part.json") and sent as
+#   If-Range, so a file that changed upstream (e.g. a "latest" URL) is
+#   fetched again in full instead of being spliced onto the old bytes.
+# - SHA-256 verification, first match wins:
+#     1. the `sha256` argument (scripts pass an env override here, e.g.
+#        MP_SEG_MODEL_SHA256 or SAM2_CHECKPOINT_SHA256)
+#     2. the digest pinned for the URL in model_pins.json
+#     3. the digest recorded after the first complete download
+#        ("<file>.sha256"); this only protects against later truncation or
+#        corruption, not against a bad first download, so fixed URLs should
+#        be pinned.
+# - A file found without any known digest (copied by hand, older scripts) is
+#   only accepted if its size matches the server's Content-Length; otherwise
+#   it is downloaded again.
+# - The finished file is moved into place with os.replace (atomic), so a
+#   crash never leaves a half-written model under the final name.
+# - Offline mode (MODEL_STORE_OFFLINE=1): never touch the network; a missing
+#   or invalid file raises ModelStoreError with the path to copy it to. A
+#   file without any known digest is used with a warning (load_buffer too),
+#   and no digest is recorded for it.
+#
+# Pinning: `python model_store.py pin` downloads every URL listed in
+# model_pins.json without a digest yet and writes its SHA-256 there.
+#
+# © For educational use.
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+
+import requests
+
+STORE_DIR = os.environ.get(
+    "MODEL_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+)
+OFFLINE = os.environ.get("MODEL_STORE_OFFLINE", "0") == "1"
+CHUNK_SIZE = 1 << 16
+TIMEOUT = 60   # seconds per connect/read, not for the whole download
+
+PINS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_pins.json")
+
+_lock = threading.Lock()
+_verified = {}   # path -> (size, mtime_ns) of files already hashed in this process
+_unverified = {}   # path -> (size, mtime_ns) of files fetch() accepted offline without a digest
+
+
+def load_pins(path=PINS_FILE):
+    """url -> SHA-256 for fixed-URL models (entries without a digest yet are skipped)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            pins = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {url: digest.lower() for url, digest in pins.items() if digest}
+
+
+class ModelStoreError(RuntimeError):
+    """A model file is missing, corrupt, or could not be downloaded."""
+
+
+# ==========================
+# HASHING
+# ==========================
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _sidecar(path):
+    return path + ".sha256"
+
+
+def _expected_digest(path, sha256):
+    if sha256:
+        return sha256.lower()
+    try:
+        with open(_sidecar(path), "r", encoding="ascii") as f:
+            return f.read().split()[0].lower()
+    except (OSError, IndexError):
+        return None
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+def verify(path, sha256=None):
+    """True if `path` exists and matches `sha256` (or its recorded digest)."""
+    if not os.path.isfile(path):
+        return False
+    stamp = _stamp(path)
+    if _verified.get(path) == stamp:
+        return True
+    expected = _expected_digest(path, sha256)
+    if expected is None:
+        return False   # no digest known: cannot tell a complete file from a truncated one
+    if sha256_file(path) != expected:
+        return False
+    _verified[path] = stamp
+    return True
+
+
+# ==========================
+# DOWNLOAD
+# ==========================
+def _record_digest(path, digest):
+    with open(_sidecar(path), "w", encoding="ascii") as f:
+        f.write(f"{digest}  {os.path.basename(path)}\n")
+
+
+def _read_validator(part):
+    try:
+        with open(part + ".json", "r", encoding="utf-8") as f:
+            return json.load(f).get("validator")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _clear_part(part):
+    for path in (part, part + ".json"):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _download(url, dest, sha256=None):
+    """Stream `url` into dest.part (resuming if possible), verify, rename."""
+    part = dest + ".part"
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    validator = _read_validator(part) if offset else None
+    if offset and validator is None:
+        _clear_part(part)   # cannot tell whether the server still has the same file
+        offset = 0
+    headers = {"Range": f"bytes={offset}-", "If-Range": validator} if offset else {}
+
+    try:
+        with requests.get(url, stream=True, timeout=TIMEOUT, headers=headers) as r:
+            if r.status_code == 416:   # .part already complete (or stale): start over
+                _clear_part(part)
+                return _download(url, dest, sha256)
+            r.raise_for_status()
+            if offset and (r.status_code != 206 or
+                           not r.headers.get("Content-Range", "").startswith(f"bytes {offset}-")):
+                offset = 0   # server ignored Range, or the file changed (If-Range): restart
+            total = r.headers.get("Content-Length")
+            total = int(total) + offset if total is not None else None
+
+            if not offset:
+                validator = r.headers.get("ETag") or r.headers.get("Last-Modified")
+                with open(part + ".json", "w", encoding="utf-8") as f:
+                    json.dump({"url": url, "validator": validator}, f)
+            print(f"[INFO] Downloading {url} -> {dest}" + (f" (resuming at {offset} bytes)" if offset else ""))
+            with open(part, "ab" if offset else "wb") as f:
+                for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                    if chunk:
+                        f.write(chunk)
+    except requests.RequestException as exc:
+        # Whatever reached the .part file is kept; the next call resumes.
+        raise ModelStoreError(f"Download of {url} failed: {exc}; run again to resume") from exc
+
+    size = os.path.getsize(part)
+    if total is not None and size != total:
+        # Keep the .part file: the next call resumes from here.
+        raise ModelStoreError(f"Download of {url} incomplete ({size}/{total} bytes); run again to resume")
+
+    digest = sha256_file(part)
+    if sha256 and digest != sha256.lower():
+        _clear_part(part)
+        raise ModelStoreError(f"SHA-256 mismatch for {url}: expected {sha256}, got {digest}")
+
+    os.replace(part, dest)
+    _clear_part(part)
+    _record_digest(dest, digest)
+    print(f"[OK] Model saved ({size} bytes, sha256 {digest[:12]}...)")
+
+
+def _remote_size(url):
+    """Content-Length of `url` from a HEAD request, or None if unknown."""
+    try:
+        r = requests.head(url, allow_redirects=True, timeout=TIMEOUT)
+        r.raise_for_status()
+        length = r.headers.get("Content-Length")
+        return int(length) if length is not None else None
+    except (requests.RequestException, ValueError):
+        return None
+
+
+def model_path(filename):
+    """A bare file name lives in STORE_DIR; anything with a directory is used as is."""
+    return filename if os.path.dirname(filename) else os.path.join(STORE_DIR, filename)
+
+
+def fetch(url, filename, sha256=None, offline=None):
+    """
+    Return a verified local path for `filename`, downloading `url` if needed.
+    See model_path() for where `filename` is stored. Without `sha256`, the
+    digest pinned for `url` in model_pins.json (if any) is used.
+    """
+    dest = model_path(filename)
+    offline = OFFLINE if offline is None else offline
+    sha256 = sha256 or load_pins().get(url)
+    with _lock:
+        if verify(dest, sha256):
+            return dest
+        unverified = os.path.isfile(dest) and _expected_digest(dest, sha256) is None
+        if unverified and offline:
+            # Placed by hand for offline use: nothing to check it against. Use it,
+            # but do not record a digest, so the next online run still checks it.
+            print(f"[WARN] {dest} has no known SHA-256; using it unverified (offline mode)")
+            _unverified[dest] = _stamp(dest)
+            return dest
+        if offline:
+            raise ModelStoreError(
+                f"Offline mode: {dest} is missing or corrupt; copy a verified file there "
+                f"(source: {url})"
+            )
+        if unverified:
+            # Copied by hand or left by an older version of the scripts: only
+            # trusted if it is as large as the server's copy.
+            size = os.path.getsize(dest)
+            if _remote_size(url) == size:
+                _record_digest(dest, sha256_file(dest))
+                return dest
+            print(f"[WARN] {dest} ({size} bytes) does not match {url}; downloading it again")
+        os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+        _download(url, dest, sha256)
+        return dest
+
+
+def load_buffer(path, sha256=None):
+    """
+    Read a verified model file into memory (e.g. for model_asset_buffer).
+    A file fetch() accepted unverified in offline mode is read as long as it
+    has not changed since.
+    """
+    accepted = os.path.isfile(path) and _unverified.get(path) == _stamp(path)
+    if not accepted and not verify(path, sha256):
+        raise ModelStoreError(f"{path} is missing or does not match its SHA-256")
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def pin(path=PINS_FILE):
+    """Download every URL in `path` that has no digest yet and record its SHA-256."""
+    with open(path, "r", encoding="utf-8") as f:
+        pins = json.load(f)
+    with tempfile.TemporaryDirectory() as tmp:
+        for url, digest in pins.items():
+            if digest:
+                continue
+            dest = os.path.join(tmp, "model")
+            _download(url, dest)
+            pins[url] = sha256_file(dest)
+            os.remove(dest)
+            print(f"[OK] {url}: {pins[url]}")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(pins, f, indent=2)
+        f.write("\n")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["pin"]:
+        print("Usage: python model_store.py pin")
+        sys.exit(1)
+    pin()
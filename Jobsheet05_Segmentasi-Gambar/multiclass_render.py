@@ -0,0 +1,85 @@
+# MediaPipe Image Segmenter helpers (Python)
+# -----------------------------------------------------
+# One-pass renderer for the 'selfie_multiclass_256x256' category mask:
+# 0=background, 1=hair, 2=body-skin, 3=face-skin, 4=clothes, 5=others.
+#
+# - Every class is coloured through a single palette lookup table
+#   (lut[mask] -> BGR tint), so showing 1 or 5 classes costs the same.
+# - Blending happens only inside the bounding rectangle of non-background
+#   pixels; the rest of the frame is copied untouched.
+# - Per-class pixel areas come from one histogram over the mask.
+#
+# Used by hair_segmentation.py.
+#
+# © For educational use.
+
+import cv2
+import numpy as np
+
+CLASS_NAMES = ("background", "hair", "body-skin", "face-skin", "clothes", "others")
+NUM_CLASSES = len(CLASS_NAMES)
+
+# BGR tint per class (background must stay black = no tint).
+PALETTE_BGR = np.array([
+    (0, 0, 0),        # background
+    (40, 40, 220),    # hair       (red)
+    (60, 200, 255),   # body-skin  (yellow)
+    (255, 160, 40),   # face-skin  (blue)
+    (80, 200, 60),    # clothes    (green)
+    (200, 60, 200),   # others     (magenta)
+], dtype=np.uint8)
+
+TINT_WEIGHT = 0.6
+
+
+def build_lut(visible=None, palette=PALETTE_BGR):
+    """
+    (256, 3) uint8 lookup table: class id -> tint colour.
+    Classes not in `visible` (and ids >= NUM_CLASSES) map to black, which
+    leaves those pixels unchanged after the additive blend.
+    """
+    lut = np.zeros((256, 3), dtype=np.uint8)
+    ids = range(1, NUM_CLASSES) if visible is None else visible
+    for cid in ids:
+        if 0 < cid < len(palette):
+            lut[cid] = palette[cid]
+    return lut
+
+
+def class_areas(mask_u8):
+    """Pixel count per class id, shape (NUM_CLASSES,), int64."""
+    hist = cv2.calcHist([mask_u8], [0], None, [NUM_CLASSES], [0, NUM_CLASSES])
+    return hist.ravel().astype(np.int64)
+
+
+def render_classes(img_bgr, mask_u8, lut, weight=TINT_WEIGHT):
+    """
+    Colour all visible classes in one pass.
+    Returns (vis_bgr, areas, bbox) where bbox = (x, y, w, h) of
+    non-background pixels, or None if the mask is empty.
+    """
+    areas = class_areas(mask_u8)
+    result = img_bgr.copy()
+    if areas[0] == mask_u8.size:
+        return result, areas, None
+
+    x, y, w, h = cv2.boundingRect(mask_u8)   # nonzero = non-background
+    tint = lut[mask_u8[y:y + h, x:x + w]]     # (h, w, 3), black where not shown
+    result[y:y + h, x:x + w] = cv2.addWeighted(result[y:y + h, x:x + w], 1.0, tint, weight, 0)
+    return result, areas, (x, y, w, h)
+
+
+def draw_area_legend(img_bgr, areas, lut, origin=(10, 20)):
+    """Small legend: colour swatch + class name + % of frame, visible classes only."""
+    total = max(int(areas.sum()), 1)
+    x0, y = origin
+    for cid in range(1, NUM_CLASSES):
+        if not lut[cid].any():
+            continue
+        color = tuple(int(c) for c in lut[cid])
+        cv2.rectangle(img_bgr, (x0, y - 10), (x0 + 12, y + 2), color, -1)
+        text = f"{cid} {CLASS_NAMES[cid]}: {100.0 * areas[cid] / total:.1f}%"
+        cv2.putText(img_bgr, text, (x0 + 18, y), cv2.FONT_HERSHEY_SIMPLEX,
+                    0.45, (255, 255, 255), 1, cv2.LINE_AA)
+        y += 18
+    return img_bgr
@@ -2,13 +2,22 @@
 # SAM 2 Hair Auto-Segmentation (Python, CPU-Optimized)
 # ----------------------------------------------------------------
 # - Uses SAM 2 (Segment Anything Model 2)
-# - Auto-detects face → chooses a prompt point above forehead
-# - Applies segmentation only around head area
+# - Auto-detects face → chooses a prompt point above forehead; the face
+#   detector is pluggable (FACE_DETECTOR: mediapipe | yunet | haar |
+#   mtcnn, see face_detectors.py and face_detector_bench.py)
+# - Applies segmentation only around head area: the face box is grown
+#   into a head ROI and only that crop is fed to SAM2 (head_roi.py)
+# - Face detection runs every DETECT_EVERY frames; the box is tracked
+#   by cheap template matching in between
+# - SAM2 runs on a worker thread that always takes the newest frame; the
+#   preview runs at camera FPS and shows the latest mask, shifted along
+#   with the tracked face to the current frame
 # - Works with OBS Virtual Camera (Device 2)
 # - Press 'q' to quit
 #
 # Install:
-#   pip install opencv-python numpy sam2 torch facenet-pytorch tqdm
+#   pip install opencv-python numpy sam2 torch mediapipe tqdm
+#   (facenet-pytorch only for FACE_DETECTOR=mtcnn)
 #
 # NOTE:
 # - SAM 2 is CPU-heavy. This version uses small model + optimized resize.
@@ -17,11 +26,17 @@
 # © Danish & Aria
 # ================================================================
 
+import os
+import threading
+import time
+
 import cv2
 import numpy as np
 import torch
 from sam2 import Sam2Predictor
-from facenet_pytorch import MTCNN
+
+import face_detectors
+from head_roi import FaceBoxTracker, forehead_point, head_roi, to_roi_point
 
 # ==========================
 # CONFIG
@@ -29,13 +44,16 @@ from facenet_pytorch import MTCNN
 DEVICE = "cpu"
 CAM_INDEX = 2        # OBS Virtual Camera
 MODEL_NAME = "sam2_hiera_tiny"   # fastest
-RESIZE_W = 512       # reduce to 512px for faster CPU inference
+RESIZE_W = 512       # max side of the head ROI fed to SAM2 (downscaled only)
+FACE_DETECTOR = os.environ.get("FACE_DETECTOR", "mediapipe")  # mediapipe | yunet | haar | mtcnn
+DETECT_EVERY = 5     # run the face detector every N frames, track the box in between
+DETECT_SCALE = 0.5   # the face detector runs on a downscaled frame
 
 # ==========================
 # INIT MODELS
 # ==========================
-print("[INFO] Loading face detector (MTCNN)...")
-mtcnn = MTCNN(keep_all=False, device=DEVICE)
+print(f"[INFO] Loading face detector ({FACE_DETECTOR})...")
+face_detector = face_detectors.create(FACE_DETECTOR, scale=DETECT_SCALE)
 
 print("[INFO] Loading SAM 2 model...")
 predictor = Sam2Predictor.from_pretrained(MODEL_NAME)
@@ -44,59 +62,140 @@ predictor.to(DEVICE)
 # ==========================
 # UTILS
 # ==========================
-def auto_prompt_point_bgr(frame):
-    """Detect face → pick point above forehead for SAM prompt."""
-    boxes, _ = mtcnn.detect(frame)
-
-    if boxes is None:
-        return None  # no face detected
+face_tracker = FaceBoxTracker(face_detector.detect, detect_every=DETECT_EVERY)
 
-    x1, y1, x2, y2 = boxes[0]
-    cx = int((x1 + x2) / 2)
-    cy = int(y1) - 15  # slightly above top of face → hair area
-
-    # clamp to frame
-    cy = max(0, cy)
-
-    return (cx, cy)
-
-def segment_hair(frame_bgr):
-    """Use SAM2 with automatic forehead prompt point."""
-    point = auto_prompt_point_bgr(frame_bgr)
-    if point is None:
-        return frame_bgr
+def auto_prompt_point_bgr(frame):
+    """Tracked face → (point above forehead for SAM prompt, face box)."""
+    box = face_tracker.update(frame)
+    if box is None:
+        return None
+    return forehead_point(box), box
 
-    img_resized = cv2.resize(frame_bgr, (RESIZE_W, RESIZE_W))
-    H0, W0 = frame_bgr.shape[:2]
+def segment_hair_mask(frame_bgr):
+    """
+    SAM2 on the head ROI with automatic forehead prompt point.
+    Returns (mask at ROI size, roi box, face box) or None without a face.
+    """
+    found = auto_prompt_point_bgr(frame_bgr)
+    if found is None:
+        return None
+    point, face_box = found
 
-    # Coordinates scale
-    sx = point[0] / W0
-    sy = point[1] / H0
-    prompt_resized = (int(sx * RESIZE_W), int(sy * RESIZE_W))
+    # Crop the head only; downscale it if it is larger than RESIZE_W
+    x0, y0, x1, y1 = roi = head_roi(face_box, frame_bgr.shape)
+    head = frame_bgr[y0:y1, x0:x1]
+    scale = min(1.0, RESIZE_W / max(head.shape[:2]))
+    if scale < 1.0:
+        head = cv2.resize(head, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    prompt_roi = to_roi_point(point, roi, scale)
 
     # SAM 2 inference
-    img_rgb = cv2.cvtColor(img_resized, cv2.COLOR_BGR2RGB)
+    img_rgb = cv2.cvtColor(head, cv2.COLOR_BGR2RGB)
     predictor.set_image(img_rgb)
 
     masks, _, _ = predictor.predict(
-        point_coords=np.array([[prompt_resized]]),
+        point_coords=np.array([[prompt_roi]]),
         point_labels=np.array([[1]]),     # foreground prompt
         multimask_output=False,
     )
 
     mask = masks[0].astype(np.uint8)
 
-    # Resize mask back to original camera size
-    mask_full = cv2.resize(mask, (W0, H0))
-
-    # Apply color tint
-    tint = cv2.applyColorMap(mask_full * 255, cv2.COLORMAP_OCEAN)
-    blended = cv2.addWeighted(frame_bgr, 1.0, tint, 0.6, 0)
+    # Resize mask back to the ROI size in the camera frame
+    mask_roi = cv2.resize(mask, (x1 - x0, y1 - y0), interpolation=cv2.INTER_NEAREST)
+    return mask_roi, roi, face_box
 
+def apply_mask(frame_bgr, mask_roi, roi, shift=(0, 0)):
+    """Tint the mask inside the ROI, moved by `shift` pixels (clipped to the frame)."""
     result = frame_bgr.copy()
-    result[mask_full == 1] = blended[mask_full == 1]
+    H0, W0 = frame_bgr.shape[:2]
+    dx, dy = int(round(shift[0])), int(round(shift[1]))
+    x0, y0, x1, y1 = roi[0] + dx, roi[1] + dy, roi[2] + dx, roi[3] + dy
+    cx0, cy0, cx1, cy1 = max(0, x0), max(0, y0), min(W0, x1), min(H0, y1)
+    if cx0 >= cx1 or cy0 >= cy1:
+        return result
+    mask = mask_roi[cy0 - y0:cy1 - y0, cx0 - x0:cx1 - x0]
+
+    # Apply color tint inside the ROI only
+    region = result[cy0:cy1, cx0:cx1]
+    tint = cv2.applyColorMap(mask * 255, cv2.COLORMAP_OCEAN)
+    blended = cv2.addWeighted(region, 1.0, tint, 0.6, 0)
+    region[mask == 1] = blended[mask == 1]
     return result
 
+def segment_hair(frame_bgr):
+    """Synchronous segment + overlay of one frame."""
+    found = segment_hair_mask(frame_bgr)
+    if found is None:
+        return frame_bgr
+    mask_roi, roi, _ = found
+    return apply_mask(frame_bgr, mask_roi, roi)
+
+# ==========================
+# ASYNC INFERENCE
+# ==========================
+class SegmentWorker:
+    """
+    Runs segment_hair_mask on a daemon thread. submit() replaces the
+    pending frame, so the model always works on the newest one; latest()
+    returns the last finished result (latched until the next one).
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._pending = None        # (frame, captured_at)
+        self._result = None
+        self._stopped = False
+        self.infer_fps = 0.0
+        self._thread = threading.Thread(target=self._run, name="sam2-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, frame_bgr, captured_at):
+        with self._cond:
+            self._pending = (frame_bgr, captured_at)
+            self._cond.notify()
+
+    def latest(self):
+        with self._cond:
+            return self._result
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join(timeout=5)
+
+    def _run(self):
+        last_done = None
+        while True:
+            with self._cond:
+                while self._pending is None and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                frame, captured_at = self._pending
+                self._pending = None
+
+            found = segment_hair_mask(frame)
+            done = time.perf_counter()
+            if last_done is not None:
+                fps = 1.0 / max(1e-6, done - last_done)
+                self.infer_fps = fps if not self.infer_fps else 0.8 * self.infer_fps + 0.2 * fps
+            last_done = done
+            with self._cond:
+                # None (no face) clears the overlay instead of latching an old head
+                self._result = None if found is None else {
+                    "mask": found[0], "roi": found[1], "face_box": found[2],
+                    "frame": frame, "captured_at": captured_at,
+                }
+
+def draw_stats(vis, display_fps, infer_fps, overlay_ms):
+    lines = [f"preview {display_fps:4.1f} fps", f"SAM2 {infer_fps:4.1f} fps"]
+    if overlay_ms is not None:
+        lines.append(f"overlay age {overlay_ms:4.0f} ms")
+    for i, text in enumerate(lines):
+        cv2.putText(vis, text, (10, 24 + 22 * i), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+
 # ==========================
 # MAIN LOOP
 # ==========================
@@ -106,21 +205,52 @@ def main():
         print(f"[ERROR] Cannot open camera index {CAM_INDEX}.")
         return
 
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # keep the driver queue short: no stale frames
+
     print("[INFO] Running SAM 2 Hair Segmentation...")
     print("[INFO] Press 'q' to quit.")
 
+    worker = SegmentWorker()
+    follower = FaceBoxTracker(detect=lambda _frame: None)  # display side: tracking only
+    shown = None
+    display_fps = 0.0
+    last_frame_at = time.perf_counter()
+
     while True:
         ret, frame = cap.read()
         if not ret:
             break
+        now = time.perf_counter()
+        worker.submit(frame, now)
+
+        # Latest mask, moved along with the face since the frame it was computed on
+        result = worker.latest()
+        overlay_ms = None
+        vis = frame
+        if result is not None:
+            if result is not shown:
+                follower.anchor(result["frame"], result["face_box"])
+                shown = result
+            box = follower.follow(frame)
+            if box is not None:
+                anchor_box = result["face_box"]
+                shift = (box[0] - anchor_box[0], box[1] - anchor_box[1])
+                vis = apply_mask(frame, result["mask"], result["roi"], shift)
+                overlay_ms = (now - result["captured_at"]) * 1000.0
 
-        # SAM 2 segmentation
-        vis = segment_hair(frame)
+        fps = 1.0 / max(1e-6, now - last_frame_at)
+        display_fps = fps if not display_fps else 0.9 * display_fps + 0.1 * fps
+        last_frame_at = now
+        if vis is frame:
+            vis = frame.copy()
+        draw_stats(vis, display_fps, worker.infer_fps, overlay_ms)
 
         cv2.imshow("SAM2 Hair Segmentation", vis)
         if cv2.waitKey(1) & 0xFF == ord('q'):
             break
 
+    worker.stop()
+    face_detector.close()
     cap.release()
     cv2.destroyAllWindows()
 
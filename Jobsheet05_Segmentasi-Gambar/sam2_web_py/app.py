@@ -2,62 +2,361 @@
 https://huggingface.co/facebook/sam2-hiera-tiny/blob/f245b47be73d8858fb7543a8b9c1c720d9f98779/sam2_hiera_tiny.pt
 """
 import base64
-from typing import Optional
+import json
+import math
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
 
 import cv2
 import numpy as np
-from flask import Flask, jsonify, render_template, request
+from flask import Flask, Response, jsonify, make_response, render_template, request
 from flask_cors import CORS
 
-from sam2_utils import segment_and_color
+from embedding_cache import image_token
+from inference_worker import FutureTimeoutError, InferenceWorker, QueueFullError, run_with_timeout
+import metrics
+from metrics import RECENT_LATENCY_MS, REQUESTS, STAGE_SECONDS, UPLOAD_BYTES, Gauge, process_rss_bytes
+from result_encoding import ACCEPT_TO_FORMAT, encode_result, normalize_format
+from sam2_utils import (
+    EMBEDDING_CACHE,
+    GENERATOR_PRESETS,
+    INPUT_SIZE,
+    PRECISION_REPORT_PATH,
+    RESIZE_MODE,
+    TRACK_SESSIONS,
+    SegmentJob,
+    SessionExpiredError,
+    is_ready,
+    model_status,
+    segment_batch,
+    start_background_init,
+    tracking_available,
+    validate_prompts,
+)
 
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=["X-Image-Token", "X-Mask-Size", "Retry-After", "Server-Timing"])
 app.config["MAX_CONTENT_LENGTH"] = 15 * 1024 * 1024  # 15 MB upload guard
 
+# All model calls go through one bounded queue; requests that arrive within
+# the batch window are grouped into a single batched SAM2 call.
+INFERENCE = InferenceWorker(
+    segment_batch,
+    max_queue=int(os.environ.get("SAM2_MAX_QUEUE", "8")),
+    max_batch=int(os.environ.get("SAM2_MAX_BATCH", "4")),
+    batch_window=float(os.environ.get("SAM2_BATCH_WINDOW_MS", "15")) / 1000.0,
+    num_workers=int(os.environ.get("SAM2_WORKERS", "1")),
+)
+_REQUEST_TIMEOUT = float(os.environ.get("SAM2_REQUEST_TIMEOUT", "120"))
+# WebSocket streaming server (ws_server.py); 0 disables it.
+_WS_PORT = int(os.environ.get("SAM2_WS_PORT", "8001"))
+# Seconds a client should wait before retrying while the model is loading.
+_LOADING_RETRY_AFTER = 5
+# Round-trip time the phone client aims for when picking JPEG quality and
+# capture interval (see /api/config).
+_TARGET_RTT_MS = int(os.environ.get("SAM2_TARGET_RTT_MS", "1000"))
 
-def _decode_image_from_request() -> Optional[np.ndarray]:
-    """Decode an image sent as multipart 'frame' or JSON base64."""
-    if "frame" in request.files:
+# Download, build and warm up SAM2 in the background so the UI is served
+# immediately; /readyz reports when segmentation requests can be served.
+start_background_init()
+
+
+def _model_info() -> Dict[Tuple[Tuple[str, str], ...], float]:
+    status = model_status()
+    labels = tuple((key, str(status.get(key) or "")) for key in ("model", "backend", "precision", "status"))
+    return {labels: 1.0}
+
+
+# Gauges are evaluated on scrape, so they cost nothing between scrapes.
+metrics.register(Gauge("sam2_requests_in_flight", "Jobs currently running on the model.",
+                       lambda: INFERENCE.stats()["in_flight"]))
+metrics.register(Gauge("sam2_requests_queued", "Jobs waiting in the inference queue.",
+                       lambda: INFERENCE.stats()["queued"]))
+metrics.register(Gauge("sam2_model_info", "Model in use (value is always 1).", _model_info))
+metrics.register(Gauge("sam2_embedding_cache_bytes", "Bytes held by the embedding cache.",
+                       lambda: EMBEDDING_CACHE.stats()["bytes"]))
+metrics.register(Gauge("sam2_tracking_sessions", "Open video tracking sessions.",
+                       lambda: TRACK_SESSIONS.stats()["sessions"]))
+metrics.register(Gauge("sam2_tracking_memory_bytes", "Bytes held by tracking memory banks.", TRACK_SESSIONS.nbytes))
+metrics.register(Gauge("process_resident_memory_bytes", "Resident memory size in bytes.", process_rss_bytes))
+
+
+def _decode_image(data: bytes) -> Optional[np.ndarray]:
+    np_data = np.frombuffer(data, dtype=np.uint8)
+    return cv2.imdecode(np_data, cv2.IMREAD_COLOR)
+
+
+_BINARY_UPLOAD_TYPES = ("image/jpeg", "image/png", "image/webp", "application/octet-stream")
+
+
+def _decode_image_from_request() -> Tuple[Optional[np.ndarray], Optional[bytes]]:
+    """
+    Decode an image sent as a raw binary body, multipart 'frame' or JSON
+    base64; also return the raw bytes.
+    """
+    if request.mimetype in _BINARY_UPLOAD_TYPES:
+        data = request.get_data(cache=False)
+        if not data:
+            return None, None
+    elif "frame" in request.files:
         data = request.files["frame"].read()
     else:
         payload = request.get_json(silent=True) or {}
         raw_b64 = payload.get("image_base64")
         if not raw_b64:
-            return None
+            return None, None
         # Accept data URI or plain base64
         b64_str = raw_b64.split(",", 1)[-1]
         data = base64.b64decode(b64_str)
 
-    np_data = np.frombuffer(data, dtype=np.uint8)
-    image = cv2.imdecode(np_data, cv2.IMREAD_COLOR)
-    return image
+    UPLOAD_BYTES.observe(len(data))
+    with STAGE_SECONDS.time("decode"):
+        return _decode_image(data), data
+
+
+def _raw_field(name: str) -> Any:
+    """A request field from the query string, a multipart form or a JSON body."""
+    if name in request.args:
+        return request.args[name]
+    if name in request.form:
+        return request.form[name]
+    payload = request.get_json(silent=True) or {}
+    return payload.get(name)
+
+
+def _prompt_field(name: str) -> Any:
+    """Prompt field; query/form values are JSON strings, JSON bodies hold values."""
+    value = _raw_field(name)
+    if isinstance(value, str):
+        return json.loads(value) if value else None
+    return value
+
+
+def _parse_prompts() -> Dict[str, Any]:
+    """
+    Optional SAM2 prompts in original image pixels (see validate_prompts).
+    Raises ValueError on malformed input.
+    """
+    try:
+        points = _prompt_field("points")
+        labels = _prompt_field("labels")
+        box = _prompt_field("box")
+    except json.JSONDecodeError as exc:
+        raise ValueError(f"Invalid prompt JSON: {exc}") from exc
+    return validate_prompts(points, labels, box)
+
+
+def _parse_preset() -> Optional[str]:
+    """Optional ?preset=fast|balanced|quality for the automatic generator."""
+    preset = _raw_field("preset")
+    if not preset:
+        return None
+    preset = str(preset).lower()
+    if preset not in GENERATOR_PRESETS:
+        raise ValueError(f"Unknown preset '{preset}'; use one of {', '.join(GENERATOR_PRESETS)}")
+    return preset
+
+
+def _parse_session() -> Tuple[Optional[str], bool]:
+    """Optional tracking ?session=<id> (or X-Session-Id) and ?keyframe=1."""
+    session = _raw_field("session") or request.headers.get("X-Session-Id")
+    if not session:
+        return None, False
+    session = str(session)
+    if len(session) > 64:
+        raise ValueError("session id must be at most 64 characters")
+    if not tracking_available():
+        raise ValueError("Tracking sessions need SAM2_BACKEND=torch")
+    keyframe = str(_raw_field("keyframe") or "").lower() in ("1", "true", "yes")
+    return session, keyframe
+
+
+def _negotiate_format() -> Tuple[str, int]:
+    """Pick the response format from ?format=/field, else the Accept header."""
+    fmt = _raw_field("format")
+    if not fmt:
+        best = request.accept_mimetypes.best_match(list(ACCEPT_TO_FORMAT), default="application/json")
+        fmt = ACCEPT_TO_FORMAT.get(best, "json")
+    return normalize_format(fmt, _raw_field("quality"))
+
+
+def _encode_response(
+    fmt: str, quality: int, image: np.ndarray, mask_small: Optional[np.ndarray], token: Optional[str]
+) -> Any:
+    try:
+        body, mimetype, headers = encode_result(fmt, quality, image, mask_small)
+    except RuntimeError as exc:
+        return jsonify({"error": str(exc)}), 500
+
+    if isinstance(body, dict):
+        body["image_token"] = token
+        return jsonify(body), 200
+    headers["X-Image-Token"] = token or ""
+    return Response(body, status=200, mimetype=mimetype, headers=headers)
 
 
 @app.route("/", methods=["GET"])
 def index():
-    return render_template("index.html")
+    return render_template("index.html", ws_port=_WS_PORT)
 
 
 @app.route("/api/segment", methods=["POST"])
 def segment():
-    image = _decode_image_from_request()
+    started = time.perf_counter()
+    with STAGE_SECONDS.time("request"):
+        response = make_response(_segment())
+    elapsed_ms = (time.perf_counter() - started) * 1000.0
+    REQUESTS.inc(str(response.status_code))
+    if response.status_code == 200:
+        RECENT_LATENCY_MS.observe(elapsed_ms)
+    # Lets the client tell server time from network time in its measured RTT.
+    response.headers["Server-Timing"] = f"segment;dur={elapsed_ms:.1f}"
+    return response
+
+
+def _segment():
+    """
+    Upload: raw image body (Content-Type image/*), multipart 'frame', or
+    JSON image_base64; or only image_token to reuse an earlier upload.
+    Output: ?format=json|png|jpeg|webp|mask-png|rle|alpha (&quality=1..100),
+    or negotiated from the Accept header; JSON stays the default.
+    Without prompts, ?preset=fast|balanced|quality tunes the automatic
+    generator (default from SAM2_PRESET).
+    With ?session=<id>, prompts start tracking an object (or add a keyframe
+    with &keyframe=1) and later frames without prompts follow it.
+    """
+    try:
+        prompts = _parse_prompts()
+        token = _raw_field("image_token") or request.headers.get("X-Image-Token")
+        output_format, quality = _negotiate_format()
+        preset = _parse_preset()
+        session, keyframe = _parse_session()
+    except (TypeError, ValueError) as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    image, data = _decode_image_from_request()
+    if image is not None:
+        token = image_token(image)
+        EMBEDDING_CACHE.put_image(token, data)
+    elif data is not None:
+        return jsonify({"error": "Could not decode image"}), 400
+    elif token:
+        # Follow-up prompt on an earlier frame: no re-upload needed.
+        entry = EMBEDDING_CACHE.get(str(token))
+        if entry is None:
+            return jsonify({"error": "Image token expired; please capture again", "code": "token_expired"}), 404
+        image = _decode_image(entry.image_bytes)
+        token = str(token)
     if image is None:
         return jsonify({"error": "No image provided"}), 400
 
+    if not is_ready():
+        status = model_status()
+        if status["status"] == "failed":
+            return jsonify({"error": f"Model failed to load: {status['error']}", "model": status}), 500
+        response = jsonify({"error": "Model is still loading, please retry", "model": status})
+        response.headers["Retry-After"] = str(_LOADING_RETRY_AFTER)
+        return response, 503
+
+    job = SegmentJob(image, token=token, preset=preset, session=session, keyframe=keyframe, **prompts)
+    try:
+        future = INFERENCE.submit(job)
+    except QueueFullError as exc:
+        response = jsonify({"error": "Server busy, please retry", "queue": INFERENCE.stats()})
+        response.headers["Retry-After"] = str(math.ceil(exc.retry_after))
+        return response, 503
+
     try:
-        processed = segment_and_color(image)
+        mask_small = run_with_timeout(future, _REQUEST_TIMEOUT)
+    except FutureTimeoutError:
+        return jsonify({"error": "Segmentation timed out"}), 504
+    except SessionExpiredError:
+        return jsonify({"error": "Tracking session expired; prompt again", "code": "session_expired"}), 404
     except Exception as exc:  # pylint: disable=broad-except
         return jsonify({"error": f"Segmentation failed: {exc}"}), 500
 
-    success, buffer = cv2.imencode(".png", processed)
-    if not success:
-        return jsonify({"error": "Encoding failed"}), 500
+    return _encode_response(output_format, quality, image, mask_small, token)
+
+
+@app.route("/api/config", methods=["GET"])
+def client_config():
+    """
+    What the phone client needs to size its uploads: the model input size
+    (frames are resized to fit it, so larger uploads are wasted bandwidth),
+    recent server latency and the round-trip target to adapt towards.
+    """
+    status = model_status()
+    return jsonify({
+        "input_size": INPUT_SIZE,
+        "resize_mode": RESIZE_MODE,
+        "target_rtt_ms": _TARGET_RTT_MS,
+        "server_latency_ms": RECENT_LATENCY_MS.summary(),
+        "queued": INFERENCE.stats()["queued"],
+        "jpeg_quality": {"min": 0.4, "max": 0.9, "start": 0.8},
+        "interval_ms": {"min": 100, "max": 3000},
+        "ws_port": _WS_PORT,
+        "tracking": tracking_available(),
+        "model": {key: status[key] for key in ("model", "backend", "precision", "status")},
+    }), 200
 
-    encoded = base64.b64encode(buffer.tobytes()).decode("utf-8")
-    return jsonify({"image_base64": f"data:image/png;base64,{encoded}"}), 200
+
+@app.route("/api/queue", methods=["GET"])
+def queue_status():
+    return jsonify({
+        "inference": INFERENCE.stats(),
+        "embedding_cache": EMBEDDING_CACHE.stats(),
+        "tracking": TRACK_SESSIONS.stats(),
+    }), 200
+
+
+@app.route("/api/session/<session_id>", methods=["DELETE"])
+def end_session(session_id: str):
+    """Free a tracking session's memory bank before its idle TTL runs out."""
+    return jsonify({"dropped": TRACK_SESSIONS.drop(session_id)}), 200
+
+
+@app.route("/api/precision", methods=["GET"])
+def precision_status():
+    """Active precision/thread settings plus the last precision_report.py run, if any."""
+    status = model_status()
+    active = {key: status[key] for key in ("precision", "requested_precision", "threads", "inference_mode", "warmup_ms")}
+    report = None
+    if PRECISION_REPORT_PATH.exists():
+        with PRECISION_REPORT_PATH.open("r", encoding="utf-8") as handle:
+            report = json.load(handle)
+    return jsonify({"active": active, "report": report}), 200
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Prometheus text exposition: per-stage histograms, queue gauges, RSS."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    """Liveness: the process is up; includes model loading progress."""
+    return jsonify({"status": "ok", "model": model_status()}), 200
+
+
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    """Readiness: 200 once the model is loaded and warmed up, else 503."""
+    status = model_status()
+    if status["status"] == "ready":
+        return jsonify({"ready": True, "model": status}), 200
+    response = jsonify({"ready": False, "model": status})
+    if status["status"] != "failed":
+        response.headers["Retry-After"] = str(_LOADING_RETRY_AFTER)
+    return response, 503
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8000, debug=True)
+    if _WS_PORT:
+        from ws_server import start_in_thread
+
+        start_in_thread(INFERENCE, port=_WS_PORT)
+    # The debug reloader would import (and load SAM2) twice; opt in with FLASK_DEBUG=1.
+    app.run(host="0.0.0.0", port=int(os.environ.get("SAM2_PORT", "8000")), debug=os.environ.get("FLASK_DEBUG") == "1", threaded=True)
@@ -0,0 +1,128 @@
+"""LRU cache of SAM2 image embeddings keyed by an image token."""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+
+def image_token(image_bgr: np.ndarray) -> str:
+    """Stable token for decoded pixels (shape + content)."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(image_bgr.shape).encode("ascii"))
+    digest.update(np.ascontiguousarray(image_bgr).data)
+    return digest.hexdigest()
+
+
+def approx_nbytes(obj: Any) -> int:
+    """Approximate memory of tensors / arrays nested in dicts, lists and tuples."""
+    if obj is None:
+        return 0
+    if isinstance(obj, (bytes, bytearray)):
+        return len(obj)
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if hasattr(obj, "element_size") and hasattr(obj, "numel"):  # torch.Tensor
+        return int(obj.element_size() * obj.numel())
+    if isinstance(obj, dict):
+        return sum(approx_nbytes(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(approx_nbytes(v) for v in obj)
+    return 0
+
+
+@dataclass
+class CacheEntry:
+    image_bytes: bytes                    # original upload, decoded again on a hit
+    features: Optional[Dict[str, Any]] = None
+    orig_hw: Optional[tuple] = None       # image size the features were computed for
+    nbytes: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class EmbeddingCache:
+    """
+    Thread-safe LRU with a memory limit and an idle TTL.
+
+    Entries are created when an image is uploaded and gain encoder features
+    on the first prompted request, so follow-up prompts on the same frame
+    skip both the upload and the SAM2 image encoder.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float) -> None:
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _expire_locked(self, now: float) -> None:
+        expired = [k for k, e in self._entries.items() if now - e.last_used > self.ttl_seconds]
+        for key in expired:
+            self._bytes -= self._entries.pop(key).nbytes
+
+    def _evict_locked(self) -> None:
+        while self._bytes > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.nbytes
+
+    def get(self, token: str) -> Optional[CacheEntry]:
+        now = time.monotonic()
+        with self._lock:
+            self._expire_locked(now)
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            entry.last_used = now
+            self._entries.move_to_end(token)
+            return entry
+
+    def put_image(self, token: str, image_bytes: bytes) -> None:
+        """Remember an upload; keeps existing features for identical pixels."""
+        now = time.monotonic()
+        with self._lock:
+            self._expire_locked(now)
+            entry = self._entries.get(token)
+            if entry is None:
+                entry = CacheEntry(image_bytes=image_bytes, nbytes=len(image_bytes))
+                self._entries[token] = entry
+                self._bytes += entry.nbytes
+            entry.last_used = now
+            self._entries.move_to_end(token)
+            self._evict_locked()
+
+    def put_features(self, token: str, features: Dict[str, Any], orig_hw: tuple) -> None:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return  # evicted while the encoder was running
+            self._bytes -= entry.nbytes
+            entry.features = features
+            entry.orig_hw = orig_hw
+            entry.nbytes = len(entry.image_bytes) + approx_nbytes(features)
+            self._bytes += entry.nbytes
+            self._entries.move_to_end(token)
+            self._evict_locked()
+
+    def record(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
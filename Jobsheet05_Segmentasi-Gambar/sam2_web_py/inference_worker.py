@@ -0,0 +1,135 @@
+"""Bounded request queue + micro-batching inference workers for the SAM2 server."""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+class QueueFullError(RuntimeError):
+    """Raised by submit() when the request queue is at capacity."""
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__("Inference queue is full")
+        self.retry_after = retry_after
+
+
+class InferenceWorker:
+    """
+    Owns all model calls. Request threads only enqueue jobs and wait on a
+    Future, so the model is never touched concurrently from Flask threads.
+
+    Each worker thread takes one job, then keeps collecting jobs for up to
+    `batch_window` seconds (or until `max_batch`) and hands the whole group
+    to `handler(jobs) -> results` in one call. `handler` returns one result
+    per job; an Exception instance in the list fails only that job.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Sequence[Any]], List[Any]],
+        max_queue: int = 8,
+        max_batch: int = 4,
+        batch_window: float = 0.015,
+        num_workers: int = 1,
+    ) -> None:
+        self._handler = handler
+        self._queue: "queue.Queue[Tuple[Any, Future]]" = queue.Queue(maxsize=max_queue)
+        self.max_queue = max_queue
+        self.max_batch = max(1, max_batch)
+        self.batch_window = batch_window
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._rejected = 0
+        self._batches = 0
+        self._jobs_done = 0
+        self._last_batch_seconds = 0.0
+        self._threads = [
+            threading.Thread(target=self._run, name=f"sam2-infer-{i}", daemon=True)
+            for i in range(max(1, num_workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    # ------------------------------------------------------------------
+    def submit(self, job: Any) -> Future:
+        """Enqueue without blocking; raises QueueFullError when saturated."""
+        future: Future = Future()
+        try:
+            self._queue.put_nowait((job, future))
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            raise QueueFullError(self.retry_after()) from None
+        return future
+
+    def retry_after(self) -> float:
+        """Rough seconds until a slot frees up, for the Retry-After header."""
+        with self._lock:
+            per_batch = self._last_batch_seconds or 1.0
+        return max(1.0, per_batch * (self._queue.qsize() / self.max_batch + 1))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "rejected": self._rejected,
+                "batches": self._batches,
+                "jobs_done": self._jobs_done,
+                "avg_batch_size": (self._jobs_done / self._batches) if self._batches else 0.0,
+                "last_batch_seconds": self._last_batch_seconds,
+            }
+
+    # ------------------------------------------------------------------
+    def _collect(self) -> List[Tuple[Any, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            # Drop jobs whose client already gave up.
+            batch = [(job, fut) for job, fut in batch if fut.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            with self._lock:
+                self._in_flight += len(batch)
+            started = time.perf_counter()
+            try:
+                results: List[Any] = self._handler([job for job, _ in batch])
+            except Exception as exc:  # pylint: disable=broad-except
+                results = [exc] * len(batch)
+            elapsed = time.perf_counter() - started
+
+            for (_, future), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+            with self._lock:
+                self._in_flight -= len(batch)
+                self._batches += 1
+                self._jobs_done += len(batch)
+                self._last_batch_seconds = elapsed
+
+
+def run_with_timeout(future: Future, timeout: Optional[float]) -> Any:
+    """Wait for a job; cancel it if it has not started before the timeout."""
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        raise
@@ -0,0 +1,347 @@
+"""
+Load test /api/segment with N concurrent simulated phone clients.
+
+Starts app.py (stub model by default, fully offline) or targets a running
+server, replays a corpus of JPEG frames from each client in a closed loop,
+and reports throughput, latency percentiles, error/reject rates and server
+RSS over time. The JSON summary can be compared against an earlier run.
+
+Usage:
+  python load_test.py [--clients 8] [--duration 30] [--backend stub|torch|onnx]
+                      [--latency-ms 50 | 40-120] [--frames DIR] [--mode auto|point]
+                      [--output PATH] [--compare OLD.json] [--url http://host:8000]
+
+--backend torch/onnx uses the real model; its weights must already be in
+the model store, because the server is started with MODEL_STORE_OFFLINE=1.
+
+The summary (--output) and the server log (--server-log) are written to
+$LOAD_TEST_DIR, by default <system temp>/sam2_load_test, not the source tree.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+import requests
+
+try:  # type: ignore
+    import psutil  # type: ignore
+except Exception:  # pylint: disable=broad-except
+    psutil = None
+
+HERE = Path(__file__).resolve().parent
+# Results and the server log go outside the source tree by default.
+OUTPUT_DIR = Path(os.environ.get("LOAD_TEST_DIR", Path(tempfile.gettempdir()) / "sam2_load_test"))
+DEFAULT_OUTPUT = OUTPUT_DIR / "load_test_results.json"
+
+
+# ==========================
+# CORPUS
+# ==========================
+def _synthetic_frames(count: int = 8, size: tuple = (640, 480), seed: int = 0) -> List[np.ndarray]:
+    """Camera-sized frames with a few random shapes; deterministic per seed."""
+    rng = np.random.default_rng(seed)
+    w, h = size
+    frames = []
+    for _ in range(count):
+        frame = np.full((h, w, 3), rng.integers(40, 200, size=3), dtype=np.uint8)
+        for _ in range(4):
+            center = (int(rng.integers(0, w)), int(rng.integers(0, h)))
+            color = tuple(int(c) for c in rng.integers(0, 256, size=3))
+            cv2.circle(frame, center, int(rng.integers(20, min(w, h) // 3)), color, -1)
+        frames.append(frame)
+    return frames
+
+
+def load_corpus(folder: str) -> List[np.ndarray]:
+    if not folder:
+        return _synthetic_frames()
+    frames = []
+    for path in sorted(Path(folder).iterdir()):
+        image = cv2.imread(str(path), cv2.IMREAD_COLOR)
+        if image is not None:
+            frames.append(image)
+    if not frames:
+        raise SystemExit(f"[ERROR] No readable images in {folder}")
+    return frames
+
+
+def _encode(frame: np.ndarray, stamp: Optional[int], quality: int) -> bytes:
+    if stamp is not None:
+        # An 8x8 corner block that differs per request: every upload is a new
+        # image token, like a live camera, so the embedding cache does not help.
+        frame = frame.copy()
+        frame[:8, :8] = [(stamp >> shift) & 0xFF for shift in (0, 8, 16)]
+    success, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not success:
+        raise RuntimeError("JPEG encoding failed")
+    return buffer.tobytes()
+
+
+# ==========================
+# SERVER
+# ==========================
+def start_server(args: argparse.Namespace) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "SAM2_BACKEND": args.backend,
+        "SAM2_STUB_LATENCY_MS": args.latency_ms,
+        "SAM2_STUB_SEED": str(args.seed),
+        "SAM2_PORT": str(args.port),
+        "SAM2_WS_PORT": "0",
+        "MODEL_STORE_OFFLINE": "1",
+    })
+    os.makedirs(os.path.dirname(args.server_log) or ".", exist_ok=True)
+    log = open(args.server_log, "w", encoding="utf-8")  # pylint: disable=consider-using-with
+    print(f"[INFO] Starting app.py (backend={args.backend}) on port {args.port}, log: {args.server_log}")
+    return subprocess.Popen(
+        [sys.executable, str(HERE / "app.py")], cwd=str(HERE), env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+
+
+def wait_ready(url: str, timeout: float, server: Optional[subprocess.Popen]) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise SystemExit(f"[ERROR] Server exited with code {server.returncode}; see the server log")
+        try:
+            response = requests.get(f"{url}/readyz", timeout=2)
+            if response.status_code == 200:
+                return
+            status = response.json().get("model", {})
+            if status.get("status") == "failed":
+                raise SystemExit(f"[ERROR] Model failed to load: {status.get('error')}")
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise SystemExit(f"[ERROR] Server not ready after {timeout:.0f} s")
+
+
+def rss_bytes(pid: int) -> Optional[int]:
+    if psutil is not None:
+        try:
+            return int(psutil.Process(pid).memory_info().rss)
+        except Exception:  # pylint: disable=broad-except
+            return None
+    try:
+        with open(f"/proc/{pid}/statm", "r", encoding="ascii") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _sample_rss(pid: int, interval: float, stop: threading.Event, started: float, out: List[List[float]]) -> None:
+    while not stop.is_set():
+        value = rss_bytes(pid)
+        if value is not None:
+            out.append([round(time.perf_counter() - started, 2), round(value / 2**20, 1)])
+        stop.wait(interval)
+
+
+# ==========================
+# CLIENTS
+# ==========================
+def _client(
+    index: int, args: argparse.Namespace, corpus: List[np.ndarray], deadline: float, records: List[Dict[str, Any]]
+) -> None:
+    session = requests.Session()
+    params = {"format": args.format}
+    if args.preset:
+        params["preset"] = args.preset
+    sent = 0
+    while time.perf_counter() < deadline and (not args.requests or sent < args.requests):
+        frame = corpus[(index + sent) % len(corpus)]
+        body = _encode(frame, None if args.reuse_frames else index * 1_000_000 + sent, args.jpeg_quality)
+        query = dict(params)
+        if args.mode == "point":
+            h, w = frame.shape[:2]
+            query["points"] = json.dumps([[w // 2, h // 2]])
+        started = time.perf_counter()
+        error = None
+        try:
+            response = session.post(
+                f"{args.url}/api/segment", params=query, data=body,
+                headers={"Content-Type": "image/jpeg"}, timeout=args.timeout,
+            )
+            status = response.status_code  # body already read: download time is included
+        except requests.RequestException as exc:
+            status, error = 0, str(exc)
+            if not records or records[-1].get("error") != error:
+                print(f"[WARN] client {index}: {error}")
+        records.append({
+            "client": index,
+            "t": started,
+            "latency_ms": (time.perf_counter() - started) * 1000.0,
+            "status": status,
+            "bytes_up": len(body),
+            "error": error,
+        })
+        sent += 1
+        if status == 503:
+            time.sleep(max(args.think_ms / 1000.0, 0.05))  # back off a little on reject
+        elif args.think_ms:
+            time.sleep(args.think_ms / 1000.0)
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    return round(float(np.percentile(values, q)), 1)
+
+
+def summarize(records: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    ok = [r["latency_ms"] for r in records if r["status"] == 200]
+    total = len(records)
+    rejected = sum(1 for r in records if r["status"] == 503)
+    errors = total - len(ok) - rejected
+    by_status: Dict[str, int] = {}
+    for r in records:
+        by_status[str(r["status"])] = by_status.get(str(r["status"]), 0) + 1
+    return {
+        "requests": total,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": _percentile(ok, 50),
+            "p95": _percentile(ok, 95),
+            "p99": _percentile(ok, 99),
+            "mean": round(statistics.fmean(ok), 1) if ok else None,
+            "max": round(max(ok), 1) if ok else None,
+        },
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "reject_rate": round(rejected / total, 4) if total else 0.0,
+        "status_counts": by_status,
+        "mean_upload_kb": round(statistics.fmean(r["bytes_up"] for r in records) / 1024, 1) if records else None,
+    }
+
+
+def compare(current: Dict[str, Any], previous: Dict[str, Any]) -> None:
+    """Print the headline numbers of two runs side by side."""
+    rows = [
+        ("throughput_rps", lambda s: s["throughput_rps"]),
+        ("p50_ms", lambda s: s["latency_ms"]["p50"]),
+        ("p95_ms", lambda s: s["latency_ms"]["p95"]),
+        ("p99_ms", lambda s: s["latency_ms"]["p99"]),
+        ("error_rate", lambda s: s["error_rate"]),
+        ("reject_rate", lambda s: s["reject_rate"]),
+        ("rss_peak_mb", lambda s: s.get("rss_peak_mb")),
+    ]
+    print(f"{'metric':<16}{'previous':>12}{'current':>12}{'change':>10}")
+    for name, get in rows:
+        old, new = get(previous["summary"]), get(current["summary"])
+        change = f"{(new - old) / old * 100:+.1f}%" if old and new is not None else "-"
+        print(f"{name:<16}{str(old):>12}{str(new):>12}{change:>10}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="", help="target a running server instead of starting app.py")
+    parser.add_argument("--backend", default="stub", choices=("stub", "torch", "onnx"))
+    parser.add_argument("--latency-ms", default="50", help="stub encoder latency: fixed '50' or range '20-80'")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load (after the server is ready)")
+    parser.add_argument("--requests", type=int, default=0, help="stop each client after this many requests")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="pause between a response and the next request")
+    parser.add_argument("--frames", default="", help="folder of JPEG/PNG frames (default: synthetic 640x480)")
+    parser.add_argument("--reuse-frames", action="store_true", help="send identical bytes so image tokens repeat")
+    parser.add_argument("--jpeg-quality", type=int, default=80)
+    parser.add_argument("--mode", default="auto", choices=("auto", "point"), help="generator or centre-tap prompt")
+    parser.add_argument("--preset", default="", help="generator preset for --mode auto")
+    parser.add_argument("--format", default="alpha", help="response format requested from /api/segment")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--ready-timeout", type=float, default=600.0)
+    parser.add_argument("--rss-interval", type=float, default=0.5)
+    parser.add_argument("--server-log", default=str(OUTPUT_DIR / "load_test_server.log"))
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT))
+    parser.add_argument("--compare", default="", help="earlier JSON summary to compare against")
+    args = parser.parse_args()
+
+    server = None
+    if not args.url:
+        args.url = f"http://127.0.0.1:{args.port}"
+        server = start_server(args)
+    try:
+        wait_ready(args.url, args.ready_timeout, server)
+        corpus = load_corpus(args.frames)
+        print(f"[OK] Server ready; {args.clients} client(s), {len(corpus)} frame(s), {args.duration:.0f} s")
+
+        rss_timeline: List[List[float]] = []
+        stop = threading.Event()
+        started = time.perf_counter()
+        sampler = None
+        if server is not None:
+            sampler = threading.Thread(
+                target=_sample_rss, args=(server.pid, args.rss_interval, stop, started, rss_timeline), daemon=True
+            )
+            sampler.start()
+
+        per_client: List[List[Dict[str, Any]]] = [[] for _ in range(args.clients)]
+        deadline = started + args.duration
+        threads = [
+            threading.Thread(target=_client, args=(k, args, corpus, deadline, per_client[k]), daemon=True)
+            for k in range(args.clients)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        if sampler is not None:
+            sampler.join()
+
+        records = [r for client_records in per_client for r in client_records]
+        summary = summarize(records, elapsed)
+        if rss_timeline:
+            summary["rss_start_mb"] = rss_timeline[0][1]
+            summary["rss_peak_mb"] = max(mb for _, mb in rss_timeline)
+            summary["rss_end_mb"] = rss_timeline[-1][1]
+        try:
+            server_stats = requests.get(f"{args.url}/api/queue", timeout=5).json()
+        except (requests.RequestException, ValueError):
+            server_stats = None
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    result = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            key: getattr(args, key)
+            for key in ("backend", "latency_ms", "seed", "clients", "duration", "requests", "think_ms",
+                        "frames", "reuse_frames", "jpeg_quality", "mode", "preset", "format", "url")
+        },
+        "summary": summary,
+        "rss_mb_timeline": rss_timeline,
+        "server_stats": server_stats,
+    }
+    for key, value in summary.items():
+        print(f"[OK] {key}: {value}")
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as handle:
+        json.dump(result, handle, indent=2)
+    print(f"[OK] Summary written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as handle:
+            compare(result, json.load(handle))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Minimal Prometheus-style metrics (text exposition format 0.0.4).
+
+No dependency on prometheus_client: a histogram observation is one
+perf_counter pair, a bisect and a lock, so per-stage timing costs a few
+microseconds per request.
+"""
+import bisect
+import collections
+import contextlib
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+try:  # type: ignore
+    import psutil  # type: ignore
+except Exception:  # pylint: disable=broad-except
+    psutil = None
+
+GaugeValue = Union[None, float, Dict[Tuple[Tuple[str, str], ...], float]]
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = tuple(2 ** k * 1024 for k in range(4, 15))  # 16 KiB .. 16 MiB
+
+
+def _labels(pairs: Sequence[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    body = ",".join(f'{key}="{str(value)}"' for key, value in pairs)
+    return "{" + body + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram with one optional label (e.g. stage)."""
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float], label: Optional[str] = None) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.label = label
+        self._lock = threading.Lock()
+        # label value -> [per-bucket counts..., +Inf count], sum
+        self._counts: Dict[str, List[int]] = {}
+        self._sums: Dict[str, float] = {}
+
+    def observe(self, value: float, label_value: str = "") -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(label_value)
+            if counts is None:
+                counts = self._counts[label_value] = [0] * (len(self.buckets) + 1)
+                self._sums[label_value] = 0.0
+            counts[index] += 1
+            self._sums[label_value] += value
+
+    @contextlib.contextmanager
+    def time(self, label_value: str = "") -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, label_value)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {key: (list(counts), self._sums[key]) for key, counts in self._counts.items()}
+        for label_value, (counts, total) in sorted(snapshot.items()):
+            base = [(self.label, label_value)] if self.label else []
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(base + [('le', repr(float(bound)))])} {cumulative}")
+            cumulative += counts[-1]
+            lines.append(f"{self.name}_bucket{_labels(base + [('le', '+Inf')])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(base)} {total}")
+            lines.append(f"{self.name}_count{_labels(base)} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label: Optional[str] = None) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._lock = threading.Lock()
+        self._values: Dict[str, float] = {}
+
+    def inc(self, label_value: str = "", amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for label_value, value in sorted(values.items()):
+            base = [(self.label, label_value)] if self.label else []
+            lines.append(f"{self.name}{_labels(base)} {value}")
+        return lines
+
+
+class Gauge:
+    """Gauge evaluated at scrape time; the callback returns a number, a
+    {label-pairs: number} dict, or None to skip the sample."""
+
+    def __init__(self, name: str, help_text: str, callback: Callable[[], GaugeValue]) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        value = self.callback()
+        if value is None:
+            return []
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        samples = value if isinstance(value, dict) else {(): value}
+        for pairs, sample in samples.items():
+            lines.append(f"{self.name}{_labels(pairs)} {float(sample)}")
+        return lines
+
+
+class RecentSamples:
+    """The last `size` observations, for "how fast is it right now" summaries."""
+
+    def __init__(self, size: int = 50) -> None:
+        self._samples: collections.deque = collections.deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._samples.append(value)
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return {"p50": None, "p90": None, "samples": 0}
+        last = len(samples) - 1
+        return {
+            "p50": round(samples[min(last, len(samples) // 2)], 1),
+            "p90": round(samples[min(last, int(0.9 * len(samples)))], 1),
+            "samples": len(samples),
+        }
+
+
+def process_rss_bytes() -> Optional[float]:
+    """Resident set size of this process, or None if it cannot be read."""
+    if psutil is not None:
+        return float(psutil.Process().memory_info().rss)
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as handle:
+            return float(int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE"))
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+# Shared instruments; stages are labelled by where the time goes.
+STAGE_SECONDS = Histogram(
+    "sam2_stage_seconds", "Time spent per processing stage.", SECONDS_BUCKETS, label="stage"
+)
+UPLOAD_BYTES = Histogram("sam2_upload_bytes", "Size of uploaded frames.", BYTES_BUCKETS)
+# Server-side milliseconds per segmented frame (HTTP and WebSocket), advertised
+# to clients on /api/config so they can pace uploads.
+RECENT_LATENCY_MS = RecentSamples()
+REQUESTS = Counter("sam2_requests_total", "Finished /api/segment requests by HTTP status.", label="status")
+
+_REGISTRY: List[object] = [STAGE_SECONDS, UPLOAD_BYTES, REQUESTS]
+_REGISTRY_LOCK = threading.Lock()
+
+
+def register(metric: object) -> None:
+    with _REGISTRY_LOCK:
+        _REGISTRY.append(metric)
+
+
+def render() -> str:
+    with _REGISTRY_LOCK:
+        metrics = list(_REGISTRY)
+    lines: List[str] = []
+    for metric in metrics:
+        lines.extend(metric.render())  # type: ignore[attr-defined]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,364 @@
+"""
+ONNX Runtime backend for SAM2 (SAM2_BACKEND=onnx).
+
+The image encoder and the mask decoder (single- and multi-mask variants)
+are exported from the PyTorch model once and cached next to the
+checkpoint. Afterwards the server runs on onnxruntime's CPU execution
+provider without importing torch or sam2 at all.
+
+OnnxImagePredictor mirrors the parts of SAM2ImagePredictor that sam2_utils
+uses (set_image[_batch], predict[_batch], reset_predictor and the
+_features/_orig_hw state used by the embedding cache), so request handling
+is identical for both backends.
+"""
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# Shared Jobsheet05 helpers (mask_codec, ...) live one folder up. Appended, not
+# prepended: that folder's sam2.py script must not shadow the sam2 package.
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+import mask_codec  # noqa: E402  pylint: disable=wrong-import-position
+
+try:  # type: ignore
+    import onnxruntime as ort  # type: ignore
+except Exception:  # pylint: disable=broad-except
+    ort = None
+
+IMAGE_SIZE = 1024  # SAM2 encoder input (square, no padding)
+_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32) * 255.0
+_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32) * 255.0
+_OPSET = 17
+
+# bf16 has no CPU kernels in onnxruntime; int8 quantizes the encoder graph.
+ONNX_PRECISIONS = ("fp32", "int8")
+
+
+def resolve_precision(requested: str) -> str:
+    requested = (requested or "fp32").lower()
+    if requested == "bf16":
+        return "fp32"
+    if requested not in ONNX_PRECISIONS:
+        raise ValueError("SAM2_PRECISION must be one of fp32, bf16, int8")
+    return requested
+
+
+def graph_paths(cache_dir: Path, model_name: str, precision: str) -> Dict[str, Path]:
+    suffix = ".int8" if precision == "int8" else ""
+    return {
+        "encoder": cache_dir / f"{model_name}.encoder{suffix}.onnx",
+        "decoder_single": cache_dir / f"{model_name}.decoder_single.onnx",
+        "decoder_multi": cache_dir / f"{model_name}.decoder_multi.onnx",
+    }
+
+
+def graphs_cached(cache_dir: Path, model_name: str, precision: str, checkpoint: Optional[Path] = None) -> bool:
+    """True if every graph exists and is newer than the checkpoint (if present)."""
+    paths = graph_paths(cache_dir, model_name, precision).values()
+    if not all(p.is_file() for p in paths):
+        return False
+    if checkpoint is not None and checkpoint.is_file():
+        ckpt_mtime = checkpoint.stat().st_mtime
+        return all(p.stat().st_mtime >= ckpt_mtime for p in paths)
+    return True
+
+
+# ==========================
+# ONE-TIME EXPORT (needs torch + sam2)
+# ==========================
+def export_graphs(model: Any, cache_dir: Path, model_name: str, precision: str) -> Dict[str, Path]:
+    """Export encoder + decoders from a built SAM2 model; atomic writes."""
+    import torch  # pylint: disable=import-outside-toplevel
+
+    class _Encoder(torch.nn.Module):
+        def __init__(self, sam: Any) -> None:
+            super().__init__()
+            self.sam = sam
+
+        def forward(self, image: Any) -> Tuple[Any, Any, Any]:
+            backbone_out = self.sam.forward_image(image)
+            _, vision_feats, _, feat_sizes = self.sam._prepare_backbone_features(backbone_out)  # pylint: disable=protected-access
+            if self.sam.directly_add_no_mem_embed:
+                vision_feats[-1] = vision_feats[-1] + self.sam.no_mem_embed
+            batch = image.shape[0]
+            feats = [
+                feat.permute(1, 2, 0).reshape(batch, -1, *size) for feat, size in zip(vision_feats, feat_sizes)
+            ]
+            return feats[-1], feats[0], feats[1]
+
+    class _Decoder(torch.nn.Module):
+        def __init__(self, sam: Any, multimask: bool) -> None:
+            super().__init__()
+            self.sam = sam
+            self.multimask = multimask
+
+        def forward(self, image_embed: Any, high_res_0: Any, high_res_1: Any, point_coords: Any, point_labels: Any) -> Tuple[Any, Any]:
+            sparse, dense = self.sam.sam_prompt_encoder(points=(point_coords, point_labels), boxes=None, masks=None)
+            low_res, iou, _, _ = self.sam.sam_mask_decoder(
+                image_embeddings=image_embed,
+                image_pe=self.sam.sam_prompt_encoder.get_dense_pe(),
+                sparse_prompt_embeddings=sparse,
+                dense_prompt_embeddings=dense,
+                multimask_output=self.multimask,
+                repeat_image=True,  # one image, B prompt sets
+                high_res_features=[high_res_0, high_res_1],
+            )
+            return low_res, iou
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    paths = graph_paths(cache_dir, model_name, precision)
+    # The exporter restores each wrapper's train() state afterwards, which
+    # recurses into the shared model: keep every wrapper in eval mode.
+    model = model.float().eval()
+
+    def _export(module: Any, args: Tuple[Any, ...], dest: Path, names: Dict[str, Any]) -> None:
+        tmp = dest.with_suffix(".onnx.part")
+        kwargs = dict(
+            input_names=names["inputs"], output_names=names["outputs"],
+            dynamic_axes=names["dynamic"], opset_version=_OPSET,
+        )
+        with torch.no_grad():
+            try:
+                # TorchScript exporter: no onnxscript dependency on torch >= 2.5.
+                torch.onnx.export(module, args, str(tmp), dynamo=False, **kwargs)
+            except TypeError:  # older torch without the dynamo switch
+                torch.onnx.export(module, args, str(tmp), **kwargs)
+        os.replace(tmp, dest)
+
+    image = torch.zeros(1, 3, IMAGE_SIZE, IMAGE_SIZE)
+    fp32_encoder = graph_paths(cache_dir, model_name, "fp32")["encoder"]
+    if not fp32_encoder.is_file():
+        _export(_Encoder(model).eval(), (image,), fp32_encoder, {
+            "inputs": ["image"],
+            "outputs": ["image_embed", "high_res_feats_0", "high_res_feats_1"],
+            "dynamic": {"image": {0: "batch"}, "image_embed": {0: "batch"},
+                        "high_res_feats_0": {0: "batch"}, "high_res_feats_1": {0: "batch"}},
+        })
+    with torch.no_grad():
+        embed, hr0, hr1 = _Encoder(model).eval()(image)
+    coords = torch.zeros(1, 2, 2)
+    labels = torch.ones(1, 2, dtype=torch.int32)
+    for key, multimask in (("decoder_single", False), ("decoder_multi", True)):
+        _export(_Decoder(model, multimask).eval(), (embed, hr0, hr1, coords, labels), paths[key], {
+            "inputs": ["image_embed", "high_res_feats_0", "high_res_feats_1", "point_coords", "point_labels"],
+            "outputs": ["low_res_masks", "iou_predictions"],
+            "dynamic": {"point_coords": {0: "prompts", 1: "points"}, "point_labels": {0: "prompts", 1: "points"},
+                        "low_res_masks": {0: "prompts"}, "iou_predictions": {0: "prompts"}},
+        })
+
+    if precision == "int8" and not paths["encoder"].is_file():
+        from onnxruntime.quantization import QuantType, quantize_dynamic  # pylint: disable=import-outside-toplevel
+
+        tmp = paths["encoder"].with_suffix(".onnx.part")
+        quantize_dynamic(str(fp32_encoder), str(tmp), weight_type=QuantType.QInt8)
+        os.replace(tmp, paths["encoder"])
+    return paths
+
+
+# ==========================
+# INFERENCE
+# ==========================
+class OnnxImagePredictor:
+    """SAM2ImagePredictor look-alike on onnxruntime sessions."""
+
+    mask_threshold = 0.0
+
+    def __init__(self, paths: Dict[str, Path], threads: int = 0) -> None:
+        if ort is None:
+            raise ImportError("onnxruntime is required for SAM2_BACKEND=onnx")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        providers = ["CPUExecutionProvider"]
+        self._encoder = ort.InferenceSession(str(paths["encoder"]), options, providers=providers)
+        self._decoders = {
+            False: ort.InferenceSession(str(paths["decoder_single"]), options, providers=providers),
+            True: ort.InferenceSession(str(paths["decoder_multi"]), options, providers=providers),
+        }
+        self.reset_predictor()
+
+    def clone(self) -> "OnnxImagePredictor":
+        """Predictor with its own image state sharing these (thread-safe) sessions."""
+        other = object.__new__(OnnxImagePredictor)
+        other._encoder, other._decoders = self._encoder, self._decoders  # pylint: disable=protected-access
+        other.reset_predictor()
+        return other
+
+    def reset_predictor(self) -> None:
+        self._features: Optional[Dict[str, Any]] = None
+        self._orig_hw: Optional[List[Tuple[int, int]]] = None
+        self._is_image_set = False
+        self._is_batch = False
+
+    @staticmethod
+    def _preprocess(image_rgb: np.ndarray) -> np.ndarray:
+        resized = cv2.resize(image_rgb, (IMAGE_SIZE, IMAGE_SIZE), interpolation=cv2.INTER_LINEAR)
+        normalized = (resized.astype(np.float32) - _MEAN) / _STD
+        return normalized.transpose(2, 0, 1)
+
+    def set_image_batch(self, images: Sequence[np.ndarray]) -> None:
+        batch = np.stack([self._preprocess(image) for image in images])
+        embed, hr0, hr1 = self._encoder.run(None, {"image": batch})
+        self._features = {"image_embed": embed, "high_res_feats": [hr0, hr1]}
+        self._orig_hw = [tuple(image.shape[:2]) for image in images]
+        self._is_image_set = True
+        self._is_batch = True
+
+    def set_image(self, image_rgb: np.ndarray) -> None:
+        self.set_image_batch([image_rgb])
+        self._is_batch = False
+
+    @staticmethod
+    def _prompt_arrays(
+        orig_hw: Tuple[int, int], point_coords: Any, point_labels: Any, box: Any
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Pixel prompts -> model-space coords; a box becomes two corner points (labels 2, 3)."""
+        h, w = orig_hw
+        scale = np.array([IMAGE_SIZE / w, IMAGE_SIZE / h], dtype=np.float32)
+        coords: List[np.ndarray] = []
+        labels: List[np.ndarray] = []
+        if box is not None:
+            coords.append(np.asarray(box, dtype=np.float32).reshape(2, 2) * scale)
+            labels.append(np.array([2, 3], dtype=np.int32))
+        if point_coords is not None:
+            coords.append(np.asarray(point_coords, dtype=np.float32).reshape(-1, 2) * scale)
+            labels.append(np.asarray(point_labels, dtype=np.int32).reshape(-1))
+        if not coords:
+            raise ValueError("point_coords or box is required")
+        return np.concatenate(coords)[None], np.concatenate(labels)[None]
+
+    def _decode(self, index: int, coords: np.ndarray, labels: np.ndarray, multimask: bool) -> Tuple[np.ndarray, np.ndarray]:
+        features = self._features
+        return tuple(self._decoders[multimask].run(None, {  # type: ignore[return-value]
+            "image_embed": features["image_embed"][index : index + 1],
+            "high_res_feats_0": features["high_res_feats"][0][index : index + 1],
+            "high_res_feats_1": features["high_res_feats"][1][index : index + 1],
+            "point_coords": coords,
+            "point_labels": labels,
+        }))
+
+    @staticmethod
+    def upscale_logits(low_res: np.ndarray, orig_hw: Tuple[int, int]) -> np.ndarray:
+        """(C, 256, 256) logits -> (C, h, w) in one bilinear step, as SAM2's postprocess_masks."""
+        h, w = orig_hw
+        out = np.empty((low_res.shape[0], h, w), dtype=np.float32)
+        for c, logits in enumerate(low_res):
+            out[c] = cv2.resize(logits, (w, h), interpolation=cv2.INTER_LINEAR)
+        return out
+
+    def _predict_one(self, index: int, point_coords: Any, point_labels: Any, box: Any, multimask: bool, return_logits: bool) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if not self._is_image_set:
+            raise RuntimeError("An image must be set with .set_image(...) before mask prediction.")
+        orig_hw = self._orig_hw[index]
+        coords, labels = self._prompt_arrays(orig_hw, point_coords, point_labels, box)
+        low_res, iou = self._decode(index, coords, labels, multimask)
+        masks = self.upscale_logits(low_res[0], orig_hw)
+        if not return_logits:
+            masks = (masks > self.mask_threshold).astype(np.float32)
+        return masks, iou[0], low_res[0]
+
+    def predict(
+        self,
+        point_coords: Any = None,
+        point_labels: Any = None,
+        box: Any = None,
+        multimask_output: bool = True,
+        return_logits: bool = False,
+        **_: Any,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return self._predict_one(0, point_coords, point_labels, box, multimask_output, return_logits)
+
+    def predict_batch(
+        self,
+        point_coords_batch: Sequence[Any],
+        point_labels_batch: Sequence[Any],
+        box_batch: Optional[Sequence[Any]] = None,
+        multimask_output: bool = True,
+        return_logits: bool = False,
+        **_: Any,
+    ) -> Tuple[List[np.ndarray], List[np.ndarray], List[np.ndarray]]:
+        boxes = box_batch if box_batch is not None else [None] * len(point_coords_batch)
+        results = [
+            self._predict_one(k, coords, labels, box, multimask_output, return_logits)
+            for k, (coords, labels, box) in enumerate(zip(point_coords_batch, point_labels_batch, boxes))
+        ]
+        return [r[0] for r in results], [r[1] for r in results], [r[2] for r in results]
+
+    def decode_points(self, coords_px: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Batched single-point prompts on the current image (B, 2) pixel coords
+        -> (low-res logits (B, 3, 256, 256), IoU predictions (B, 3)).
+        """
+        h, w = self._orig_hw[0]
+        scale = np.array([IMAGE_SIZE / w, IMAGE_SIZE / h], dtype=np.float32)
+        coords = (coords_px.astype(np.float32) * scale)[:, None, :]
+        labels = np.ones((len(coords_px), 1), dtype=np.int32)
+        return self._decode(0, coords, labels, True)
+
+
+class OnnxAutomaticGenerator:
+    """
+    Grid-of-points mask generation on OnnxImagePredictor, returning the same
+    dicts as SAM2AutomaticMaskGenerator ("segmentation", "area",
+    "predicted_iou", "stability_score"). No crops and no NMS: sam2_utils
+    only keeps the single best candidate anyway.
+    """
+
+    def __init__(
+        self,
+        predictor: OnnxImagePredictor,
+        points_per_side: int = 32,
+        points_per_batch: int = 64,
+        pred_iou_thresh: float = 0.8,
+        stability_score_thresh: float = 0.95,
+        stability_score_offset: float = 1.0,
+        output_mode: str = "binary_mask",
+        **_ignored: Any,
+    ) -> None:
+        self.predictor = predictor
+        self.points_per_side = points_per_side
+        self.points_per_batch = points_per_batch
+        self.pred_iou_thresh = pred_iou_thresh
+        self.stability_score_thresh = stability_score_thresh
+        self.stability_score_offset = stability_score_offset
+        self.output_mode = output_mode
+
+    def _grid(self, h: int, w: int) -> np.ndarray:
+        steps = (np.arange(self.points_per_side, dtype=np.float32) + 0.5) / self.points_per_side
+        xs, ys = np.meshgrid(steps * w, steps * h)
+        return np.stack([xs.ravel(), ys.ravel()], axis=1)
+
+    def generate(self, image_rgb: np.ndarray) -> List[Dict[str, Any]]:
+        predictor = self.predictor
+        predictor.set_image(image_rgb)
+        orig_hw = tuple(image_rgb.shape[:2])
+        points = self._grid(*orig_hw)
+
+        candidates: List[Dict[str, Any]] = []
+        for start in range(0, len(points), self.points_per_batch):
+            batch = points[start : start + self.points_per_batch]
+            low_res, iou = predictor.decode_points(batch)
+            for b, c in zip(*np.nonzero(iou >= self.pred_iou_thresh)):
+                logits = predictor.upscale_logits(low_res[b, c : c + 1], orig_hw)[0]
+                high = logits > self.stability_score_offset
+                low = logits > -self.stability_score_offset
+                union = int(np.count_nonzero(low))
+                stability = float(np.count_nonzero(high)) / union if union else 0.0
+                if stability < self.stability_score_thresh:
+                    continue
+                mask = logits > predictor.mask_threshold
+                segmentation: Any = mask_codec.encode(mask) if self.output_mode != "binary_mask" else mask
+                candidates.append({
+                    "segmentation": segmentation,
+                    "area": int(np.count_nonzero(mask)),
+                    "predicted_iou": float(iou[b, c]),
+                    "stability_score": stability,
+                    "point_coords": [batch[b].tolist()],
+                })
+        predictor.reset_predictor()
+        return candidates
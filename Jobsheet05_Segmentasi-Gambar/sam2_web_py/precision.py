@@ -0,0 +1,71 @@
+"""CPU precision modes for SAM2: fp32, bf16 autocast and dynamic int8 quantization."""
+import contextlib
+from typing import Any, Iterator, Optional
+
+import numpy as np
+import torch
+
+PRECISIONS = ("fp32", "bf16", "int8")
+
+
+def bf16_supported() -> bool:
+    """True if oneDNN has native bf16 kernels on this CPU (AVX512-BF16/AMX)."""
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())  # pylint: disable=protected-access
+    except Exception:  # pylint: disable=broad-except
+        return False
+
+
+def resolve_precision(requested: str) -> str:
+    """Validate a mode name; bf16 falls back to fp32 where the CPU lacks it."""
+    requested = (requested or "fp32").lower()
+    if requested not in PRECISIONS:
+        raise ValueError(f"SAM2_PRECISION must be one of {', '.join(PRECISIONS)}")
+    if requested == "bf16" and not bf16_supported():
+        return "fp32"
+    return requested
+
+
+def configure_threads(intra_op: Optional[int], inter_op: Optional[int]) -> None:
+    """Set torch's thread pools; 0/None keeps torch's default (all cores)."""
+    if intra_op:
+        torch.set_num_threads(intra_op)
+    if inter_op:
+        try:
+            torch.set_num_interop_threads(inter_op)
+        except RuntimeError:
+            pass  # already fixed once parallel work has started
+
+
+def apply_precision(model: Any, precision: str) -> Any:
+    """
+    int8: dynamically quantize the image encoder's nn.Linear layers (the
+    Hiera trunk is almost all Linear/attention), weights stored as int8 and
+    activations quantized on the fly. Mask decoder and prompt encoder stay
+    fp32; they are cheap and more sensitive. Other modes leave weights as is.
+    """
+    if precision == "int8":
+        model.image_encoder = torch.ao.quantization.quantize_dynamic(
+            model.image_encoder, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    return model
+
+
+@contextlib.contextmanager
+def inference_context(precision: str, use_inference_mode: bool = True) -> Iterator[None]:
+    """Grad-free context (inference_mode or no_grad) plus bf16 autocast if selected."""
+    grad = torch.inference_mode() if use_inference_mode else torch.no_grad()
+    autocast = (
+        torch.autocast("cpu", dtype=torch.bfloat16) if precision == "bf16" else contextlib.nullcontext()
+    )
+    with grad, autocast:
+        yield
+
+
+def mask_iou(a: Optional[np.ndarray], b: Optional[np.ndarray]) -> float:
+    """IoU of two binary masks; two empty masks count as a perfect match."""
+    if a is None or b is None:
+        return 1.0 if a is None and b is None else 0.0
+    a, b = a.astype(bool), b.astype(bool)
+    union = np.logical_or(a, b).sum()
+    return float(np.logical_and(a, b).sum() / union) if union else 1.0
@@ -0,0 +1,114 @@
+"""
+Compare SAM2 precision modes on this machine.
+
+For every mode (fp32, bf16, int8) the checkpoint is loaded, the images are
+segmented with a centre-point prompt, and encoder/decoder latency plus mask
+IoU against the fp32 result are recorded. The JSON report is what the
+server shows on GET /api/precision.
+
+Usage:
+  python precision_report.py [--images DIR] [--repeats 3] [--output PATH]
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import cv2
+import numpy as np
+import torch
+
+import sam2_utils
+from precision import PRECISIONS, apply_precision, bf16_supported, inference_context, mask_iou
+
+REPORT_PATH = sam2_utils.PRECISION_REPORT_PATH
+
+
+def _load_images(folder: str) -> List[np.ndarray]:
+    images = [sam2_utils._synthetic_image()]  # pylint: disable=protected-access
+    if folder:
+        for path in sorted(Path(folder).iterdir()):
+            image = cv2.imread(str(path), cv2.IMREAD_COLOR)
+            if image is not None:
+                images.append(image)
+    return images
+
+
+def _run_mode(precision: str, images: List[np.ndarray], repeats: int) -> Dict[str, Any]:
+    checkpoint = sam2_utils._get_checkpoint(sam2_utils._MODEL_NAME)  # pylint: disable=protected-access
+    model = apply_precision(sam2_utils._build_sam2(checkpoint), precision)  # pylint: disable=protected-access
+    predictor = sam2_utils.SAM2ImagePredictor(model)
+
+    encoder_ms: List[float] = []
+    decoder_ms: List[float] = []
+    masks = []
+    for image in images:
+        h, w = image.shape[:2]
+        prepared = sam2_utils._prepare(  # pylint: disable=protected-access
+            sam2_utils.SegmentJob(image, points=[[w / 2.0, h / 2.0]])
+        )
+        with inference_context(precision):
+            predictor.set_image(prepared.image_rgb)  # first pass warms up kernels
+            for _ in range(repeats):
+                started = time.perf_counter()
+                predictor.set_image(prepared.image_rgb)
+                encoder_ms.append((time.perf_counter() - started) * 1000.0)
+                started = time.perf_counter()
+                out, scores, _ = predictor.predict(
+                    point_coords=prepared.point_coords,
+                    point_labels=prepared.point_labels,
+                    multimask_output=prepared.multimask,
+                )
+                decoder_ms.append((time.perf_counter() - started) * 1000.0)
+        masks.append(sam2_utils._best_mask(out, scores))  # pylint: disable=protected-access
+
+    return {
+        "encoder_ms": round(statistics.median(encoder_ms), 1),
+        "decoder_ms": round(statistics.median(decoder_ms), 1),
+        "masks": masks,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", default="", help="folder of test images (a synthetic frame is always added)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default=str(REPORT_PATH))
+    args = parser.parse_args()
+
+    images = _load_images(args.images)
+    modes = [m for m in PRECISIONS if m != "bf16" or bf16_supported()]
+    results: Dict[str, Dict[str, Any]] = {}
+    for mode in modes:
+        print(f"[INFO] {mode}: {len(images)} image(s) x {args.repeats}")
+        results[mode] = _run_mode(mode, images, args.repeats)
+
+    reference = results["fp32"]["masks"]
+    report = {
+        "model": sam2_utils._MODEL_NAME,  # pylint: disable=protected-access
+        "threads": torch.get_num_threads(),
+        "images": len(images),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "modes": {},
+    }
+    for mode, res in results.items():
+        ious = [mask_iou(a, b) for a, b in zip(reference, res["masks"])]
+        report["modes"][mode] = {
+            "encoder_ms": res["encoder_ms"],
+            "decoder_ms": res["decoder_ms"],
+            "mean_iou_vs_fp32": round(float(np.mean(ious)), 4),
+            "min_iou_vs_fp32": round(float(np.min(ious)), 4),
+        }
+        print(f"[OK] {mode}: {report['modes'][mode]}")
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as handle:
+        json.dump(report, handle, indent=2)
+    print(f"[OK] Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Encode a segmentation result in one of the negotiated output formats."""
+import base64
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from metrics import STAGE_SECONDS
+
+# Shared Jobsheet05 helpers (mask_codec, ...) live one folder up. Appended, not
+# prepended: that folder's sam2.py script must not shadow the sam2 package.
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+import mask_codec  # noqa: E402  pylint: disable=wrong-import-position
+
+from sam2_utils import apply_overlay  # noqa: E402  pylint: disable=wrong-import-position
+
+# format name -> (mimetype, cv2 extension). Overlay formats draw the tint on the
+# server; mask formats skip the overlay and let the client composite.
+FORMATS: Dict[str, Tuple[str, str]] = {
+    "json": ("application/json", ".png"),          # legacy: base64 PNG in JSON
+    "png": ("image/png", ".png"),
+    "jpeg": ("image/jpeg", ".jpg"),
+    "webp": ("image/webp", ".webp"),
+    "mask-png": ("image/png", ".png"),              # 1-bit PNG, original size
+    "rle": ("application/json", ""),                # COCO RLE, original size
+    "alpha": ("image/png", ".png"),                 # 8-bit alpha at mask resolution, see encode_result
+}
+ACCEPT_TO_FORMAT = {
+    "application/json": "json",
+    "image/png": "png",
+    "image/jpeg": "jpeg",
+    "image/webp": "webp",
+    "application/vnd.coco-rle+json": "rle",
+}
+DEFAULT_QUALITY = 80
+
+
+def normalize_format(fmt: Any, quality: Any = None) -> Tuple[str, int]:
+    """Validate a format name and quality; raises ValueError."""
+    fmt = str(fmt or "json").lower()
+    if fmt == "jpg":
+        fmt = "jpeg"
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}'; use one of {', '.join(FORMATS)}")
+    quality = int(quality or DEFAULT_QUALITY)
+    if not 1 <= quality <= 100:
+        raise ValueError("quality must be between 1 and 100")
+    return fmt, quality
+
+
+def encode_result(
+    fmt: str, quality: int, image: np.ndarray, mask_small: Optional[np.ndarray]
+) -> Tuple[Any, str, Dict[str, str]]:
+    """
+    Returns (body, mimetype, headers). `body` is a dict for JSON formats and
+    bytes otherwise. Raises RuntimeError if OpenCV cannot encode.
+
+    "alpha" sends `mask_small` as computed, without resizing: model resolution
+    (INPUT_SIZE on the long side) for most uploads, but the tiled working
+    resolution (up to SAM2_TILE_MAX_SIDE) for uploads above
+    SAM2_TILE_THRESHOLD, so the refined edges are not thrown away again.
+    X-Mask-Size carries the size; clients stretch it over the frame.
+    """
+    mimetype, ext = FORMATS[fmt]
+    headers: Dict[str, str] = {}
+    h, w = image.shape[:2]
+    mask = mask_small if mask_small is not None else np.zeros((1, 1), dtype=np.uint8)
+
+    if fmt == "rle":
+        with STAGE_SECONDS.time("rle_encode"):
+            mask = cv2.resize(mask, (w, h), interpolation=cv2.INTER_NEAREST)
+            rle = mask_codec.encode(mask)
+        return {"rle": rle, "area": mask_codec.area(rle), "bbox": mask_codec.bbox(rle)}, mimetype, headers
+
+    params: List[int] = []
+    if fmt == "mask-png":
+        payload = cv2.resize(mask, (w, h), interpolation=cv2.INTER_NEAREST) * 255
+        params = [cv2.IMWRITE_PNG_BILEVEL, 1]
+    elif fmt == "alpha":
+        payload = mask * 255
+        headers["X-Mask-Size"] = f"{payload.shape[1]}x{payload.shape[0]}"
+    else:
+        with STAGE_SECONDS.time("overlay"):
+            payload = apply_overlay(image, mask_small)
+        if fmt == "jpeg":
+            params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        elif fmt == "webp":
+            params = [cv2.IMWRITE_WEBP_QUALITY, quality]
+
+    with STAGE_SECONDS.time("imencode"):
+        success, buffer = cv2.imencode(ext, payload, params)
+    if not success:
+        raise RuntimeError("Encoding failed")
+
+    if fmt == "json":
+        with STAGE_SECONDS.time("base64"):
+            encoded = base64.b64encode(buffer.tobytes()).decode("utf-8")
+        return {"image_base64": f"data:image/png;base64,{encoded}"}, mimetype, headers
+    return buffer.tobytes(), mimetype, headers
@@ -1,33 +1,151 @@
+import contextlib
 import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Callable, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
 import cv2
 import numpy as np
-import requests
-import torch
 from importlib import resources
 
-# SAM 2 imports have slightly different entry points across versions, so we try both.
-try:  # type: ignore
-    from sam2.build_sam import build_sam2 as _build_sam_fn  # type: ignore
-except Exception:  # pylint: disable=broad-except
-    _build_sam_fn = None
-
-try:  # type: ignore
-    from sam2.build_sam import build_sam2_hiera as _build_sam_hiera_fn  # type: ignore
-except Exception:  # pylint: disable=broad-except
-    _build_sam_hiera_fn = None
-
-try:  # type: ignore
-    from sam2.automatic_mask_generator import SAM2AutomaticMaskGenerator  # type: ignore
-except Exception as exc:  # pylint: disable=broad-except
-    raise ImportError("sam2 package is required for segmentation") from exc
+import onnx_backend
+import stub_backend
+import tiling
+from embedding_cache import EmbeddingCache
+from metrics import STAGE_SECONDS
+from session_store import SessionExpiredError, SessionStore
 
+# Shared Jobsheet05 helpers (mask_codec, ...) live one folder up. Appended, not
+# prepended: that folder's sam2.py script must not shadow the sam2 package.
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+import mask_codec  # noqa: E402  pylint: disable=wrong-import-position
+import model_store  # noqa: E402  pylint: disable=wrong-import-position
 
 _MODEL_NAME = os.environ.get("SAM2_MODEL_NAME", "sam2_hiera_tiny")
 _DEVICE = os.environ.get("SAM2_DEVICE", "cpu")
-_CACHE_DIR = Path(os.environ.get("SAM2_CACHE_DIR", ".checkpoints"))
+# torch (default), onnx (onnxruntime CPU sessions, see onnx_backend.py) or
+# stub (no model, fixed/random latency for load tests, see stub_backend.py).
+_BACKEND = os.environ.get("SAM2_BACKEND", "torch").lower()
+if _BACKEND not in ("torch", "onnx", "stub"):
+    raise ValueError("SAM2_BACKEND must be 'torch', 'onnx' or 'stub'")
+# Checkpoints and configs share the Jobsheet05 model store unless overridden.
+_CACHE_DIR = Path(os.environ.get("SAM2_CACHE_DIR", model_store.STORE_DIR))
+# fp32 | bf16 (autocast, falls back to fp32 without CPU support) | int8 (dynamic
+# quantization of the image encoder); see precision.py and precision_report.py.
+_REQUESTED_PRECISION = os.environ.get("SAM2_PRECISION", "fp32")
+PRECISION_REPORT_PATH = _CACHE_DIR / "sam2_precision_report.json"  # written by precision_report.py
+
+# The ONNX backend needs torch + sam2 only to export its graphs once; with the
+# graphs cached the server starts without importing either.
+_NEEDS_TORCH = _BACKEND == "torch" or (_BACKEND == "onnx" and not onnx_backend.graphs_cached(
+    _CACHE_DIR,
+    _MODEL_NAME,
+    onnx_backend.resolve_precision(_REQUESTED_PRECISION),
+    _CACHE_DIR / f"{_MODEL_NAME}.pt",
+))
+
+if _NEEDS_TORCH:
+    import torch
+
+    from precision import apply_precision, configure_threads, inference_context, resolve_precision
+    from video_session import StreamingTracker
+
+    # SAM 2 imports have slightly different entry points across versions, so we try both.
+    try:  # type: ignore
+        from sam2.build_sam import build_sam2 as _build_sam_fn  # type: ignore
+    except Exception:  # pylint: disable=broad-except
+        _build_sam_fn = None
+
+    try:  # type: ignore
+        from sam2.build_sam import build_sam2_hiera as _build_sam_hiera_fn  # type: ignore
+    except Exception:  # pylint: disable=broad-except
+        _build_sam_hiera_fn = None
+
+    try:  # type: ignore
+        from sam2.automatic_mask_generator import SAM2AutomaticMaskGenerator  # type: ignore
+    except Exception as exc:  # pylint: disable=broad-except
+        raise ImportError("sam2 package is required for segmentation") from exc
+
+    try:  # type: ignore
+        from sam2.sam2_image_predictor import SAM2ImagePredictor  # type: ignore
+    except Exception:  # pylint: disable=broad-except
+        SAM2ImagePredictor = None  # prompt mode unavailable; automatic generator only
+else:
+    torch = None
+    SAM2AutomaticMaskGenerator = SAM2ImagePredictor = StreamingTracker = None
+    _build_sam_fn = _build_sam_hiera_fn = None
+
+if _BACKEND == "onnx":
+    _PRECISION = onnx_backend.resolve_precision(_REQUESTED_PRECISION)
+elif _BACKEND == "stub":
+    _PRECISION = "fp32"
+else:
+    _PRECISION = resolve_precision(_REQUESTED_PRECISION)
+_THREADS = int(os.environ.get("SAM2_THREADS", "0"))  # 0 = runtime default
+_INTEROP_THREADS = int(os.environ.get("SAM2_INTEROP_THREADS", "0"))
+_INFERENCE_MODE = os.environ.get("SAM2_INFERENCE_MODE", "1") != "0"  # 0 = torch.no_grad
+_CHECKPOINT_SHA256 = os.environ.get("SAM2_CHECKPOINT_SHA256")  # optional pin
+_EMBED_CACHE_MB = float(os.environ.get("SAM2_EMBED_CACHE_MB", "256"))
+_EMBED_CACHE_TTL = float(os.environ.get("SAM2_EMBED_CACHE_TTL", "300"))
+_WARMUP = os.environ.get("SAM2_WARMUP", "1") != "0"
+_LOAD_TIMEOUT = float(os.environ.get("SAM2_LOAD_TIMEOUT", "600"))
+_DEFAULT_PRESET = os.environ.get("SAM2_PRESET", "balanced")
+# Tiled refinement for uploads whose long side exceeds SAM2_TILE_THRESHOLD
+# pixels (0 disables); see tiling.py. Tiles run on a thread pool with one
+# predictor per worker sharing the model weights.
+_TILE_THRESHOLD = int(os.environ.get("SAM2_TILE_THRESHOLD", "2048"))
+_TILE_SIZE = int(os.environ.get("SAM2_TILE_SIZE", "1024"))
+_TILE_OVERLAP = int(os.environ.get("SAM2_TILE_OVERLAP", "128"))
+_TILE_WORKERS = int(os.environ.get("SAM2_TILE_WORKERS", str(min(4, os.cpu_count() or 1))))
+_TILE_MAX_SIDE = int(os.environ.get("SAM2_TILE_MAX_SIDE", "4096"))  # larger uploads are downscaled first
+# Tracking sessions (torch backend only, see video_session.py): a prompted
+# frame is tracked on later frames of the same session through SAM2's memory.
+_TRACK_MAX_SESSIONS = int(os.environ.get("SAM2_TRACK_MAX_SESSIONS", "8"))
+_TRACK_TTL = float(os.environ.get("SAM2_TRACK_TTL", "60"))
+_TRACK_KEYFRAMES = int(os.environ.get("SAM2_TRACK_KEYFRAMES", "4"))
+
+# SAM2AutomaticMaskGenerator settings per speed/quality preset. Only one mask
+# is kept in the end, so every preset asks for RLE output: candidates stay
+# compact and only the selected one is decoded to a dense array.
+# Peak memory is set inside generate(), not by what it returns: every batch
+# of points_per_batch prompts is upscaled to 3 full-resolution float masks
+# per point before pred_iou_thresh / stability_score_thresh drop any of them
+# (64 points on a 1024x1024 image is ~0.8 GB). 16 keeps that near 200 MB;
+# the number of batches (points_per_side ** 2 / points_per_batch) only
+# costs time.
+GENERATOR_PRESETS: Dict[str, Dict[str, Any]] = {
+    "fast": {
+        "points_per_side": 8,
+        "points_per_batch": 16,
+        "pred_iou_thresh": 0.7,
+        "stability_score_thresh": 0.85,
+        "crop_n_layers": 0,
+        "output_mode": "uncompressed_rle",
+    },
+    "balanced": {
+        "points_per_side": 16,
+        "points_per_batch": 16,
+        "pred_iou_thresh": 0.8,
+        "stability_score_thresh": 0.9,
+        "crop_n_layers": 0,
+        "output_mode": "uncompressed_rle",
+    },
+    "quality": {
+        "points_per_side": 32,
+        "points_per_batch": 16,
+        "pred_iou_thresh": 0.8,
+        "stability_score_thresh": 0.95,
+        "crop_n_layers": 0,
+        "output_mode": "uncompressed_rle",
+    },
+}
+if _DEFAULT_PRESET not in GENERATOR_PRESETS:
+    raise ValueError(f"SAM2_PRESET must be one of {', '.join(GENERATOR_PRESETS)}")
 
 # Default checkpoints from Meta's published weights.
 _CHECKPOINT_URLS: Dict[str, str] = {
@@ -64,28 +182,58 @@ _CONFIG_URLS: Dict[str, str] = {
     "sam2_hiera_base": "https://raw.githubusercontent.com/facebookresearch/sam2/main/configs/sam2.1/sam2.1_hiera_b+.yaml",
 }
 
-MASK_GENERATOR: Optional[SAM2AutomaticMaskGenerator] = None
+MASK_GENERATOR: Optional[Any] = None  # default preset
+IMAGE_PREDICTOR: Optional[Any] = None
+_SAM2_MODEL: Optional[Any] = None  # torch model, or the ONNX/stub predictor
+_GENERATORS: Dict[str, Any] = {}
+
+# Frames are resized to INPUT_SIZE x INPUT_SIZE before SAM2: letterboxed
+# (aspect ratio kept, padded) by default, or stretched with
+# SAM2_RESIZE=stretch. Clients use both to avoid uploading wasted pixels.
+INPUT_SIZE = 512
+RESIZE_MODE = os.environ.get("SAM2_RESIZE", "letterbox").lower()
+if RESIZE_MODE not in ("letterbox", "stretch"):
+    raise ValueError("SAM2_RESIZE must be 'letterbox' or 'stretch'")
+
+# The predictor keeps the current image's features as internal state, so
+# set_image/restore + predict must not interleave between request threads.
+_PREDICTOR_LOCK = threading.Lock()
+_GENERATOR_LOCK = threading.Lock()
+_TILE_POOL: Optional[ThreadPoolExecutor] = None
+_TILE_PREDICTORS: "queue.Queue[Any]" = queue.Queue()
+_TILE_LOCK = threading.Lock()
+EMBEDDING_CACHE = EmbeddingCache(int(_EMBED_CACHE_MB * 1024 * 1024), _EMBED_CACHE_TTL)
+TRACK_SESSIONS = SessionStore(
+    lambda: StreamingTracker(_SAM2_MODEL, _TRACK_KEYFRAMES), _TRACK_MAX_SESSIONS, _TRACK_TTL
+)
+
+# Background initialiser state, see start_background_init().
+_READY = threading.Event()
+_INIT_LOCK = threading.Lock()
+_INIT_THREAD: Optional[threading.Thread] = None
+_LOAD_STATE: Dict[str, Any] = {
+    "status": "not_started",  # not_started | loading | warming_up | ready | failed
+    "model": _MODEL_NAME,
+    "device": _DEVICE,
+    "backend": _BACKEND,
+    "precision": _PRECISION,
+    "requested_precision": _REQUESTED_PRECISION,
+    "threads": None,
+    "inference_mode": _INFERENCE_MODE,
+    "error": None,
+    "load_seconds": None,
+    "warmup_ms": None,
+}
 
 
 def _get_checkpoint(model_name: str) -> Path:
-    """Download checkpoint if missing and return its path."""
+    """Download (or resume) the checkpoint if missing or corrupt and return its path."""
     url = _CHECKPOINT_URLS.get(model_name)
     if url is None:
         raise ValueError(f"Unknown model name: {model_name}")
 
-    _CACHE_DIR.mkdir(parents=True, exist_ok=True)
     checkpoint_path = _CACHE_DIR / f"{model_name}.pt"
-    if checkpoint_path.exists():
-        return checkpoint_path
-
-    with requests.get(url, stream=True, timeout=300) as response:
-        response.raise_for_status()
-        with checkpoint_path.open("wb") as handle:
-            for chunk in response.iter_content(chunk_size=1 << 15):
-                if chunk:
-                    handle.write(chunk)
-
-    return checkpoint_path
+    return Path(model_store.fetch(url, str(checkpoint_path), sha256=_CHECKPOINT_SHA256))
 
 
 def _maybe_find_embedded_config(model_name: str) -> Optional[Path]:
@@ -126,22 +274,12 @@ def _get_config(model_name: str) -> Path:
     if not url:
         raise ValueError(f"Unknown model name for config: {model_name}")
 
-    _CACHE_DIR.mkdir(parents=True, exist_ok=True)
     dest = _CACHE_DIR / f"{model_name}.yaml"
-    if dest.exists():
-        return dest
+    return Path(model_store.fetch(url, str(dest)))
 
-    with requests.get(url, stream=True, timeout=300) as response:
-        response.raise_for_status()
-        with dest.open("wb") as handle:
-            for chunk in response.iter_content(chunk_size=1 << 15):
-                if chunk:
-                    handle.write(chunk)
-    return dest
 
-
-def _build_model(checkpoint_path: Path) -> SAM2AutomaticMaskGenerator:
-    """Construct the SAM2 mask generator with broad compatibility."""
+def _build_sam2(checkpoint_path: Path) -> Any:
+    """Construct the bare SAM2 model with broad compatibility."""
     if _build_sam_hiera_fn:
         builder: Callable[..., Any] = _build_sam_hiera_fn
     elif _build_sam_fn:
@@ -172,16 +310,136 @@ def _build_model(checkpoint_path: Path) -> SAM2AutomaticMaskGenerator:
         # Explicitly keep the model on CPU; SAM2 can be large for mobile demos.
         model.to("cpu")
 
-    return SAM2AutomaticMaskGenerator(model)
+    return model
+
+
+def _load_onnx_predictor() -> Any:
+    """Export the ONNX graphs on first use, then open onnxruntime sessions."""
+    checkpoint_path = _CACHE_DIR / f"{_MODEL_NAME}.pt"
+    if not onnx_backend.graphs_cached(_CACHE_DIR, _MODEL_NAME, _PRECISION, checkpoint_path):
+        if torch is None:
+            raise RuntimeError("ONNX graphs disappeared after start-up; restart the server to re-export.")
+        model = _build_sam2(_get_checkpoint(_MODEL_NAME))
+        onnx_backend.export_graphs(model, _CACHE_DIR, _MODEL_NAME, _PRECISION)
+        del model
+    paths = onnx_backend.graph_paths(_CACHE_DIR, _MODEL_NAME, _PRECISION)
+    return onnx_backend.OnnxImagePredictor(paths, threads=_THREADS)
 
 
-def _load_generator() -> SAM2AutomaticMaskGenerator:
+def _load_models() -> Tuple[Any, Optional[Any]]:
+    """Build the automatic generator and the prompt predictor on one shared model."""
+    global _SAM2_MODEL  # pylint: disable=global-statement
+    if _BACKEND == "onnx":
+        _SAM2_MODEL = _load_onnx_predictor()
+        return _get_generator(_DEFAULT_PRESET), _SAM2_MODEL
+    if _BACKEND == "stub":
+        _SAM2_MODEL = stub_backend.StubImagePredictor()
+        return _get_generator(_DEFAULT_PRESET), _SAM2_MODEL
+
     checkpoint_path = _get_checkpoint(_MODEL_NAME)
-    return _build_model(checkpoint_path)
+    _SAM2_MODEL = apply_precision(_build_sam2(checkpoint_path), _PRECISION)
+    predictor = SAM2ImagePredictor(_SAM2_MODEL) if SAM2ImagePredictor is not None else None
+    return _get_generator(_DEFAULT_PRESET), predictor
+
+
+def _inference() -> Any:
+    if _BACKEND != "torch":
+        return contextlib.nullcontext()
+    return inference_context(_PRECISION, _INFERENCE_MODE)
+
+
+def _get_generator(preset: str) -> Any:
+    """Generator for a preset, created on first use on top of the shared model."""
+    generator = _GENERATORS.get(preset)
+    if generator is None:
+        if _BACKEND == "onnx":
+            # Own image state, shared sessions (the predictor is used concurrently).
+            generator = onnx_backend.OnnxAutomaticGenerator(_SAM2_MODEL.clone(), **GENERATOR_PRESETS[preset])
+        elif _BACKEND == "stub":
+            generator = stub_backend.StubAutomaticGenerator(**GENERATOR_PRESETS[preset])
+        else:
+            generator = SAM2AutomaticMaskGenerator(_SAM2_MODEL, **GENERATOR_PRESETS[preset])
+        _GENERATORS[preset] = generator
+    return generator
+
+
+def _synthetic_image() -> np.ndarray:
+    """Gradient with a bright disc, so the warm-up produces a real mask."""
+    ramp = np.linspace(0, 255, INPUT_SIZE, dtype=np.uint8)
+    image = cv2.merge([np.tile(ramp, (INPUT_SIZE, 1))] * 3)
+    center = (INPUT_SIZE // 2, INPUT_SIZE // 2)
+    cv2.circle(image, center, INPUT_SIZE // 4, (40, 200, 255), -1)
+    return image
+
+
+def _warm_up() -> float:
+    """
+    Run one inference on a synthetic frame so one-time PyTorch kernel
+    selection and allocations happen before the first real request.
+    Returns the warm-up time in milliseconds.
+    """
+    center = [[INPUT_SIZE / 2.0, INPUT_SIZE / 2.0]]
+    job = SegmentJob(_synthetic_image(), points=center if IMAGE_PREDICTOR is not None else None)
+    started = time.perf_counter()
+    prepared = _prepare(job)
+    if IMAGE_PREDICTOR is not None:
+        _predict_with_prompts(prepared)
+        IMAGE_PREDICTOR.reset_predictor()
+    else:
+        _generate_mask(prepared)
+    return (time.perf_counter() - started) * 1000.0
 
 
-# Load the generator once on module import.
-MASK_GENERATOR = _load_generator()
+def _initialise() -> None:
+    global MASK_GENERATOR, IMAGE_PREDICTOR  # pylint: disable=global-statement
+    started = time.perf_counter()
+    try:
+        _LOAD_STATE["status"] = "loading"
+        if torch is not None:
+            configure_threads(_THREADS, _INTEROP_THREADS)
+        _LOAD_STATE["threads"] = torch.get_num_threads() if _BACKEND == "torch" else (_THREADS or os.cpu_count())
+        MASK_GENERATOR, IMAGE_PREDICTOR = _load_models()
+        _LOAD_STATE["load_seconds"] = round(time.perf_counter() - started, 2)
+        if _WARMUP:
+            _LOAD_STATE["status"] = "warming_up"
+            _LOAD_STATE["warmup_ms"] = round(_warm_up(), 1)
+        _LOAD_STATE["status"] = "ready"
+    except Exception as exc:  # pylint: disable=broad-except
+        _LOAD_STATE["status"] = "failed"
+        _LOAD_STATE["error"] = str(exc)
+    finally:
+        _READY.set()
+
+
+def start_background_init() -> threading.Thread:
+    """Download/build/warm up the models on a daemon thread (idempotent)."""
+    global _INIT_THREAD  # pylint: disable=global-statement
+    with _INIT_LOCK:
+        if _INIT_THREAD is None:
+            _INIT_THREAD = threading.Thread(target=_initialise, name="sam2-init", daemon=True)
+            _INIT_THREAD.start()
+        return _INIT_THREAD
+
+
+def model_status() -> Dict[str, Any]:
+    return dict(_LOAD_STATE)
+
+
+def is_ready() -> bool:
+    return _LOAD_STATE["status"] == "ready"
+
+
+def _ensure_ready() -> None:
+    """Block until the models are loaded (starting the loader if needed)."""
+    start_background_init()
+    if not _READY.wait(_LOAD_TIMEOUT):
+        raise RuntimeError("SAM2 model is still loading.")
+    if _LOAD_STATE["status"] == "failed":
+        raise RuntimeError(f"SAM2 model failed to load: {_LOAD_STATE['error']}")
+
+
+def _mask_rank(mask: Dict[str, Any]) -> Tuple[float, float]:
+    return float(mask.get("area", 0)), float(mask.get("predicted_iou", 0))
 
 
 def _select_mask(masks: Any) -> Optional[np.ndarray]:
@@ -189,34 +447,438 @@ def _select_mask(masks: Any) -> Optional[np.ndarray]:
     if not masks:
         return None
 
-    best = max(
-        masks,
-        key=lambda m: (
-            float(m.get("area", 0)),
-            float(m.get("predicted_iou", 0)),
-        ),
-    )
+    best = max(masks, key=_mask_rank)
     seg = best.get("segmentation")
-    return seg.astype(np.uint8) if seg is not None else None
+    if seg is None:
+        return None
+    if isinstance(seg, dict):  # RLE output mode: decode only the winner
+        return mask_codec.decode(seg)
+    return seg.astype(np.uint8)
+
+
+def has_prompts(
+    points: Optional[Sequence[Sequence[float]]] = None,
+    box: Optional[Sequence[float]] = None,
+) -> bool:
+    return bool(points) or box is not None
+
+
+def validate_prompts(points: Any = None, labels: Any = None, box: Any = None) -> Dict[str, Any]:
+    """
+    Check decoded SAM2 prompts (original image pixels) and convert them:
+      points: [[x, y], ...]  labels: [1|0, ...]  box: [x0, y0, x1, y1]
+    Returns {"points", "labels", "box"}; raises ValueError on malformed input.
+    """
+    parsed_points: Optional[List[Tuple[float, float]]] = None
+    if points:
+        if not isinstance(points, list) or not all(
+            isinstance(p, (list, tuple)) and len(p) == 2 for p in points
+        ):
+            raise ValueError("points must be a list of [x, y] pairs")
+        parsed_points = [(float(p[0]), float(p[1])) for p in points]
+
+    parsed_labels: Optional[List[int]] = None
+    if labels is not None:
+        if not isinstance(labels, list) or not parsed_points or len(labels) != len(parsed_points):
+            raise ValueError("labels must be a list with one entry per point")
+        parsed_labels = [int(v) for v in labels]
+
+    parsed_box: Optional[List[float]] = None
+    if box is not None:
+        if not isinstance(box, (list, tuple)) or len(box) != 4:
+            raise ValueError("box must be [x0, y0, x1, y1]")
+        parsed_box = [float(v) for v in box]
+
+    return {"points": parsed_points, "labels": parsed_labels, "box": parsed_box}
+
+
+@dataclass
+class SegmentJob:
+    """One /api/segment request as seen by the inference worker."""
+
+    image_bgr: np.ndarray
+    points: Optional[Sequence[Sequence[float]]] = None
+    labels: Optional[Sequence[int]] = None
+    box: Optional[Sequence[float]] = None
+    token: Optional[str] = None
+    preset: Optional[str] = None  # automatic generator preset, see GENERATOR_PRESETS
+    session: Optional[str] = None  # tracking session id, see _track_session
+    keyframe: bool = False  # prompts add a keyframe to the session's track instead of restarting it
+
+
+@dataclass
+class _Prepared:
+    image_rgb: np.ndarray
+    preset: str = _DEFAULT_PRESET
+    content_hw: Tuple[int, int] = (INPUT_SIZE, INPUT_SIZE)  # image area without letterbox padding
+    point_coords: Optional[np.ndarray] = None
+    point_labels: Optional[np.ndarray] = None
+    box: Optional[np.ndarray] = None
+    multimask: bool = False
+
+
+def _prepare(job: SegmentJob) -> _Prepared:
+    """Resize to the model size and map prompts into resized pixel coordinates."""
+    original_h, original_w = job.image_bgr.shape[:2]
+    preset = job.preset or _DEFAULT_PRESET
+    if preset not in GENERATOR_PRESETS:
+        raise ValueError(f"Unknown preset '{preset}'; use one of {', '.join(GENERATOR_PRESETS)}")
+    with STAGE_SECONDS.time("resize"):
+        if RESIZE_MODE == "letterbox":
+            square, scale, content_hw = tiling.letterbox(job.image_bgr, INPUT_SIZE, tiling.PAD_RGB[::-1])
+            sx = sy = scale
+        else:
+            square = cv2.resize(job.image_bgr, (INPUT_SIZE, INPUT_SIZE), interpolation=cv2.INTER_LINEAR)
+            sx, sy = INPUT_SIZE / original_w, INPUT_SIZE / original_h
+            content_hw = (INPUT_SIZE, INPUT_SIZE)
+        prepared = _Prepared(
+            image_rgb=cv2.cvtColor(square, cv2.COLOR_BGR2RGB), preset=preset, content_hw=content_hw
+        )
+
+    labels = job.labels
+    if job.points:
+        prepared.point_coords = np.asarray(job.points, dtype=np.float32).reshape(-1, 2) * (sx, sy)
+        if labels is None:
+            labels = [1] * len(prepared.point_coords)  # taps are foreground by default
+        prepared.point_labels = np.asarray(labels, dtype=np.int32).reshape(-1)
+        if len(prepared.point_labels) != len(prepared.point_coords):
+            raise ValueError("labels must have one entry per point")
+    if job.box is not None:
+        prepared.box = np.asarray(job.box, dtype=np.float32).reshape(4) * (sx, sy, sx, sy)
+
+    # A single point is ambiguous (hair vs head vs person): ask for several
+    # candidates and keep the best scored one, as recommended by SAM.
+    prepared.multimask = (
+        prepared.box is None
+        and prepared.point_coords is not None
+        and len(prepared.point_coords) == 1
+    )
+    return prepared
 
 
-def segment_and_color(image_bgr: np.ndarray) -> np.ndarray:
-    """Run SAM2, pick the primary mask, and apply a colored overlay."""
-    if MASK_GENERATOR is None:
-        raise RuntimeError("SAM2 mask generator was not initialized.")
+def _best_mask(masks: Any, scores: Any) -> Optional[np.ndarray]:
+    if masks is None or len(masks) == 0:
+        return None
+    best = int(np.argmax(scores)) if scores is not None else 0
+    return (np.asarray(masks[best]) > 0).astype(np.uint8)
 
-    original_h, original_w = image_bgr.shape[:2]
-    target_size = 512
-    scale_w = target_size
-    scale_h = target_size
-    resized = cv2.resize(image_bgr, (scale_w, scale_h), interpolation=cv2.INTER_LINEAR)
-    image_rgb = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
-
-    masks = MASK_GENERATOR.generate(image_rgb)
-    mask_small = _select_mask(masks)
+
+def _crop_content(mask: Optional[np.ndarray], prepared: _Prepared) -> Optional[np.ndarray]:
+    """Drop the letterbox padding: the mask then covers exactly the upload."""
+    if mask is None:
+        return None
+    ch, cw = prepared.content_hw
+    return mask[:ch, :cw]
+
+
+def _in_content(candidate: Dict[str, Any], prepared: _Prepared) -> bool:
+    """False for generator candidates seeded from a point in the padding."""
+    coords = candidate.get("point_coords")
+    if not coords:
+        return True
+    x, y = coords[0]
+    ch, cw = prepared.content_hw
+    return x < cw and y < ch
+
+
+def _set_image_cached(image_rgb: np.ndarray, token: Optional[str]) -> None:
+    """set_image, or restore cached encoder features for the same token."""
+    entry = EMBEDDING_CACHE.get(token) if token else None
+    if entry is not None and entry.features is not None:
+        EMBEDDING_CACHE.record(hit=True)
+        IMAGE_PREDICTOR.reset_predictor()
+        IMAGE_PREDICTOR._features = entry.features  # pylint: disable=protected-access
+        IMAGE_PREDICTOR._orig_hw = [entry.orig_hw]  # pylint: disable=protected-access
+        IMAGE_PREDICTOR._is_image_set = True  # pylint: disable=protected-access
+        IMAGE_PREDICTOR._is_batch = False  # pylint: disable=protected-access
+        return
+
+    IMAGE_PREDICTOR.set_image(image_rgb)
+    if token:
+        EMBEDDING_CACHE.record(hit=False)
+        EMBEDDING_CACHE.put_features(
+            token,
+            IMAGE_PREDICTOR._features,  # pylint: disable=protected-access
+            tuple(IMAGE_PREDICTOR._orig_hw[0]),  # pylint: disable=protected-access
+        )
+
+
+def _has_cached_features(token: Optional[str]) -> bool:
+    entry = EMBEDDING_CACHE.get(token) if token else None
+    return entry is not None and entry.features is not None
+
+
+def _predict_with_prompts(prepared: _Prepared, token: Optional[str] = None) -> Optional[np.ndarray]:
+    """One encoder pass (skipped on a cache hit) + one decoder pass."""
+    if IMAGE_PREDICTOR is None:
+        raise RuntimeError("SAM2 image predictor is not available in this sam2 build.")
+
+    with _PREDICTOR_LOCK, _inference():
+        with STAGE_SECONDS.time("encoder"):
+            _set_image_cached(prepared.image_rgb, token)
+        with STAGE_SECONDS.time("decoder"):
+            masks, scores, _ = IMAGE_PREDICTOR.predict(
+                point_coords=prepared.point_coords,
+                point_labels=prepared.point_labels,
+                box=prepared.box,
+                multimask_output=prepared.multimask,
+            )
+    with STAGE_SECONDS.time("select_mask"):
+        return _crop_content(_best_mask(masks, scores), prepared)
+
+
+def _predict_with_prompts_batch(
+    items: Sequence[_Prepared], tokens: Sequence[Optional[str]]
+) -> List[Optional[np.ndarray]]:
+    """One batched encoder pass for several images, then one batched decoder pass."""
+    multimask = items[0].multimask
+    with _PREDICTOR_LOCK, _inference():
+        with STAGE_SECONDS.time("encoder_batch"):
+            IMAGE_PREDICTOR.set_image_batch([item.image_rgb for item in items])
+        with STAGE_SECONDS.time("decoder_batch"):
+            masks_batch, scores_batch, _ = IMAGE_PREDICTOR.predict_batch(
+                point_coords_batch=[item.point_coords for item in items],
+                point_labels_batch=[item.point_labels for item in items],
+                box_batch=[item.box for item in items],
+                multimask_output=multimask,
+            )
+        features = IMAGE_PREDICTOR._features  # pylint: disable=protected-access
+        orig_hws = IMAGE_PREDICTOR._orig_hw  # pylint: disable=protected-access
+        for k, token in enumerate(tokens):
+            if not token:
+                continue
+            EMBEDDING_CACHE.record(hit=False)
+            EMBEDDING_CACHE.put_features(
+                token,
+                {
+                    "image_embed": features["image_embed"][k : k + 1],
+                    "high_res_feats": [f[k : k + 1] for f in features["high_res_feats"]],
+                },
+                tuple(orig_hws[k]),
+            )
+    return [_crop_content(_best_mask(m, sc), item) for m, sc, item in zip(masks_batch, scores_batch, items)]
+
+
+def _generate_mask(prepared: _Prepared) -> Optional[np.ndarray]:
+    with _GENERATOR_LOCK, _inference(), STAGE_SECONDS.time("mask_generation"):
+        masks = _get_generator(prepared.preset).generate(prepared.image_rgb)
+    with STAGE_SECONDS.time("select_mask"):
+        if prepared.content_hw != prepared.image_rgb.shape[:2]:
+            masks = [m for m in masks if _in_content(m, prepared)]
+        return _crop_content(_select_mask(masks), prepared)
+
+
+def tracking_available() -> bool:
+    return _BACKEND == "torch"
+
+
+def _track_session(job: SegmentJob, prepared: _Prepared) -> Optional[np.ndarray]:
+    """
+    With prompts: segment the frame and make it a keyframe of the job's
+    session (created if needed). Without: propagate the session's object
+    to this frame from its memory bank, no prompt or generator needed.
+    """
+    if not tracking_available():
+        raise RuntimeError("Tracking sessions need SAM2_BACKEND=torch")
+    prompted = has_prompts(job.points, job.box)
+    session = TRACK_SESSIONS.get_or_create(job.session) if prompted else TRACK_SESSIONS.get(job.session)
+    if session is None or not (prompted or session.tracker.has_prompt):
+        raise SessionExpiredError(job.session)
+    with session.lock, _inference():
+        if prompted:
+            with STAGE_SECONDS.time("track_keyframe"):
+                mask = session.tracker.prompt(
+                    prepared.image_rgb, prepared.point_coords, prepared.point_labels, prepared.box, job.keyframe
+                )
+        else:
+            with STAGE_SECONDS.time("track_propagate"):
+                mask = session.tracker.track(prepared.image_rgb)
+    return _crop_content(mask, prepared)
+
+
+def _use_tiling(job: SegmentJob) -> bool:
+    return _TILE_THRESHOLD > 0 and max(job.image_bgr.shape[:2]) > _TILE_THRESHOLD and not job.session
+
+
+def _new_tile_predictor() -> Optional[Any]:
+    """A predictor with its own image state on the shared model weights."""
+    if _BACKEND == "torch":
+        return SAM2ImagePredictor(_SAM2_MODEL) if SAM2ImagePredictor is not None else None
+    return _SAM2_MODEL.clone()
+
+
+def _tile_pool() -> ThreadPoolExecutor:
+    global _TILE_POOL  # pylint: disable=global-statement
+    with _TILE_LOCK:
+        if _TILE_POOL is None:
+            _TILE_POOL = ThreadPoolExecutor(max_workers=max(1, _TILE_WORKERS), thread_name_prefix="sam2-tile")
+        return _TILE_POOL
+
+
+def _refine_tile(tile_rgb: np.ndarray, prompt: Dict[str, Any]) -> Optional[np.ndarray]:
+    """Segment one tile (letterboxed to _TILE_SIZE) on a pooled predictor."""
+    try:
+        predictor = _TILE_PREDICTORS.get_nowait()
+    except queue.Empty:
+        predictor = _new_tile_predictor()
+    if predictor is None:
+        return None
+    try:
+        square, scale, content_hw = tiling.letterbox(tile_rgb, _TILE_SIZE)
+        with _inference():
+            predictor.set_image(square)
+            masks, scores, _ = predictor.predict(
+                point_coords=prompt["point_coords"] * scale,
+                point_labels=prompt["point_labels"],
+                box=prompt["box"] * scale,
+                multimask_output=False,
+            )
+        predictor.reset_predictor()
+    finally:
+        _TILE_PREDICTORS.put(predictor)
+    mask = _best_mask(masks, scores)
+    if mask is None:
+        return None
+    ch, cw = content_hw
+    return cv2.resize(mask[:ch, :cw], (tile_rgb.shape[1], tile_rgb.shape[0]), interpolation=cv2.INTER_LINEAR)
+
+
+def _segment_tiled(job: SegmentJob, coarse: Optional[np.ndarray]) -> Optional[np.ndarray]:
+    """
+    Refine a coarse (model-resolution) mask tile by tile at up to
+    _TILE_MAX_SIDE pixels; returns the stitched mask at that resolution.
+    """
+    if coarse is None:
+        return None
+    h, w = job.image_bgr.shape[:2]
+    scale = min(1.0, _TILE_MAX_SIDE / max(h, w))
+    image = job.image_bgr
+    if scale < 1.0:
+        image = cv2.resize(image, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_AREA)
+    image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    h, w = image_rgb.shape[:2]
+    coarse_full = cv2.resize(coarse.astype(np.float32), (w, h), interpolation=cv2.INTER_LINEAR) > 0.5
+
+    user_points = user_labels = None
+    if job.points:
+        user_points = np.asarray(job.points, dtype=np.float32).reshape(-1, 2) * scale
+        user_labels = np.asarray(job.labels if job.labels is not None else [1] * len(user_points))
+
+    stitcher = tiling.MaskStitcher(h, w, _TILE_OVERLAP)
+    pending = []
+    with STAGE_SECONDS.time("tiles"):
+        for box in tiling.tile_grid(h, w, _TILE_SIZE, _TILE_OVERLAP):
+            y0, x0, y1, x1 = box
+            coarse_tile = coarse_full[y0:y1, x0:x1]
+            local_points = user_points - (x0, y0) if user_points is not None else None
+            prompt = tiling.tile_prompt(coarse_tile, local_points, user_labels)
+            if prompt is None:
+                stitcher.add(box, coarse_tile)  # uniform: nothing to refine
+                continue
+            future = _tile_pool().submit(_refine_tile, image_rgb[y0:y1, x0:x1], prompt)
+            pending.append((box, coarse_tile, future))
+        for box, coarse_tile, future in pending:
+            refined = future.result()
+            stitcher.add(box, refined if refined is not None else coarse_tile)
+    return stitcher.result()
+
+
+def segment_batch(jobs: Sequence[SegmentJob]) -> List[Any]:
+    """
+    Model-resolution masks (or an Exception) for a group of jobs.
+
+    Prompted jobs whose image is not in the embedding cache are grouped into
+    one set_image_batch/predict_batch call per multimask setting; cached,
+    automatic-generator, tiled and tracking-session jobs run one by one.
+    Uploads above SAM2_TILE_THRESHOLD get a tiled refinement and a
+    higher-resolution mask.
+    """
+    _ensure_ready()
+
+    results: List[Any] = [None] * len(jobs)
+    prepared: Dict[int, _Prepared] = {}
+    for i, job in enumerate(jobs):
+        try:
+            prepared[i] = _prepare(job)
+        except Exception as exc:  # pylint: disable=broad-except
+            results[i] = exc
+
+    groups: Dict[bool, List[int]] = {}
+    seen_tokens = set()
+    if IMAGE_PREDICTOR is not None:
+        for i, item in prepared.items():
+            token = jobs[i].token
+            if not has_prompts(jobs[i].points, jobs[i].box) or _has_cached_features(token):
+                continue
+            if jobs[i].session or _use_tiling(jobs[i]):
+                continue
+            if token and token in seen_tokens:
+                continue  # same frame twice: second one hits the cache afterwards
+            seen_tokens.add(token)
+            groups.setdefault(item.multimask, []).append(i)
+
+    batched = set()
+    for indices in groups.values():
+        if len(indices) < 2:
+            continue
+        try:
+            masks = _predict_with_prompts_batch(
+                [prepared[i] for i in indices], [jobs[i].token for i in indices]
+            )
+            for i, mask in zip(indices, masks):
+                results[i] = mask
+        except Exception as exc:  # pylint: disable=broad-except
+            for i in indices:
+                results[i] = exc
+        batched.update(indices)
+
+    for i, item in prepared.items():
+        if i in batched:
+            continue
+        job = jobs[i]
+        try:
+            if job.session:
+                results[i] = _track_session(job, item)
+            elif has_prompts(job.points, job.box) and IMAGE_PREDICTOR is not None:
+                results[i] = _predict_with_prompts(item, job.token)
+            else:
+                results[i] = _generate_mask(item)
+            if _use_tiling(job):
+                results[i] = _segment_tiled(job, results[i])
+        except Exception as exc:  # pylint: disable=broad-except
+            results[i] = exc
+    return results
+
+
+def segment_and_color(
+    image_bgr: np.ndarray,
+    points: Optional[Sequence[Sequence[float]]] = None,
+    labels: Optional[Sequence[int]] = None,
+    box: Optional[Sequence[float]] = None,
+    token: Optional[str] = None,
+    preset: Optional[str] = None,
+) -> np.ndarray:
+    """
+    Run SAM2, pick the primary mask, and apply a colored overlay.
+
+    With point/box prompts (in original image pixels) the image predictor is
+    used; otherwise the automatic mask generator is the fallback. `token`
+    (see embedding_cache.image_token) lets repeated prompts on the same image
+    reuse the cached encoder output. `preset` picks the generator settings
+    (fast/balanced/quality) for the unprompted path.
+    """
+    result = segment_batch([SegmentJob(image_bgr, points, labels, box, token, preset)])[0]
+    if isinstance(result, Exception):
+        raise result
+    return apply_overlay(image_bgr, result)
+
+
+def apply_overlay(image_bgr: np.ndarray, mask_small: Optional[np.ndarray]) -> np.ndarray:
+    """Upscale a model-resolution mask and tint it over the original image."""
     if mask_small is None:
         return image_bgr.copy()
 
+    original_h, original_w = image_bgr.shape[:2]
     mask = cv2.resize(mask_small, (original_w, original_h), interpolation=cv2.INTER_NEAREST)
     tint = np.zeros_like(image_bgr, dtype=np.uint8)
     tint[:, :] = (255, 140, 40)  # Warm orange overlay in BGR
@@ -0,0 +1,89 @@
+"""Per-client tracking sessions with an idle TTL and a session cap."""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+
+class SessionExpiredError(LookupError):
+    """The session is unknown, expired or has not been prompted yet."""
+
+
+@dataclass
+class Session:
+    tracker: Any                          # video_session.StreamingTracker
+    lock: threading.Lock = field(default_factory=threading.Lock)  # one frame at a time
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class SessionStore:
+    """
+    Thread-safe map of session id -> Session, least recently used first.
+
+    Sessions idle for longer than `ttl_seconds` are dropped on the next
+    access; when `max_sessions` is reached the least recently used one
+    makes room for a new session, so abandoned clients cannot pin memory.
+    """
+
+    def __init__(self, factory: Callable[[], Any], max_sessions: int, ttl_seconds: float) -> None:
+        self._factory = factory
+        self.max_sessions = max(1, max_sessions)
+        self.ttl_seconds = ttl_seconds
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.evicted = 0
+
+    def _expire_locked(self, now: float) -> None:
+        expired = [k for k, s in self._sessions.items() if now - s.last_used > self.ttl_seconds]
+        for key in expired:
+            del self._sessions[key]
+        self.evicted += len(expired)
+
+    def get(self, session_id: str) -> Optional[Session]:
+        now = time.monotonic()
+        with self._lock:
+            self._expire_locked(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            session.last_used = now
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def get_or_create(self, session_id: str) -> Session:
+        now = time.monotonic()
+        with self._lock:
+            self._expire_locked(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                while len(self._sessions) >= self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.evicted += 1
+                session = Session(tracker=self._factory())
+                self._sessions[session_id] = session
+                self.created += 1
+            session.last_used = now
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def drop(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def nbytes(self) -> int:
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return sum(s.tracker.nbytes() for s in sessions)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._expire_locked(time.monotonic())
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "ttl_seconds": self.ttl_seconds,
+                "created": self.created,
+                "evicted": self.evicted,
+            }
@@ -37,8 +37,9 @@
     const captureButton = document.getElementById("btnCapture");
     const statusEl = document.getElementById("status");
     const resultImage = document.getElementById("resultImage");
+    const liveButton = document.getElementById("btnLive");
 
-    if (!video || !canvas || !captureButton || !statusEl || !resultImage) {
+    if (!video || !canvas || !captureButton || !statusEl || !resultImage || !liveButton) {
       console.error("Required DOM elements are missing; aborting camera setup.");
       return;
     }
@@ -46,6 +47,42 @@
     let stream = null;
     let isProcessing = false;
     let cameraInitPromise = null;
+    // Token of the last processed frame + taps collected on its result image.
+    let lastToken = null;
+    let resultPoints = [];
+    let resultUrl = null;
+    // Full-resolution frame the last result was composited on, and the
+    // factor that maps its pixels to the uploaded (downscaled) frame.
+    let lastFrame = null;
+    // The server returns only the mask at model resolution; the tint is
+    // composited here on the full-resolution frame.
+    const RESULT_FORMAT = { format: "alpha" };
+    const TINT_RGB = [40, 140, 255];
+    const EDGE_RGB = [255, 200, 0];
+    // Upload size and pacing; defaults match the server, /api/config overrides.
+    const pacing = {
+      inputSize: 512,
+      resizeMode: "stretch",
+      targetRtt: 1000,
+      qualityMin: 0.4,
+      qualityMax: 0.9,
+      quality: 0.8,
+      intervalMin: 100,
+      intervalMax: 3000,
+      interval: 200,
+      lastRtt: null,
+      lastServerMs: null,
+    };
+    // Live mode: one frame in flight at a time over a WebSocket; the next
+    // frame is captured when its result (or a drop notice) comes back.
+    let liveSocket = null;
+    let liveTimer = null;
+    let liveMeta = null;
+    let liveInFlight = null;
+    const LIVE_TIMEOUT_MS = 10000;
+    // Tapping the preview while live starts tracking that object: the
+    // server follows it on later frames without a new prompt.
+    let trackingAvailable = false;
 
     const setStatus = (text, isError = false) => {
       statusEl.textContent = `Status: ${text}`;
@@ -60,8 +97,9 @@
       const constraints = {
         video: {
           facingMode: { ideal: "environment" },
-          width: { ideal: 640 },
-          height: { ideal: 360 },
+          // Display resolution; uploads are downscaled to the model size.
+          width: { ideal: 1280 },
+          height: { ideal: 720 },
         },
         audio: false,
       };
@@ -89,22 +127,106 @@
       return cameraInitPromise;
     };
 
-    const captureFrame = () =>
+    const clamp = (value, lo, hi) => Math.min(hi, Math.max(lo, value));
+
+    const loadConfig = async () => {
+      try {
+        const response = await fetch("/api/config");
+        if (!response.ok) return;
+        const config = await response.json();
+        pacing.inputSize = config.input_size || pacing.inputSize;
+        pacing.resizeMode = config.resize_mode || pacing.resizeMode;
+        pacing.targetRtt = config.target_rtt_ms || pacing.targetRtt;
+        trackingAvailable = Boolean(config.tracking);
+        if (config.jpeg_quality) {
+          pacing.qualityMin = config.jpeg_quality.min;
+          pacing.qualityMax = config.jpeg_quality.max;
+          pacing.quality = config.jpeg_quality.start;
+        }
+        if (config.interval_ms) {
+          pacing.intervalMin = config.interval_ms.min;
+          pacing.intervalMax = config.interval_ms.max;
+        }
+        // Start no faster than the server has recently been able to go.
+        const serverP50 = config.server_latency_ms && config.server_latency_ms.p50;
+        pacing.interval = clamp(serverP50 || pacing.interval, pacing.intervalMin, pacing.intervalMax);
+      } catch (err) {
+        // older server without /api/config: keep the defaults
+      }
+    };
+
+    // Scale factor for the upload. "stretch": the server resizes each axis to
+    // inputSize independently, so both sides only need to reach inputSize.
+    // "letterbox": the long side is what counts.
+    const uploadScale = (vw, vh) => {
+      const size = pacing.inputSize;
+      const scale =
+        pacing.resizeMode === "letterbox"
+          ? size / Math.max(vw, vh)
+          : Math.max(size / vw, size / vh);
+      return Math.min(1, scale);
+    };
+
+    // Adjust JPEG quality and capture interval towards the target RTT. When
+    // most of the RTT is network, a smaller upload helps; when it is the
+    // server, sending less often does.
+    const adaptPacing = (rtt, serverMs) => {
+      pacing.lastRtt = Math.round(rtt);
+      pacing.lastServerMs = serverMs == null ? null : Math.round(serverMs);
+      const network = serverMs == null ? rtt / 2 : Math.max(0, rtt - serverMs);
+      if (rtt > pacing.targetRtt) {
+        if (network >= rtt / 2 && pacing.quality > pacing.qualityMin) {
+          pacing.quality = clamp(pacing.quality - 0.1, pacing.qualityMin, pacing.qualityMax);
+        } else {
+          pacing.interval = clamp(pacing.interval * 1.25, pacing.intervalMin, pacing.intervalMax);
+        }
+      } else if (rtt < pacing.targetRtt * 0.7) {
+        if (pacing.quality < pacing.qualityMax) {
+          pacing.quality = clamp(pacing.quality + 0.05, pacing.qualityMin, pacing.qualityMax);
+        } else {
+          pacing.interval = clamp(pacing.interval * 0.85, pacing.intervalMin, pacing.intervalMax);
+        }
+      }
+    };
+
+    const serverTiming = (response) => {
+      const match = /dur=([\d.]+)/.exec(response.headers.get("Server-Timing") || "");
+      return match ? parseFloat(match[1]) : null;
+    };
+
+    const pacingSummary = () =>
+      `rtt ${pacing.lastRtt} ms` +
+      (pacing.lastServerMs != null ? ` (server ${pacing.lastServerMs} ms)` : "") +
+      `, jpeg ${pacing.quality.toFixed(2)}`;
+
+    // Snapshot the video at full resolution (kept for compositing) and
+    // encode a copy downscaled to what the model actually uses.
+    const captureFrame = (quality = pacing.quality) =>
       new Promise((resolve, reject) => {
-        if (!video.videoWidth || !video.videoHeight) {
+        const vw = video.videoWidth;
+        const vh = video.videoHeight;
+        if (!vw || !vh) {
           reject(new Error("Camera not ready yet."));
           return;
         }
 
-        canvas.width = video.videoWidth;
-        canvas.height = video.videoHeight;
+        const frame = document.createElement("canvas");
+        frame.width = vw;
+        frame.height = vh;
+        const frameCtx = frame.getContext("2d");
         const ctx = canvas.getContext("2d");
-        if (!ctx) {
+        if (!frameCtx || !ctx) {
           reject(new Error("Canvas is not supported in this browser."));
           return;
         }
+        frameCtx.drawImage(video, 0, 0, vw, vh);
 
-        ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
+        const scale = uploadScale(vw, vh);
+        canvas.width = Math.round(vw * scale);
+        canvas.height = Math.round(vh * scale);
+        ctx.imageSmoothingEnabled = true;
+        ctx.imageSmoothingQuality = "high";
+        ctx.drawImage(frame, 0, 0, canvas.width, canvas.height);
 
         canvas.toBlob(
           (blob) => {
@@ -112,41 +234,181 @@
               reject(new Error("Failed to capture frame"));
               return;
             }
-            resolve(blob);
+            resolve({ blob, frame, scale });
           },
           "image/jpeg",
-          0.92
+          quality
         );
       });
 
-    const sendFrame = async () => {
+    const loadImage = (blob) =>
+      new Promise((resolve, reject) => {
+        const url = URL.createObjectURL(blob);
+        const img = new Image();
+        img.onload = () => {
+          URL.revokeObjectURL(url);
+          resolve(img);
+        };
+        img.onerror = () => {
+          URL.revokeObjectURL(url);
+          reject(new Error("Could not read the mask from the server"));
+        };
+        img.src = url;
+      });
+
+    // Tint the mask (8-bit; model resolution, or the tiled resolution for
+    // large uploads) and stretch it over the full-resolution frame, with a
+    // highlighted edge like the server overlay.
+    const compositeMask = async (frame, maskBlob) => {
+      const maskImage = await loadImage(maskBlob);
+      const mw = maskImage.naturalWidth;
+      const mh = maskImage.naturalHeight;
+      const maskCanvas = document.createElement("canvas");
+      maskCanvas.width = mw;
+      maskCanvas.height = mh;
+      const maskCtx = maskCanvas.getContext("2d");
+      maskCtx.drawImage(maskImage, 0, 0);
+      const pixels = maskCtx.getImageData(0, 0, mw, mh);
+      const data = pixels.data;
+      const on = (x, y) => x >= 0 && y >= 0 && x < mw && y < mh && data[(y * mw + x) * 4] > 127;
+      const edge = new Uint8Array(mw * mh);
+      for (let y = 0; y < mh; y += 1) {
+        for (let x = 0; x < mw; x += 1) {
+          if (on(x, y) && !(on(x - 1, y) && on(x + 1, y) && on(x, y - 1) && on(x, y + 1))) {
+            edge[y * mw + x] = 1;
+          }
+        }
+      }
+      for (let i = 0; i < mw * mh; i += 1) {
+        const o = i * 4;
+        const rgb = edge[i] ? EDGE_RGB : TINT_RGB;
+        const alpha = edge[i] ? 255 : Math.round(data[o] * 0.8);
+        data[o] = rgb[0];
+        data[o + 1] = rgb[1];
+        data[o + 2] = rgb[2];
+        data[o + 3] = alpha;
+      }
+      maskCtx.putImageData(pixels, 0, 0);
+
+      const out = document.createElement("canvas");
+      out.width = frame.width;
+      out.height = frame.height;
+      const ctx = out.getContext("2d");
+      ctx.drawImage(frame, 0, 0);
+      ctx.imageSmoothingEnabled = true;
+      ctx.drawImage(maskCanvas, 0, 0, out.width, out.height);
+      return new Promise((resolve) => out.toBlob(resolve, "image/jpeg", 0.9));
+    };
+
+    // Map a tap on an element shown with object-fit: cover to pixel coordinates
+    // of its content (vw x vh).
+    const tapToContentPoint = (element, vw, vh, event) => {
+      const rect = element.getBoundingClientRect();
+      if (!vw || !vh || !rect.width || !rect.height) return null;
+
+      const scale = Math.max(rect.width / vw, rect.height / vh);
+      const offsetX = (rect.width - vw * scale) / 2;
+      const offsetY = (rect.height - vh * scale) / 2;
+      const x = (event.clientX - rect.left - offsetX) / scale;
+      const y = (event.clientY - rect.top - offsetY) / scale;
+      if (x < 0 || y < 0 || x >= vw || y >= vh) return null;
+      return [Math.round(x), Math.round(y)];
+    };
+
+    // Preview taps map to video pixels, which are also full-resolution frame
+    // pixels; toUploadPoints maps them onto the downscaled upload.
+    const previewToVideoPoint = (event) =>
+      tapToContentPoint(video, video.videoWidth, video.videoHeight, event);
+
+    const toUploadPoints = (points, scale) =>
+      points.map(([x, y]) => [Math.round(x * scale), Math.round(y * scale)]);
+
+    const showResultBlob = (blob) => {
+      if (resultUrl) URL.revokeObjectURL(resultUrl);
+      resultUrl = URL.createObjectURL(blob);
+      resultImage.src = resultUrl;
+    };
+
+    const handleResponse = async (response, frame, sentAt) => {
+      const type = response.headers.get("Content-Type") || "";
+      if (!response.ok) {
+        const data = type.includes("json") ? await response.json() : {};
+        const err = new Error(data.error || `Server error (${response.status})`);
+        err.code = data.code;
+        throw err;
+      }
+      if (!type.startsWith("image/")) {
+        throw new Error("Invalid response from server");
+      }
+      const maskBlob = await response.blob();
+      adaptPacing(performance.now() - sentAt, serverTiming(response));
+      showResultBlob(await compositeMask(frame.frame, maskBlob));
+      lastFrame = frame;
+      lastToken = response.headers.get("X-Image-Token") || null;
+    };
+
+    // Extra taps on the result image refine the same frame: only the token and
+    // the prompts are sent, the server reuses its cached SAM2 embedding.
+    const refineResult = async (point) => {
+      if (isProcessing || !lastToken || !lastFrame) return;
+      isProcessing = true;
+      // Result taps are in full-resolution pixels; the server works on the upload.
+      resultPoints = resultPoints.concat(toUploadPoints([point], lastFrame.scale));
+      setStatus(`refining with ${resultPoints.length} point(s)...`);
+
+      try {
+        const sentAt = performance.now();
+        const response = await fetch("/api/segment", {
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          body: JSON.stringify({
+            ...RESULT_FORMAT,
+            image_token: lastToken,
+            points: resultPoints,
+            labels: resultPoints.map(() => 1),
+          }),
+        });
+        await handleResponse(response, lastFrame, sentAt);
+        setStatus(`refined by SAM2 (${pacingSummary()})`);
+      } catch (err) {
+        if (err.code === "token_expired") {
+          lastToken = null;
+          resultPoints = [];
+        }
+        setStatus(err.message || "processing failed", true);
+      } finally {
+        isProcessing = false;
+      }
+    };
+
+    // prompts: optional { points: [[x, y], ...], labels: [...] } in video pixels
+    const sendFrame = async (prompts = null) => {
       if (isProcessing) return;
       isProcessing = true;
       captureButton.disabled = true;
-      setStatus("processing with SAM2...");
+      setStatus(prompts ? "segmenting tapped object..." : "processing with SAM2...");
 
       try {
         await initCamera();
-        const frameBlob = await captureFrame();
-        const formData = new FormData();
-        formData.append("frame", frameBlob, "frame.jpg");
+        const frame = await captureFrame();
+        const uploadPoints = prompts ? toUploadPoints(prompts.points, frame.scale) : [];
+        // Raw JPEG body (no multipart/base64); prompts travel in the query string.
+        const params = new URLSearchParams(RESULT_FORMAT);
+        if (prompts) {
+          params.set("points", JSON.stringify(uploadPoints));
+          params.set("labels", JSON.stringify(prompts.labels));
+        }
 
-        const response = await fetch("/api/segment", {
+        const sentAt = performance.now();
+        const response = await fetch(`/api/segment?${params.toString()}`, {
           method: "POST",
-          body: formData,
+          headers: { "Content-Type": "image/jpeg" },
+          body: frame.blob,
         });
 
-        const data = await response.json();
-        if (!response.ok) {
-          throw new Error(data.error || "Server error");
-        }
-
-        if (data.image_base64) {
-          resultImage.src = data.image_base64;
-          setStatus("processed by SAM2");
-        } else {
-          throw new Error("Invalid response from server");
-        }
+        await handleResponse(response, frame, sentAt);
+        resultPoints = uploadPoints;
+        setStatus(`processed by SAM2 (${pacingSummary()})`);
       } catch (err) {
         setStatus(err.message || "processing failed", true);
       } finally {
@@ -155,9 +417,146 @@
       }
     };
 
-    captureButton.addEventListener("click", sendFrame);
+    // Next frame after `interval` counted from when the last one was sent,
+    // so a slow round trip is not followed by an extra wait.
+    const scheduleLive = (sentAt = performance.now()) => {
+      if (liveTimer) clearTimeout(liveTimer);
+      const wait = Math.max(0, pacing.interval - (performance.now() - sentAt));
+      liveTimer = setTimeout(pushLiveFrame, wait);
+    };
+
+    const pushLiveFrame = async () => {
+      liveTimer = null;
+      if (!liveSocket || liveSocket.readyState !== WebSocket.OPEN) return;
+      let frame;
+      try {
+        frame = await captureFrame();
+      } catch (err) {
+        scheduleLive(); // camera not ready yet
+        return;
+      }
+      liveInFlight = { ...frame, sentAt: performance.now() };
+      liveSocket.send(frame.blob);
+      // A lost result must not stall the stream.
+      liveTimer = setTimeout(() => {
+        adaptPacing(LIVE_TIMEOUT_MS, null);
+        liveInFlight = null;
+        pushLiveFrame();
+      }, LIVE_TIMEOUT_MS);
+    };
+
+    const handleLiveResult = async (maskBlob) => {
+      const inFlight = liveInFlight;
+      liveInFlight = null;
+      if (!inFlight) return; // arrived after the timeout gave up on it
+      adaptPacing(performance.now() - inFlight.sentAt, liveMeta ? liveMeta.latency_ms : null);
+      scheduleLive(inFlight.sentAt);
+      showResultBlob(await compositeMask(inFlight.frame, maskBlob));
+      lastToken = null; // streamed frames are not cached for refinement
+      if (liveMeta) {
+        setStatus(
+          `live: ${pacingSummary()}, every ${Math.round(pacing.interval)} ms, ` +
+            `${liveMeta.dropped} dropped`
+        );
+      }
+    };
+
+    const stopLive = () => {
+      if (liveTimer) clearTimeout(liveTimer);
+      liveTimer = null;
+      liveInFlight = null;
+      if (liveSocket) {
+        const socket = liveSocket;
+        liveSocket = null;
+        socket.close();
+      }
+      liveButton.textContent = "Start Live Stream";
+      captureButton.disabled = false;
+    };
+
+    const startLive = async () => {
+      try {
+        await initCamera();
+      } catch (err) {
+        return;
+      }
+      const port = document.body.dataset.wsPort;
+      if (!port || port === "0") {
+        setStatus("live streaming is disabled on the server", true);
+        return;
+      }
+      const scheme = window.location.protocol === "https:" ? "wss" : "ws";
+      const socket = new WebSocket(`${scheme}://${window.location.hostname}:${port}/`);
+      socket.binaryType = "blob";
+      liveSocket = socket;
+      liveButton.textContent = "Stop Live Stream";
+      captureButton.disabled = true;
+      setStatus("connecting live stream...");
+
+      socket.addEventListener("open", () => {
+        socket.send(JSON.stringify(RESULT_FORMAT));
+        pushLiveFrame();
+        setStatus("live");
+      });
+      socket.addEventListener("message", (event) => {
+        if (typeof event.data !== "string") {
+          handleLiveResult(event.data);
+          return;
+        }
+        const msg = JSON.parse(event.data);
+        if (msg.type === "result") {
+          liveMeta = msg;
+          return;
+        }
+        if (msg.type === "error") {
+          setStatus(msg.error, true);
+        } else if (msg.type === "dropped") {
+          setStatus(msg.reason === "loading" ? "live: model is still loading..." : "live: server busy");
+        }
+        // The frame in flight will not get a result: move on to the next one.
+        if (liveInFlight) {
+          const { sentAt } = liveInFlight;
+          liveInFlight = null;
+          scheduleLive(sentAt);
+        }
+      });
+      socket.addEventListener("close", () => {
+        if (liveSocket === socket) {
+          stopLive();
+          setStatus("live stream closed", true);
+        }
+      });
+    };
+
+    captureButton.addEventListener("click", () => sendFrame());
+    liveButton.addEventListener("click", () => (liveSocket ? stopLive() : startLive()));
+    video.addEventListener("click", (event) => {
+      const point = previewToVideoPoint(event);
+      if (!point) return;
+      if (liveSocket && liveSocket.readyState === WebSocket.OPEN && trackingAvailable) {
+        const scale = uploadScale(video.videoWidth, video.videoHeight);
+        liveSocket.send(
+          JSON.stringify({ points: toUploadPoints([point], scale), labels: [1], track: true })
+        );
+        setStatus("live: tracking the tapped object");
+        return;
+      }
+      sendFrame({ points: [point], labels: [1] });
+    });
+    resultImage.addEventListener("click", (event) => {
+      const point = tapToContentPoint(
+        resultImage,
+        resultImage.naturalWidth,
+        resultImage.naturalHeight,
+        event
+      );
+      if (point) {
+        refineResult(point);
+      }
+    });
 
     const shutdownCamera = () => {
+      stopLive();
       if (stream) {
         stream.getTracks().forEach((track) => track.stop());
         stream = null;
@@ -173,6 +572,7 @@
       }
     });
 
+    loadConfig();
     initCamera();
   };
 
@@ -0,0 +1,156 @@
+"""
+Stub SAM2 backend (SAM2_BACKEND=stub) for load tests without model weights.
+
+StubImagePredictor and StubAutomaticGenerator expose the same surface as
+the real predictor/generator (see onnx_backend.py), so requests take the
+normal path through the InferenceWorker, embedding cache and encoders;
+only the model call is replaced by a sleep and a deterministic mask.
+
+Latency per encoder pass (one image) comes from SAM2_STUB_LATENCY_MS:
+"80" is a fixed 80 ms, "40-120" is uniform in that range, drawn from a
+generator seeded with SAM2_STUB_SEED so runs are repeatable.
+"""
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# Shared Jobsheet05 helpers (mask_codec, ...) live one folder up. Appended, not
+# prepended: that folder's sam2.py script must not shadow the sam2 package.
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+import mask_codec  # noqa: E402  pylint: disable=wrong-import-position
+
+
+def parse_latency(spec: str) -> Tuple[float, float]:
+    """'80' -> (80, 80); '40-120' -> (40, 120), in milliseconds."""
+    low, _, high = str(spec).partition("-")
+    low_ms = float(low)
+    high_ms = float(high) if high else low_ms
+    if low_ms < 0 or high_ms < low_ms:
+        raise ValueError(f"Invalid stub latency '{spec}'; use e.g. 80 or 40-120")
+    return low_ms, high_ms
+
+
+class _Latency:
+    """Thread-safe, seeded latency source shared by every stub instance."""
+
+    def __init__(self, spec: str, seed: int) -> None:
+        self.low_ms, self.high_ms = parse_latency(spec)
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+    def sleep(self, passes: int = 1) -> None:
+        if self.high_ms <= 0:
+            return
+        with self._lock:
+            total = float(self._rng.uniform(self.low_ms, self.high_ms, size=passes).sum())
+        time.sleep(total / 1000.0)
+
+
+LATENCY = _Latency(os.environ.get("SAM2_STUB_LATENCY_MS", "50"), int(os.environ.get("SAM2_STUB_SEED", "0")))
+
+
+def _disc(hw: Tuple[int, int], center: Tuple[float, float], radius: float) -> np.ndarray:
+    mask = np.zeros(hw, dtype=np.uint8)
+    cv2.circle(mask, (int(round(center[0])), int(round(center[1]))), max(1, int(round(radius))), 1, -1)
+    return mask
+
+
+class StubImagePredictor:
+    """SAM2ImagePredictor look-alike: masks are discs around the prompt."""
+
+    mask_threshold = 0.0
+
+    def __init__(self) -> None:
+        self.reset_predictor()
+
+    def clone(self) -> "StubImagePredictor":
+        return StubImagePredictor()
+
+    def reset_predictor(self) -> None:
+        self._features: Optional[Dict[str, Any]] = None
+        self._orig_hw: Optional[List[Tuple[int, int]]] = None
+        self._is_image_set = False
+        self._is_batch = False
+
+    def set_image_batch(self, images: Sequence[np.ndarray]) -> None:
+        LATENCY.sleep(len(images))
+        # Small stand-in features so the embedding cache has something to hold.
+        means = np.stack([image.mean(axis=(0, 1)) for image in images]).astype(np.float32)
+        self._features = {
+            "image_embed": means[:, :, None, None],
+            "high_res_feats": [means[:, :, None, None], means[:, :, None, None]],
+        }
+        self._orig_hw = [tuple(image.shape[:2]) for image in images]
+        self._is_image_set = True
+        self._is_batch = True
+
+    def set_image(self, image_rgb: np.ndarray) -> None:
+        self.set_image_batch([image_rgb])
+        self._is_batch = False
+
+    def _predict_one(self, index: int, point_coords: Any, box: Any, multimask: bool) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if not self._is_image_set:
+            raise RuntimeError("An image must be set with .set_image(...) before mask prediction.")
+        h, w = self._orig_hw[index]
+        if box is not None:
+            x0, y0, x1, y1 = np.asarray(box, dtype=np.float32).reshape(4)
+            center, radius = ((x0 + x1) / 2.0, (y0 + y1) / 2.0), min(x1 - x0, y1 - y0) / 2.0
+        elif point_coords is not None:
+            center, radius = tuple(np.asarray(point_coords, dtype=np.float32).reshape(-1, 2)[0]), min(h, w) / 6.0
+        else:
+            raise ValueError("point_coords or box is required")
+        sizes = (0.5, 1.0, 1.5) if multimask else (1.0,)
+        masks = np.stack([_disc((h, w), center, radius * s) for s in sizes]).astype(np.float32)
+        scores = np.array([0.8, 0.9, 0.85][: len(sizes)], dtype=np.float32)
+        return masks, scores, masks
+
+    def predict(
+        self,
+        point_coords: Any = None,
+        point_labels: Any = None,
+        box: Any = None,
+        multimask_output: bool = True,
+        **_: Any,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return self._predict_one(0, point_coords, box, multimask_output)
+
+    def predict_batch(
+        self,
+        point_coords_batch: Sequence[Any],
+        point_labels_batch: Sequence[Any],
+        box_batch: Optional[Sequence[Any]] = None,
+        multimask_output: bool = True,
+        **_: Any,
+    ) -> Tuple[List[np.ndarray], List[np.ndarray], List[np.ndarray]]:
+        boxes = box_batch if box_batch is not None else [None] * len(point_coords_batch)
+        results = [
+            self._predict_one(k, coords, box, multimask_output)
+            for k, (coords, box) in enumerate(zip(point_coords_batch, boxes))
+        ]
+        return [r[0] for r in results], [r[1] for r in results], [r[2] for r in results]
+
+
+class StubAutomaticGenerator:
+    """SAM2AutomaticMaskGenerator look-alike: one centred disc per call."""
+
+    def __init__(self, output_mode: str = "binary_mask", **_ignored: Any) -> None:
+        self.output_mode = output_mode
+
+    def generate(self, image_rgb: np.ndarray) -> List[Dict[str, Any]]:
+        LATENCY.sleep()
+        h, w = image_rgb.shape[:2]
+        mask = _disc((h, w), (w / 2.0, h / 2.0), min(h, w) / 4.0)
+        segmentation: Any = mask_codec.encode(mask) if self.output_mode != "binary_mask" else mask
+        return [{
+            "segmentation": segmentation,
+            "area": int(np.count_nonzero(mask)),
+            "predicted_iou": 0.9,
+            "stability_score": 0.95,
+            "point_coords": [[w / 2.0, h / 2.0]],
+        }]
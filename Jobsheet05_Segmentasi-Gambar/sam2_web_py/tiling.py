@@ -0,0 +1,124 @@
+"""
+Aspect-preserving letterboxing and overlapping tiles for SAM2.
+
+High-resolution uploads are segmented coarse-to-fine: one letterboxed pass
+over the whole image finds the object, then the overlapping tiles that
+contain its boundary are re-segmented at full detail (box + point prompts
+taken from the coarse mask) and stitched with feathered weights, so tile
+seams do not show. Tiles the coarse mask covers fully or not at all keep
+the coarse result. The model calls themselves live in sam2_utils.
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# ImageNet mean: the padding becomes zero after SAM2's input normalisation.
+PAD_RGB = (124, 116, 104)
+
+Box = Tuple[int, int, int, int]  # y0, x0, y1, x1 (exclusive)
+
+
+def letterbox(image: np.ndarray, size: int, pad: Sequence[int] = PAD_RGB) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+    """
+    Scale the long side to `size` and pad bottom/right to a square.
+    Returns (square image, scale, (content_h, content_w)); the content sits
+    at the top-left, so image coordinates map to it by `scale` alone.
+    """
+    h, w = image.shape[:2]
+    scale = size / max(h, w)
+    ch, cw = max(1, round(h * scale)), max(1, round(w * scale))
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+    resized = cv2.resize(image, (cw, ch), interpolation=interpolation)
+    square = np.empty((size, size, image.shape[2]), dtype=image.dtype)
+    square[:] = pad
+    square[:ch, :cw] = resized
+    return square, scale, (ch, cw)
+
+
+def tile_starts(length: int, tile: int, overlap: int) -> List[int]:
+    """Tile offsets along one axis; the last tile is aligned to the end."""
+    if length <= tile:
+        return [0]
+    stride = max(1, tile - overlap)
+    starts = list(range(0, length - tile, stride))
+    starts.append(length - tile)
+    return starts
+
+
+def tile_grid(h: int, w: int, tile: int, overlap: int) -> List[Box]:
+    return [
+        (y, x, min(h, y + tile), min(w, x + tile))
+        for y in tile_starts(h, tile, overlap)
+        for x in tile_starts(w, tile, overlap)
+    ]
+
+
+def feather(h: int, w: int, overlap: int) -> np.ndarray:
+    """Weights ramping linearly from ~0 at the tile edge to 1 `overlap` px in."""
+    ramp_len = max(1, overlap)
+
+    def axis(n: int) -> np.ndarray:
+        idx = np.arange(n, dtype=np.float32)
+        dist = np.minimum(idx, n - 1 - idx) + 1.0
+        return np.clip(dist / ramp_len, 1e-3, 1.0)
+
+    return np.outer(axis(h), axis(w)).astype(np.float32)
+
+
+def tile_prompt(
+    coarse_tile: np.ndarray,
+    user_points: Optional[np.ndarray] = None,
+    user_labels: Optional[np.ndarray] = None,
+    margin: int = 16,
+) -> Optional[Dict[str, Any]]:
+    """
+    Prompts for refining one tile from the coarse mask (tile coordinates):
+    the coarse mask's bounding box (plus margin), its most interior pixel as
+    a positive point, and any user points that fall inside the tile.
+    None if the tile is entirely inside or outside the coarse mask.
+    """
+    on = coarse_tile.astype(bool)
+    if not on.any() or on.all():
+        return None
+    h, w = on.shape
+    ys, xs = np.nonzero(on)
+    box = np.array([
+        max(0, xs.min() - margin), max(0, ys.min() - margin),
+        min(w - 1, xs.max() + margin), min(h - 1, ys.max() + margin),
+    ], dtype=np.float32)
+    dist = cv2.distanceTransform(on.astype(np.uint8), cv2.DIST_L2, 5)
+    iy, ix = np.unravel_index(int(np.argmax(dist)), dist.shape)
+    points = [[float(ix), float(iy)]]
+    labels = [1]
+    if user_points is not None:
+        for (px, py), label in zip(user_points, user_labels):
+            if 0 <= px < w and 0 <= py < h:
+                points.append([float(px), float(py)])
+                labels.append(int(label))
+    return {
+        "box": box,
+        "point_coords": np.asarray(points, dtype=np.float32),
+        "point_labels": np.asarray(labels, dtype=np.int32),
+    }
+
+
+class MaskStitcher:
+    """Feather-weighted average of per-tile binary masks, thresholded at 0.5."""
+
+    def __init__(self, h: int, w: int, overlap: int) -> None:
+        self.overlap = overlap
+        self._acc = np.zeros((h, w), dtype=np.float32)
+        self._weight = np.zeros((h, w), dtype=np.float32)
+
+    def add(self, box: Box, mask: np.ndarray) -> None:
+        y0, x0, y1, x1 = box
+        weights = feather(y1 - y0, x1 - x0, self.overlap)
+        self._acc[y0:y1, x0:x1] += weights * mask.astype(np.float32)
+        self._weight[y0:y1, x0:x1] += weights
+
+    def result(self) -> np.ndarray:
+        covered = self._weight > 0
+        out = np.zeros(self._acc.shape, dtype=np.uint8)
+        out[covered] = (self._acc[covered] / self._weight[covered]) > 0.5
+        return out
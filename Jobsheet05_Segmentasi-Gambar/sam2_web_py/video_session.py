@@ -0,0 +1,177 @@
+"""
+Streaming SAM2 video tracking: prompt an object once, then follow it.
+
+SAM2VideoPredictor expects the whole video up front (a folder of frames),
+so a live stream drives the model's own per-frame step instead:
+`SAM2Base.track_step` conditions each new frame on a memory bank of past
+masks (encoded by the memory encoder) and object pointers, the same way
+the video predictor propagates. A prompted frame becomes a keyframe
+("conditioning frame"); later frames need no prompt and no mask
+generation, and the mask stays temporally stable.
+
+Only the memory that track_step can still read is kept: keyframes (capped
+at `max_keyframes`), the last `num_maskmem` frames' mask memory and the
+last `max_obj_ptrs_in_encoder` object pointers. Memory features are stored
+in bf16 like the video predictor does.
+"""
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from embedding_cache import approx_nbytes
+
+# SAM2 input normalisation (ImageNet), as in SAM2Transforms.
+_MEAN = torch.tensor([0.485, 0.456, 0.406]).view(3, 1, 1)
+_STD = torch.tensor([0.229, 0.224, 0.225]).view(3, 1, 1)
+
+
+class StreamingTracker:
+    """One tracked object on one frame stream, on a shared SAM2Base model."""
+
+    def __init__(self, model: Any, max_keyframes: int = 4) -> None:
+        self.model = model
+        self.max_keyframes = max(1, max_keyframes)
+        self.reset()
+
+    def reset(self) -> None:
+        self._output: Dict[str, Dict[int, Dict[str, Any]]] = {"cond_frame_outputs": {}, "non_cond_frame_outputs": {}}
+        self._pos_enc: Optional[List[torch.Tensor]] = None  # same for every frame, stored once
+        self.frame_idx = 0
+
+    @property
+    def has_prompt(self) -> bool:
+        return bool(self._output["cond_frame_outputs"])
+
+    def nbytes(self) -> int:
+        frames = list(self._output["cond_frame_outputs"].values()) + list(self._output["non_cond_frame_outputs"].values())
+        per_frame = [{k: v for k, v in out.items() if k != "maskmem_pos_enc"} for out in frames]
+        return approx_nbytes(per_frame) + approx_nbytes(self._pos_enc)
+
+    # ------------------------------------------------------------------
+    def prompt(
+        self,
+        image_rgb: np.ndarray,
+        point_coords: Optional[np.ndarray] = None,
+        point_labels: Optional[np.ndarray] = None,
+        box: Optional[np.ndarray] = None,
+        keyframe: bool = False,
+    ) -> np.ndarray:
+        """
+        Segment `image_rgb` from prompts (in its pixels) and remember it as a
+        keyframe. keyframe=False starts a new track; True adds a correcting
+        keyframe to the current one. Returns the mask at image resolution.
+        """
+        if not keyframe:
+            self.reset()
+        point_inputs = self._point_inputs(image_rgb.shape[:2], point_coords, point_labels, box)
+        return self._step(image_rgb, point_inputs)
+
+    def track(self, image_rgb: np.ndarray) -> np.ndarray:
+        """Propagate the tracked object to the next frame."""
+        if not self.has_prompt:
+            raise RuntimeError("Tracking needs a prompted keyframe first")
+        return self._step(image_rgb, None)
+
+    # ------------------------------------------------------------------
+    def _point_inputs(
+        self,
+        image_hw: Any,
+        point_coords: Optional[np.ndarray],
+        point_labels: Optional[np.ndarray],
+        box: Optional[np.ndarray],
+    ) -> Dict[str, torch.Tensor]:
+        """Box corners (labels 2/3) then points, scaled to the model input size."""
+        coords: List[List[float]] = []
+        labels: List[int] = []
+        if box is not None:
+            x0, y0, x1, y1 = np.asarray(box, dtype=np.float32).reshape(4)
+            coords += [[x0, y0], [x1, y1]]
+            labels += [2, 3]
+        if point_coords is not None:
+            coords += np.asarray(point_coords, dtype=np.float32).reshape(-1, 2).tolist()
+            labels += np.asarray(point_labels, dtype=np.int32).reshape(-1).tolist()
+        if not coords:
+            raise ValueError("point_coords or box is required")
+        h, w = image_hw
+        size = self.model.image_size
+        scaled = torch.tensor(coords, dtype=torch.float32) * torch.tensor([size / w, size / h])
+        return {
+            "point_coords": scaled[None].to(self.model.device),
+            "point_labels": torch.tensor(labels, dtype=torch.int32)[None].to(self.model.device),
+        }
+
+    def _encode_image(self, image_rgb: np.ndarray) -> Any:
+        size = self.model.image_size
+        if image_rgb.shape[:2] != (size, size):
+            image_rgb = cv2.resize(image_rgb, (size, size), interpolation=cv2.INTER_LINEAR)
+        image = torch.from_numpy(image_rgb).permute(2, 0, 1).float().div_(255.0)
+        image = ((image - _MEAN) / _STD)[None].to(self.model.device)
+        backbone_out = self.model.forward_image(image)
+        _, vision_feats, vision_pos_embeds, feat_sizes = self.model._prepare_backbone_features(  # pylint: disable=protected-access
+            backbone_out
+        )
+        return vision_feats, vision_pos_embeds, feat_sizes
+
+    def _step(self, image_rgb: np.ndarray, point_inputs: Optional[Dict[str, torch.Tensor]]) -> np.ndarray:
+        vision_feats, vision_pos_embeds, feat_sizes = self._encode_image(image_rgb)
+        is_keyframe = point_inputs is not None
+        out = self.model.track_step(
+            frame_idx=self.frame_idx,
+            is_init_cond_frame=is_keyframe,
+            current_vision_feats=vision_feats,
+            current_vision_pos_embeds=vision_pos_embeds,
+            feat_sizes=feat_sizes,
+            point_inputs=point_inputs,
+            mask_inputs=None,
+            output_dict=self._output,
+            num_frames=self.frame_idx + 1,
+            run_mem_encoder=True,
+        )
+        self._remember(out, is_keyframe)
+        self.frame_idx += 1
+        self._prune()
+
+        logits = out["pred_masks_high_res"].float()
+        h, w = image_rgb.shape[:2]
+        if tuple(logits.shape[-2:]) != (h, w):
+            logits = F.interpolate(logits, size=(h, w), mode="bilinear", align_corners=False)
+        return (logits[0, 0] > 0).cpu().numpy().astype(np.uint8)
+
+    def _remember(self, out: Dict[str, Any], is_keyframe: bool) -> None:
+        """Keep the compact per-frame state that later track_step calls read."""
+        if self._pos_enc is None and out["maskmem_pos_enc"] is not None:
+            self._pos_enc = [x.clone() for x in out["maskmem_pos_enc"]]
+        features = out["maskmem_features"]
+        compact = {
+            "maskmem_features": features.to(torch.bfloat16) if features is not None else None,
+            "maskmem_pos_enc": self._pos_enc,
+            "obj_ptr": out["obj_ptr"],
+            "object_score_logits": out["object_score_logits"],
+        }
+        if is_keyframe:
+            keyframes = self._output["cond_frame_outputs"]
+            keyframes[self.frame_idx] = compact
+            while len(keyframes) > self.max_keyframes:
+                del keyframes[min(keyframes)]
+        else:
+            self._output["non_cond_frame_outputs"][self.frame_idx] = compact
+
+    def _prune(self) -> None:
+        """
+        Drop non-keyframes the next track_step cannot reach: mask memory is
+        read from the last num_maskmem (strided) frames, object pointers
+        from the last max_obj_ptrs_in_encoder frames.
+        """
+        stride = self.model.memory_temporal_stride_for_eval
+        memory_window = self.model.num_maskmem * stride + 1
+        pointer_window = self.model.max_obj_ptrs_in_encoder if self.model.use_obj_ptrs_in_encoder else 0
+        frames = self._output["non_cond_frame_outputs"]
+        for t in list(frames):
+            age = self.frame_idx - t
+            if age > max(memory_window, pointer_window):
+                del frames[t]
+            elif age > memory_window and frames[t]["maskmem_features"] is not None:
+                frames[t] = {**frames[t], "maskmem_features": None}  # pointer still in reach
@@ -0,0 +1,229 @@
+"""
+WebSocket streaming mode for continuous segmentation from the phone camera.
+
+Runs an asyncio `websockets` server next to the Flask app (same process, so
+it shares the loaded model and the InferenceWorker queue).
+
+Protocol, one socket per phone:
+  client -> server  binary   JPEG/PNG/WebP frame
+  client -> server  text     JSON settings, e.g.
+                             {"format": "jpeg", "quality": 70,
+                              "points": [[x, y]], "labels": [1], "box": null,
+                              "preset": "fast", "track": false}
+  server -> client  text     {"type": "result", "seq": n, "latency_ms": ...,
+                              "dropped": k, "mimetype": "..."}  followed by
+  server -> client  binary   the encoded result
+  server -> client  text     {"type": "error", "error": "..."}
+  server -> client  text     {"type": "dropped", "reason": "loading"|"busy"}
+                             (frame skipped; a client that waits for each
+                              result before sending the next can go on)
+
+Settings are merged into the socket's current ones, except the prompt:
+any of "points"/"labels"/"box" replaces all three, validated like the
+/api/segment fields. Invalid settings are answered with an error and the
+previous settings stay in effect.
+
+Only the newest frame is kept per socket: frames that arrive while the
+previous one is being segmented replace each other and are counted as dropped.
+
+With "track": true the socket is a tracking session (see video_session.py):
+the first frame after the prompt changes is segmented from the prompt, later
+frames follow that object through SAM2's memory without re-prompting
+("keyframe": true adds the new prompt to the current track instead of
+starting a new one). The session is freed when the socket closes.
+"""
+import asyncio
+import json
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+import cv2
+import numpy as np
+
+from inference_worker import InferenceWorker, QueueFullError
+from metrics import RECENT_LATENCY_MS
+from result_encoding import encode_result, normalize_format
+from sam2_utils import (
+    GENERATOR_PRESETS,
+    TRACK_SESSIONS,
+    SegmentJob,
+    SessionExpiredError,
+    has_prompts,
+    is_ready,
+    tracking_available,
+    validate_prompts,
+)
+
+try:  # type: ignore
+    import websockets  # type: ignore
+except Exception:  # pylint: disable=broad-except
+    websockets = None
+
+_MAX_FRAME_BYTES = 4 * 1024 * 1024
+_PROMPT_KEYS = ("points", "labels", "box")
+
+
+class _Session:
+    """Per-socket state: latest frame slot + current prompt/format settings."""
+
+    def __init__(self) -> None:
+        self.frame: Optional[bytes] = None
+        self.frame_time = 0.0
+        self.new_frame = asyncio.Event()
+        self.dropped = 0
+        self.seq = 0
+        self.settings: Dict[str, Any] = {"format": "jpeg", "quality": 70}
+        self.track_id = uuid.uuid4().hex
+        self.prompt_version = 0  # bumped whenever the prompt changes
+        self.keyframe_version = -1  # prompt_version the track was started from
+
+    def update_settings(self, raw: str) -> None:
+        data = json.loads(raw)
+        if not isinstance(data, dict):
+            raise ValueError("settings must be a JSON object")
+        merged = {**self.settings, **data}
+        merged["format"], merged["quality"] = normalize_format(merged.get("format"), merged.get("quality"))
+        if merged["format"] in ("json", "rle"):
+            raise ValueError("streaming supports binary formats only")
+        if merged.get("preset") and merged["preset"] not in GENERATOR_PRESETS:
+            raise ValueError(f"Unknown preset '{merged['preset']}'")
+        if merged.get("track") and not tracking_available():
+            raise ValueError("Tracking sessions need SAM2_BACKEND=torch")
+        if any(key in data for key in _PROMPT_KEYS):
+            # A new prompt replaces the old one as a whole (no stale labels).
+            merged.update(validate_prompts(*(data.get(key) for key in _PROMPT_KEYS)))
+            self.prompt_version += 1
+        self.settings = merged
+
+    def job(self, image: np.ndarray) -> SegmentJob:
+        """Keyframe on a new prompt, propagation afterwards, plain segmentation otherwise."""
+        settings = self.settings
+        prompted = has_prompts(settings.get("points"), settings.get("box"))
+        if not (settings.get("track") and prompted):
+            return SegmentJob(
+                image,
+                points=settings.get("points"),
+                labels=settings.get("labels"),
+                box=settings.get("box"),
+                preset=settings.get("preset"),
+            )
+        if self.keyframe_version == self.prompt_version:
+            return SegmentJob(image, session=self.track_id)
+        self.keyframe_version = self.prompt_version
+        return SegmentJob(
+            image,
+            points=settings.get("points"),
+            labels=settings.get("labels"),
+            box=settings.get("box"),
+            session=self.track_id,
+            keyframe=bool(settings.get("keyframe")),
+        )
+
+
+async def _receive(websocket: Any, session: _Session) -> None:
+    async for message in websocket:
+        if isinstance(message, (bytes, bytearray)):
+            if session.frame is not None:
+                session.dropped += 1  # replaced before it was processed
+            session.frame = bytes(message)
+            session.frame_time = time.perf_counter()
+            session.new_frame.set()
+        else:
+            try:
+                session.update_settings(message)
+            except (TypeError, ValueError) as exc:
+                await websocket.send(json.dumps({"type": "error", "error": str(exc)}))
+
+
+async def _process(websocket: Any, session: _Session, inference: InferenceWorker) -> None:
+    while True:
+        await session.new_frame.wait()
+        session.new_frame.clear()
+        data, received_at = session.frame, session.frame_time
+        session.frame = None
+        if data is None:
+            continue
+
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            await websocket.send(json.dumps({"type": "error", "error": "Could not decode frame"}))
+            continue
+
+        if not is_ready():
+            # Model still loading in the background: drop frames until ready.
+            session.dropped += 1
+            await websocket.send(json.dumps({"type": "dropped", "reason": "loading"}))
+            await asyncio.sleep(0.5)
+            continue
+
+        settings = session.settings
+        job = session.job(image)
+        try:
+            future = inference.submit(job)
+        except QueueFullError:
+            # Server busy: skip this frame, the next one will be newer anyway.
+            session.dropped += 1
+            await websocket.send(json.dumps({"type": "dropped", "reason": "busy"}))
+            await asyncio.sleep(0.05)
+            if job.session and has_prompts(job.points, job.box):
+                session.keyframe_version = -1  # the keyframe never ran: prompt again
+            continue
+
+        try:
+            mask_small = await asyncio.wrap_future(future)
+            body, mimetype, _ = await asyncio.to_thread(
+                encode_result, settings["format"], settings["quality"], image, mask_small
+            )
+        except SessionExpiredError:
+            session.keyframe_version = -1  # evicted while idle: re-prompt on the next frame
+            await websocket.send(json.dumps({"type": "error", "error": "Tracking session expired; prompting again"}))
+            continue
+        except Exception as exc:  # pylint: disable=broad-except
+            await websocket.send(json.dumps({"type": "error", "error": f"Segmentation failed: {exc}"}))
+            continue
+
+        session.seq += 1
+        latency_ms = round((time.perf_counter() - received_at) * 1000.0, 1)
+        RECENT_LATENCY_MS.observe(latency_ms)
+        meta = {
+            "type": "result",
+            "seq": session.seq,
+            "latency_ms": latency_ms,
+            "dropped": session.dropped,
+            "mimetype": mimetype,
+        }
+        await websocket.send(json.dumps(meta))
+        await websocket.send(body)
+
+
+def _make_handler(inference: InferenceWorker) -> Any:
+    async def handler(websocket: Any, _path: Optional[str] = None) -> None:
+        session = _Session()
+        receiver = asyncio.ensure_future(_receive(websocket, session))
+        processor = asyncio.ensure_future(_process(websocket, session, inference))
+        try:
+            await asyncio.wait({receiver, processor}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (receiver, processor):
+                task.cancel()
+            TRACK_SESSIONS.drop(session.track_id)
+
+    return handler
+
+
+async def serve(inference: InferenceWorker, host: str, port: int) -> None:
+    if websockets is None:
+        raise ImportError("websockets package is required for streaming mode")
+    async with websockets.serve(_make_handler(inference), host, port, max_size=_MAX_FRAME_BYTES):
+        await asyncio.Future()  # run forever
+
+
+def start_in_thread(inference: InferenceWorker, host: str = "0.0.0.0", port: int = 8001) -> threading.Thread:
+    """Run the streaming server on its own event loop in a daemon thread."""
+    thread = threading.Thread(
+        target=lambda: asyncio.run(serve(inference, host, port)), name="sam2-ws", daemon=True
+    )
+    thread.start()
+    return thread
@@ -5,7 +5,7 @@
 # 0=background, 1=hair, 2=body-skin, 3=face-skin, 4=clothes, 5=others.
 #
 # Model (auto-download on first run):
-#   https://storage.googleapis.com/mediapipe-models/image_segmenter/selfie_multiclass_256x256/float32/latest/selfie_multiclass_256x256.tflite
+#   https://storage.googleapis.com/mediapipe-models/image_segmenter/selfie_multiclass_256x256/float32/1/selfie_multiclass_256x256.tflite
 #
 # Install dependencies (Python 3.9+ recommended):
 #   pip install mediapipe opencv-python numpy requests
@@ -24,42 +24,38 @@
 # -----------------------------------------------------------
 # Output: shows original and mask overlay (person vs background)
 
-import os, cv2, numpy as np, requests, mediapipe as mp
+import os, cv2, numpy as np, mediapipe as mp
 from mediapipe.tasks import python
 from mediapipe.tasks.python import vision
 
-MODEL_PATH = os.environ.get("MP_SEG_MODEL", "models/selfie_multiclass_256x256.tflite")
-MODEL_URL = "https://storage.googleapis.com/mediapipe-models/image_segmenter/selfie_multiclass_256x256/float32/latest/selfie_multiclass_256x256.tflite"
+from lowres_pipeline import to_mp_image_lowres, foreground_lowres, guided_upsample
+import model_store
+
+MODEL_PATH = os.environ.get("MP_SEG_MODEL", "selfie_multiclass_256x256.tflite")
+MODEL_URL = "https://storage.googleapis.com/mediapipe-models/image_segmenter/selfie_multiclass_256x256/float32/1/selfie_multiclass_256x256.tflite"
+MODEL_SHA256 = os.environ.get("MP_SEG_MODEL_SHA256")
 
 def ensure_model(path=MODEL_PATH, url=MODEL_URL):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    if not os.path.exists(path):
-        print(f"[INFO] Downloading model to {path} ...")
-        r = requests.get(url, timeout=60)
-        r.raise_for_status()
-        with open(path, "wb") as f:
-            f.write(r.content)
-        print("[OK] Model downloaded.")
-    return path
+    # Resumable, SHA-256 checked download into the shared store (model_store.py).
+    return model_store.fetch(url, path, sha256=MODEL_SHA256)
 
 def build_segmenter(running_mode: vision.RunningMode):
     BaseOptions = mp.tasks.BaseOptions
     ImageSegmenter = mp.tasks.vision.ImageSegmenter
     ImageSegmenterOptions = mp.tasks.vision.ImageSegmenterOptions
     options = ImageSegmenterOptions(
-        base_options=BaseOptions(model_asset_path=ensure_model()),
+        base_options=BaseOptions(model_asset_buffer=model_store.load_buffer(ensure_model())),
         running_mode=running_mode,
         output_category_mask=True,
         output_confidence_masks=False
     )
     return ImageSegmenter.create_from_options(options)
 
-def to_mp_image_bgr(img_bgr):
-    return mp.Image(image_format=mp.ImageFormat.SRGB,
-                    data=cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB))
-
-def draw_mask_overlay(img_bgr, mask_u8):
-    foreground = (mask_u8 > 0).astype(np.uint8) * 255
+def draw_mask_overlay(img_bgr, mask_u8, small_bgr):
+    # Mask stays 256x256 until here; guided upsample keeps edges sharp.
+    alpha = guided_upsample(foreground_lowres(mask_u8), small_bgr,
+                            img_bgr.shape, guide_full_bgr=img_bgr)
+    foreground = (alpha * 255).astype(np.uint8)
     colored = cv2.applyColorMap(foreground, cv2.COLORMAP_OCEAN)
     blended = cv2.addWeighted(img_bgr, 0.4, colored, 0.6, 0)
     return blended
@@ -78,10 +74,10 @@ def main():
             ret, frame = cap.read()
             if not ret:
                 break
-            mp_img = to_mp_image_bgr(frame)
+            mp_img, small = to_mp_image_lowres(frame)
             result = seg.segment_for_video(mp_img, int(ts))
             mask = result.category_mask.numpy_view()
-            overlay = draw_mask_overlay(frame, mask)
+            overlay = draw_mask_overlay(frame, mask, small)
             cv2.imshow("Selfie Segmentation (OBS)", overlay)
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 break
@@ -0,0 +1,93 @@
+# Tests for the mask stream file in mask_codec.py (Python)
+# -----------------------------------------------------
+# Writes masks with MaskStreamWriter, cuts the file in the middle of the
+# last record (as a crash while writing would), reopens it and appends more
+# frames: every complete frame before and after the interruption must read
+# back unchanged.
+#
+# Usage:
+#   python -m unittest test_mask_codec     (or: python -m pytest test_mask_codec.py)
+#
+# © For educational use.
+
+import os, tempfile, unittest
+
+import numpy as np
+
+import mask_codec
+
+
+def random_mask(rng, multiclass=False):
+    if multiclass:
+        return rng.integers(0, 6, size=(24, 32), dtype=np.uint8)
+    return (rng.random((24, 32)) > 0.5).astype(np.uint8)
+
+
+class MaskStreamTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "masks.rle")
+        self.rng = np.random.default_rng(0)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_back(self):
+        frames = {}
+        for idx, rle in mask_codec.read_mask_stream(self.path):
+            frames[idx] = mask_codec.decode_multiclass(rle) if "values" in rle else mask_codec.decode(rle)
+        return frames
+
+    def write(self, masks, multiclass=False):
+        with mask_codec.MaskStreamWriter(self.path) as stream:
+            for idx, mask in masks.items():
+                stream.append(idx, mask, multiclass=multiclass)
+
+    def assertFrames(self, expected):
+        frames = self.read_back()
+        self.assertEqual(sorted(frames), sorted(expected))
+        for idx, mask in expected.items():
+            np.testing.assert_array_equal(frames[idx], mask)
+
+    def test_round_trip(self):
+        masks = {i: random_mask(self.rng, multiclass=True) for i in range(3)}
+        self.write(masks, multiclass=True)
+        self.assertFrames(masks)
+
+    def test_append_after_truncated_tail(self):
+        first = {i: random_mask(self.rng) for i in range(3)}
+        self.write(first)
+        size = os.path.getsize(self.path)
+        with open(self.path, "r+b") as f:
+            f.truncate(size - 5)          # last record cut short
+        second = {i: random_mask(self.rng) for i in range(3, 6)}
+        self.write(second)
+        del first[2]
+        self.assertFrames({**first, **second})
+
+    def test_append_after_truncated_header(self):
+        self.write({0: random_mask(self.rng)})
+        with open(self.path, "ab") as f:
+            f.write(b"\x01\x00\x00")      # crash inside the next header
+        more = {1: random_mask(self.rng)}
+        self.write(more)
+        self.assertEqual(sorted(self.read_back()), [0, 1])
+
+    def test_interrupted_before_magic(self):
+        with open(self.path, "wb") as f:
+            f.write(mask_codec.STREAM_MAGIC[:3])
+        masks = {0: random_mask(self.rng)}
+        self.write(masks)
+        self.assertFrames(masks)
+
+    def test_other_file_is_not_overwritten(self):
+        with open(self.path, "wb") as f:
+            f.write(b"not a mask stream")
+        with self.assertRaises(ValueError):
+            mask_codec.MaskStreamWriter(self.path)
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), b"not a mask stream")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+# Tests for model_store.py against a local HTTP stand-in (Python)
+# -----------------------------------------------------
+# A small http.server serves one "model" with an ETag, byte ranges and
+# If-Range, and can drop the connection part-way. Covers resuming, a file
+# that changed upstream between attempts, 416 on a stale .part, corrupted
+# and truncated files, and files that were already there without a digest.
+#
+# Usage:
+#   python -m unittest test_model_store     (or: python -m pytest test_model_store.py)
+#
+# © For educational use.
+
+import os, hashlib, tempfile, threading, unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import model_store
+
+
+class ModelServer(BaseHTTPRequestHandler):
+    content = b""
+    etag = '"v1"'
+    drop_after = None     # bytes to send on the next GET before hanging up
+    requests_seen = []    # (method, Range, If-Range)
+
+    def log_message(self, *args):
+        pass
+
+    def _send_headers(self, status, length, extra=()):
+        self.send_response(status)
+        self.send_header("Content-Length", str(length))
+        self.send_header("ETag", self.etag)
+        for key, value in extra:
+            self.send_header(key, value)
+        self.end_headers()
+
+    def do_HEAD(self):
+        type(self).requests_seen.append(("HEAD", None, None))
+        self._send_headers(200, len(self.content))
+
+    def do_GET(self):
+        cls = type(self)
+        rng, if_range = self.headers.get("Range"), self.headers.get("If-Range")
+        cls.requests_seen.append(("GET", rng, if_range))
+        start = 0
+        if rng and (if_range is None or if_range == self.etag):
+            start = int(rng.split("=")[1].split("-")[0])
+            if start >= len(self.content):
+                self._send_headers(416, 0, [("Content-Range", f"bytes */{len(self.content)}")])
+                return
+        body = self.content[start:]
+        if start:
+            self._send_headers(206, len(body), [("Content-Range", f"bytes {start}-{len(self.content) - 1}/{len(self.content)}")])
+        else:
+            self._send_headers(200, len(body))
+        if cls.drop_after is not None:
+            body, cls.drop_after = body[:cls.drop_after], None
+            self.close_connection = True
+        self.wfile.write(body)
+
+
+class ModelStoreTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), ModelServer)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}/model.bin"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dest = os.path.join(self.tmp.name, "model.bin")
+        ModelServer.content = os.urandom(300_000)
+        ModelServer.etag = '"v1"'
+        ModelServer.drop_after = None
+        ModelServer.requests_seen = []
+        model_store._verified.clear()
+        model_store._unverified.clear()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def fetch(self, **kwargs):
+        return model_store.fetch(self.url, self.dest, offline=False, **kwargs)
+
+    def read(self):
+        with open(self.dest, "rb") as f:
+            return f.read()
+
+    def test_resume_sends_range_and_if_range(self):
+        ModelServer.drop_after = 100_000
+        with self.assertRaises(model_store.ModelStoreError):
+            self.fetch()
+        kept = os.path.getsize(self.dest + ".part")
+        self.assertTrue(0 < kept <= 100_000)
+        self.fetch()
+        self.assertEqual(self.read(), ModelServer.content)
+        self.assertEqual(ModelServer.requests_seen[-1], ("GET", f"bytes={kept}-", '"v1"'))
+        self.assertFalse(os.path.exists(self.dest + ".part"))
+
+    def test_changed_upstream_is_not_spliced(self):
+        ModelServer.drop_after = 100_000
+        with self.assertRaises(model_store.ModelStoreError):
+            self.fetch()
+        ModelServer.content, ModelServer.etag = os.urandom(250_000), '"v2"'
+        self.fetch()
+        self.assertEqual(self.read(), ModelServer.content)
+
+    def test_416_on_stale_part_restarts(self):
+        with open(self.dest + ".part", "wb") as f:
+            f.write(os.urandom(400_000))     # longer than the file on the server
+        with open(self.dest + ".part.json", "w", encoding="utf-8") as f:
+            f.write('{"validator": "\\"v1\\""}')
+        self.fetch()
+        self.assertEqual(self.read(), ModelServer.content)
+        self.assertEqual(ModelServer.requests_seen[0][1], "bytes=400000-")
+
+    def test_part_without_validator_is_not_resumed(self):
+        with open(self.dest + ".part", "wb") as f:
+            f.write(b"old bytes")
+        self.fetch()
+        self.assertEqual(self.read(), ModelServer.content)
+        self.assertEqual(ModelServer.requests_seen, [("GET", None, None)])
+
+    def test_corrupted_file_is_fetched_again(self):
+        self.fetch()
+        with open(self.dest, "r+b") as f:
+            f.write(b"\0\0\0\0")
+        model_store._verified.clear()
+        self.fetch()
+        self.assertEqual(self.read(), ModelServer.content)
+
+    def test_pinned_digest_mismatch_leaves_no_file(self):
+        with self.assertRaises(model_store.ModelStoreError):
+            self.fetch(sha256="0" * 64)
+        self.assertFalse(os.path.exists(self.dest))
+        self.assertFalse(os.path.exists(self.dest + ".part"))
+
+    def test_preexisting_truncated_file_is_replaced(self):
+        with open(self.dest, "wb") as f:
+            f.write(b"abc")
+        self.fetch()
+        self.assertEqual(self.read(), ModelServer.content)
+        with open(self.dest + ".sha256", encoding="ascii") as f:
+            self.assertEqual(f.read().split()[0], hashlib.sha256(ModelServer.content).hexdigest())
+
+    def test_preexisting_complete_file_is_kept(self):
+        with open(self.dest, "wb") as f:
+            f.write(ModelServer.content)
+        self.fetch()
+        self.assertEqual([m for m, _, _ in ModelServer.requests_seen], ["HEAD"])
+        self.assertTrue(os.path.exists(self.dest + ".sha256"))
+
+    def test_preexisting_file_offline_is_not_recorded(self):
+        with open(self.dest, "wb") as f:
+            f.write(b"abc")
+        model_store.fetch(self.url, self.dest, offline=True)
+        self.assertFalse(os.path.exists(self.dest + ".sha256"))
+        self.assertEqual(ModelServer.requests_seen, [])
+
+    def test_preexisting_file_offline_can_be_loaded(self):
+        with open(self.dest, "wb") as f:
+            f.write(b"abc")
+        path = model_store.fetch(self.url, self.dest, offline=True)
+        self.assertEqual(model_store.load_buffer(path), b"abc")
+        with open(self.dest, "ab") as f:
+            f.write(b"def")     # changed after fetch(): no longer accepted
+        with self.assertRaises(model_store.ModelStoreError):
+            model_store.load_buffer(path)
+
+    def test_offline_missing_file_raises(self):
+        with self.assertRaises(model_store.ModelStoreError):
+            model_store.fetch(self.url, self.dest, offline=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
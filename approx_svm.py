@@ -0,0 +1,119 @@
+# Approximate-kernel SVM for full-size MNIST (Python)
+# -----------------------------------------------------
+# Jobsheet02/Tugas02 train `svm.SVC(kernel='rbf')` on only 5000 images
+# ("Gunakan subset karena SVM berat"): an exact kernel SVM scales at least
+# quadratically with the number of samples, and probability=True adds an
+# internal cross-validation on top. This module approximates the RBF kernel
+# with an explicit feature map and trains a linear classifier on it, so the
+# cost grows linearly and all 60k training images fit in seconds.
+# - features="rff": random Fourier features, z(x) = sqrt(2/D) cos(xW + b)
+# - features="nystroem": RBF kernel against `n_components` landmark images,
+#   whitened by K_mm^(-1/2)
+# - the feature map is applied per mini-batch in float32, so the full
+#   (N, n_components) matrix is never held in memory
+# - the classifier is SGDClassifier trained with partial_fit over the
+#   batches: loss="hinge" is a linear SVM, loss="log_loss" gives
+#   predict_proba (replaces SVC(probability=True))
+#
+# Usage:
+#   from approx_svm import ApproxKernelSVM
+#   clf = ApproxKernelSVM(features="rff", n_components=2000)
+#   clf.fit(x_train_flatten, y_train)          # all 60k, values in [0, 1]
+#   print(clf.score(x_test_flatten, y_test))
+#
+# svm_benchmark.py compares it with the exact SVC (accuracy + time).
+#
+# © For educational use.
+
+import numpy as np
+from sklearn.linear_model import SGDClassifier
+
+
+class ApproxKernelSVM:
+    """RBF-kernel classifier via RFF/Nystroem features + linear SGD."""
+
+    def __init__(self, features="rff", n_components=2000, gamma="scale", loss="hinge", alpha=1e-5,
+                 epochs=5, batch_size=2048, random_state=0):
+        if features not in ("rff", "nystroem"):
+            raise ValueError(f"features must be 'rff' or 'nystroem', not '{features}'")
+        self.features = features
+        self.n_components = n_components
+        self.gamma = gamma
+        self.loss = loss
+        self.alpha = alpha
+        self.epochs = epochs
+        self.batch_size = batch_size
+        self.random_state = random_state
+
+    # ===================== Feature map =====================
+    def _rbf(self, X):
+        """exp(-gamma * ||x - l||^2) against every landmark l, float32."""
+        d2 = (X * X).sum(1)[:, None] - 2.0 * (X @ self._landmarks.T) + self._landmark_sq[None, :]
+        np.maximum(d2, 0.0, out=d2)
+        return np.exp(-self.gamma_ * d2, dtype=np.float32)
+
+    def _fit_features(self, X, rng):
+        n, d = X.shape
+        if self.gamma == "scale":    # same default as SVC(gamma='scale')
+            var = float(X.var())
+            self.gamma_ = 1.0 / (d * var) if var > 0 else 1.0
+        else:
+            self.gamma_ = float(self.gamma)
+
+        if self.features == "rff":
+            self._W = rng.normal(0.0, np.sqrt(2.0 * self.gamma_), size=(d, self.n_components)).astype(np.float32)
+            self._b = rng.uniform(0.0, 2 * np.pi, size=self.n_components).astype(np.float32)
+            self._z_scale = np.float32(np.sqrt(2.0 / self.n_components))
+        else:
+            idx = rng.choice(n, size=min(self.n_components, n), replace=False)
+            self._landmarks = np.asarray(X[idx], dtype=np.float32)
+            self._landmark_sq = (self._landmarks * self._landmarks).sum(1)
+            K = self._rbf(self._landmarks).astype(np.float64)
+            s, U = np.linalg.eigh(K)
+            s = np.maximum(s, 1e-12)
+            self._normalization = ((U / np.sqrt(s)) @ U.T).astype(np.float32)
+
+    def transform(self, X):
+        """Kernel features for one batch, (len(X), n_components) float32."""
+        X = np.asarray(X, dtype=np.float32)
+        if self.features == "rff":
+            Z = X @ self._W
+            Z += self._b
+            np.cos(Z, out=Z)
+            Z *= self._z_scale
+            return Z
+        return self._rbf(X) @ self._normalization
+
+    # ===================== Training / inference =====================
+    def fit(self, X, y):
+        X = np.asarray(X, dtype=np.float32).reshape(len(X), -1)
+        y = np.asarray(y).ravel()
+        rng = np.random.default_rng(self.random_state)
+        self._fit_features(X, rng)
+        self.classes_ = np.unique(y)
+        self.clf_ = SGDClassifier(loss=self.loss, alpha=self.alpha, random_state=self.random_state)
+        for _ in range(self.epochs):
+            order = rng.permutation(len(X))
+            for start in range(0, len(X), self.batch_size):
+                idx = order[start:start + self.batch_size]
+                self.clf_.partial_fit(self.transform(X[idx]), y[idx], classes=self.classes_)
+        return self
+
+    def _batched(self, method, X):
+        X = np.asarray(X, dtype=np.float32).reshape(len(X), -1)
+        out = [getattr(self.clf_, method)(self.transform(X[s:s + self.batch_size]))
+               for s in range(0, len(X), self.batch_size)]
+        return np.concatenate(out)
+
+    def decision_function(self, X):
+        return self._batched("decision_function", X)
+
+    def predict(self, X):
+        return self._batched("predict", X)
+
+    def predict_proba(self, X):
+        """Only for loss='log_loss' (or 'modified_huber')."""
+        return self._batched("predict_proba", X)
+
+    def score(self, X, y):
+        return float(np.mean(self.predict(X) == np.asarray(y).ravel()))
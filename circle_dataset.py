@@ -0,0 +1,112 @@
+# Vectorized synthetic-circle dataset for Jobsheet03 D1 (Python)
+# -----------------------------------------------------
+# Replaces `[make_sample() for _ in range(N)]` from
+# Jobsheet03_TEKNIK-REGRESI-GAMBAR.ipynb: instead of one cv2.circle call per
+# image, a whole batch is rendered at once with NumPy broadcasting
+# (squared distance of a shared pixel grid to every centre, compared with
+# every radius).
+# - same sampling as make_sample: r in [min_r, max_r], centre fully inside
+#   the image, white filled circle on black, float32 in [0, 1]
+# - optional augmentations: Gaussian blur (separable, whole batch) and
+#   additive Gaussian noise
+# - targets: any of r, cx, cy (single target -> (N,), several -> (N, k))
+# - batches(...) is an infinite Python generator, make_dataset(...) wraps
+#   it as a tf.data.Dataset, so training can use fresh samples every step
+#   without keeping a big array in memory
+#
+# Usage (notebook):
+#   from circle_dataset import make_batch, make_dataset
+#   X_val, y_val = make_batch(600, seed=42)
+#   train_ds = make_dataset(batch_size=64, seed=0)
+#   model.fit(train_ds, steps_per_epoch=40, validation_data=(X_val, y_val), epochs=12)
+#
+# © For educational use.
+
+import numpy as np
+
+TARGETS = ("r", "cx", "cy")
+_GRIDS = {}
+
+
+def _grid(img_size):
+    """Pixel coordinates (1, H, 1) and (1, 1, W), shared by all batches."""
+    if img_size not in _GRIDS:
+        coords = np.arange(img_size, dtype=np.float32)
+        _GRIDS[img_size] = (coords[None, :, None], coords[None, None, :])
+    return _GRIDS[img_size]
+
+
+def _gaussian_kernel(sigma):
+    radius = max(1, int(round(3 * sigma)))
+    x = np.arange(-radius, radius + 1, dtype=np.float32)
+    k = np.exp(-0.5 * (x / sigma) ** 2)
+    return k / k.sum()
+
+
+def blur_batch(imgs, sigma):
+    """Separable Gaussian blur of (N, H, W) images, border replicated."""
+    k = _gaussian_kernel(sigma)
+    pad = len(k) // 2
+    H, W = imgs.shape[1:]
+    p = np.pad(imgs, ((0, 0), (pad, pad), (0, 0)), mode="edge")
+    imgs = sum(w * p[:, i:i + H, :] for i, w in enumerate(k))
+    p = np.pad(imgs, ((0, 0), (0, 0), (pad, pad)), mode="edge")
+    return sum(w * p[:, :, i:i + W] for i, w in enumerate(k)).astype(np.float32)
+
+
+def make_batch(n, img_size=64, min_r=5, max_r=20, noise_std=0.0, blur_sigma=0.0,
+               targets=("r",), channels=3, rng=None, seed=None):
+    """
+    n circles -> (images (n, img_size, img_size, channels) float32, targets).
+    `noise_std` / `blur_sigma` of 0 disable the augmentations. Pass the same
+    `rng` (np.random.Generator) across calls for a reproducible stream.
+    """
+    if rng is None:
+        rng = np.random.default_rng(seed)
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        raise ValueError(f"Unknown target(s) {sorted(unknown)}; use {TARGETS}")
+
+    r = rng.integers(min_r, max_r + 1, size=n)              # radius acak
+    cx = rng.integers(r, img_size - r)                       # center-x, per-sample bounds
+    cy = rng.integers(r, img_size - r)                       # center-y
+
+    yy, xx = _grid(img_size)
+    rf, cxf, cyf = (v.astype(np.float32)[:, None, None] for v in (r, cx, cy))
+    imgs = ((xx - cxf) ** 2 + (yy - cyf) ** 2 <= rf ** 2).astype(np.float32)
+
+    if blur_sigma > 0:
+        imgs = blur_batch(imgs, blur_sigma)
+    if noise_std > 0:
+        imgs += rng.normal(0.0, noise_std, size=imgs.shape).astype(np.float32)
+        np.clip(imgs, 0.0, 1.0, out=imgs)
+
+    # 3-channel biar kompatibel CNN (broadcast view, no copy until needed)
+    imgs = np.broadcast_to(imgs[..., None], imgs.shape + (channels,))
+    values = {"r": r, "cx": cx, "cy": cy}
+    y = np.stack([values[t] for t in targets], axis=-1).astype(np.float32)
+    return np.ascontiguousarray(imgs), (y[:, 0] if len(targets) == 1 else y)
+
+
+def batches(batch_size=64, seed=None, **kwargs):
+    """Infinite generator of (images, targets) batches; kwargs as make_batch."""
+    rng = np.random.default_rng(seed)
+    while True:
+        yield make_batch(batch_size, rng=rng, **kwargs)
+
+
+def make_dataset(batch_size=64, seed=None, prefetch=2, **kwargs):
+    """Infinite tf.data.Dataset over batches(...), for model.fit(steps_per_epoch=...)."""
+    import tensorflow as tf   # only needed for this helper
+
+    img_size = kwargs.get("img_size", 64)
+    channels = kwargs.get("channels", 3)
+    n_targets = len(kwargs.get("targets", ("r",)))
+    y_shape = (None,) if n_targets == 1 else (None, n_targets)
+    signature = (
+        tf.TensorSpec((None, img_size, img_size, channels), tf.float32),
+        tf.TensorSpec(y_shape, tf.float32),
+    )
+    ds = tf.data.Dataset.from_generator(lambda: batches(batch_size, seed, **kwargs),
+                                        output_signature=signature)
+    return ds.prefetch(prefetch)
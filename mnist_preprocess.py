@@ -0,0 +1,212 @@
+# Batch MNIST-style preprocessing for the Tugas02 digit photos (Python)
+# -----------------------------------------------------
+# Same steps as `preprocess_to_mnist_28x28` in Tugas02_KLASIFIKASI-GAMBAR.ipynb
+# (contrast boost, invert light backgrounds, connected-components filtering,
+# crop, fit into 20x20, pad to 28x28), but for many files at once:
+# - images are preprocessed in a process pool (one file per task)
+# - results are cached as .npy files keyed by the SHA-256 of the image
+#   bytes, so re-running an evaluation only touches new or changed photos
+# - everything comes back as one (N, 28, 28, 1) float32 array in [0, 1],
+#   ready for a single batched model.predict(...) / clf.predict(...)
+#
+# Usage (notebook):
+#   from mnist_preprocess import preprocess_folder
+#   names, x = preprocess_folder("Data")
+#   probs = model.predict(x, verbose=0)                  # CNN
+#   preds = clf.predict(x.reshape(len(x), -1))           # SVM
+#
+# Usage (CLI):
+#   python mnist_preprocess.py Data [--workers 4] [--output batch.npy]
+#
+# © For educational use.
+
+import os, sys, hashlib, argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+from PIL import Image, ImageEnhance, ImageOps
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg")
+CACHE_DIR = os.environ.get("MNIST_CACHE_DIR", ".mnist_cache")
+CACHE_VERSION = "v1"    # bump when the preprocessing below changes
+MIN_POOL_FILES = 4      # fewer files than this are not worth starting a pool
+
+
+# ===================== Per-image preprocessing =====================
+def _select_component(arr):
+    """Bounding box (x, y, w, h) of the digit among the bright blobs."""
+    thr = max(arr.max() * 0.5, 50)  # threshold dinamis
+    binary = (arr > thr).astype(np.uint8) * 255
+    num_labels, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    if num_labels < 2:
+        return 0, 0, arr.shape[1], arr.shape[0]
+
+    H, W = arr.shape
+    margin = 10
+    best = None
+    for i in range(1, num_labels):  # skip background (label 0)
+        x, y, w, h, area = stats[i]
+        # Buang yang terlalu kecil atau terlalu besar (max 30% dari image)
+        if area < 50 or area > H * W * 0.3:
+            continue
+        # Digit biasanya tidak terlalu pipih/tinggi
+        if max(w, h) / min(w, h) > 5:
+            continue
+        # Buang area yang benar-benar menempel di pinggir image
+        near_edge = x < margin or y < margin or x + w > W - margin or y + h > H - margin
+        if near_edge and (x == 0 or y == 0 or x + w == W or y + h == H):
+            continue
+        if best is None or area > best[4]:
+            best = (x, y, w, h, area)
+
+    if best is None:
+        # Fallback: component terbesar (selain background)
+        best = stats[int(np.argmax(stats[1:, 4])) + 1]
+    x, y, w, h, _ = best
+    return int(x), int(y), int(w), int(h)
+
+
+def to_mnist_canvas(img_pil):
+    """PIL image -> 28x28 uint8 canvas, white digit on black (as MNIST)."""
+    img = img_pil.convert("L")
+    img = ImageEnhance.Contrast(img).enhance(2.0)
+    img = ImageOps.autocontrast(img)
+    arr = np.array(img).astype(np.uint8)
+
+    # Invert bila background terang
+    if np.median(arr) > 127:
+        img = ImageOps.invert(img)
+        arr = np.array(img)
+
+    x, y, w, h = _select_component(arr)
+    padding = 5
+    x0, y0 = max(0, x - padding), max(0, y - padding)
+    x1, y1 = min(arr.shape[1], x + w + padding), min(arr.shape[0], y + h + padding)
+    img = img.crop((x0, y0, x1, y1))
+
+    # Resize ke 20x20 (aspect ratio tetap), lalu pad ke 28x28
+    img.thumbnail((20, 20), Image.Resampling.LANCZOS)
+    w, h = img.size
+    canvas = Image.new("L", (28, 28), color=0)
+    canvas.paste(img, ((28 - w) // 2, (28 - h) // 2))
+    return np.array(canvas, dtype=np.uint8)
+
+
+def preprocess_to_mnist_28x28(img_pil):
+    """Drop-in for the notebook function: (disp PIL.Image, (28,28,1) float32 in [0,1])."""
+    canvas = to_mnist_canvas(img_pil)
+    return Image.fromarray(canvas), (canvas.astype(np.float32) / 255.0)[..., np.newaxis]
+
+
+def _preprocess_file(path):
+    with Image.open(path) as img:
+        return to_mnist_canvas(img)
+
+
+# ===================== Cache =====================
+def file_hash(path, chunk=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _cache_path(cache_dir, digest):
+    return os.path.join(cache_dir, f"{digest}_{CACHE_VERSION}.npy")
+
+
+def _load_cached(cache_dir, digest):
+    try:
+        canvas = np.load(_cache_path(cache_dir, digest))
+    except (OSError, ValueError):
+        return None
+    return canvas if canvas.shape == (28, 28) else None
+
+
+def _store_cached(cache_dir, digest, canvas):
+    path = _cache_path(cache_dir, digest)
+    tmp = f"{path}.{os.getpid()}.tmp.npy"
+    np.save(tmp, canvas)
+    os.replace(tmp, path)  # atomic: no half-written cache entries
+
+
+# ===================== Batch API =====================
+def preprocess_files(paths, workers=None, cache_dir=CACHE_DIR, verbose=False):
+    """
+    Preprocess image files into one (N, 28, 28, 1) float32 batch (same order
+    as `paths`). Cache hits skip preprocessing; misses run in `workers`
+    processes (default: CPU count, 0/1 = in this process). `cache_dir=None`
+    disables the cache.
+    """
+    paths = list(paths)
+    canvases = [None] * len(paths)
+    digests = [None] * len(paths)
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        for i, path in enumerate(paths):
+            digests[i] = file_hash(path)
+            canvases[i] = _load_cached(cache_dir, digests[i])
+
+    todo = [i for i, c in enumerate(canvases) if c is None]
+    if verbose:
+        print(f"[INFO] {len(paths)} image(s): {len(paths) - len(todo)} cached, {len(todo)} to preprocess")
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(todo))
+    if workers > 1 and len(todo) >= MIN_POOL_FILES:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, len(todo) // (workers * 4))
+            done = pool.map(_preprocess_file, [paths[i] for i in todo], chunksize=chunksize)
+            for i, canvas in zip(todo, done):
+                canvases[i] = canvas
+    else:
+        for i in todo:
+            canvases[i] = _preprocess_file(paths[i])
+
+    if cache_dir:
+        for i in todo:
+            _store_cached(cache_dir, digests[i], canvases[i])
+
+    batch = np.zeros((len(paths), 28, 28, 1), dtype=np.float32)
+    for i, canvas in enumerate(canvases):
+        batch[i, ..., 0] = canvas
+    batch /= 255.0
+    return batch
+
+
+def list_images(folder):
+    return sorted(n for n in os.listdir(folder) if n.lower().endswith(IMAGE_EXTS))
+
+
+def preprocess_folder(folder, workers=None, cache_dir=CACHE_DIR, verbose=False):
+    """(file names, (N, 28, 28, 1) batch) for every image in `folder`."""
+    names = list_images(folder)
+    batch = preprocess_files([os.path.join(folder, n) for n in names], workers, cache_dir, verbose)
+    return names, batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Preprocess a folder of digit photos to MNIST format")
+    parser.add_argument("folder")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--output", help="save the (N,28,28,1) batch as .npy")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.folder):
+        print(f"[ERROR] Folder not found: {args.folder}")
+        sys.exit(1)
+    names, batch = preprocess_folder(args.folder, args.workers, None if args.no_cache else args.cache_dir,
+                                     verbose=True)
+    print(f"[OK] Batch shape: {batch.shape}")
+    if args.output:
+        np.save(args.output, batch)
+        print(f"[OK] Saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
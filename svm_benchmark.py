@@ -0,0 +1,98 @@
+# Exact vs approximate-kernel SVM on MNIST (Python)
+# -----------------------------------------------------
+# Reports training time, prediction time and test accuracy for:
+#   - the notebook baseline: svm.SVC(kernel='rbf', gamma='scale') on the
+#     first --exact-subset training images (5000 in Jobsheet02/Tugas02;
+#     --probability adds probability=True as in Tugas02)
+#   - ApproxKernelSVM (approx_svm.py) with each --features map, trained on
+#     all training images (or --train-size)
+# Both see the same flattened [0, 1] pixels and the full 10k test set.
+#
+# Usage:
+#   python svm_benchmark.py [--features rff,nystroem] [--n-components 2000]
+#       [--exact-subset 5000] [--probability] [--output svm_bench.json]
+#
+# © For educational use.
+
+import sys, json, time, argparse
+import numpy as np
+from sklearn import svm
+
+from approx_svm import ApproxKernelSVM
+
+
+def load_mnist():
+    """(x_train, y_train), (x_test, y_test) flattened to float32 in [0, 1]."""
+    try:
+        from tensorflow.keras.datasets import mnist   # same source as the notebooks
+        (x_train, y_train), (x_test, y_test) = mnist.load_data()
+    except ImportError:
+        from sklearn.datasets import fetch_openml
+        X, y = fetch_openml("mnist_784", version=1, return_X_y=True, as_frame=False)
+        y = y.astype(np.int64)
+        (x_train, y_train), (x_test, y_test) = (X[:60000], y[:60000]), (X[60000:], y[60000:])
+    flat = lambda x: (np.asarray(x, dtype=np.float32).reshape(len(x), -1) / 255.0)
+    return (flat(x_train), np.asarray(y_train)), (flat(x_test), np.asarray(y_test))
+
+
+def run(name, clf, x_train, y_train, x_test, y_test):
+    print(f"[INFO] {name}: training on {len(x_train)} images...")
+    t0 = time.perf_counter()
+    clf.fit(x_train, y_train)
+    fit_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    y_pred = clf.predict(x_test)
+    predict_s = time.perf_counter() - t0
+    acc = float(np.mean(y_pred == y_test))
+    print(f"[OK] {name}: acc={acc:.4f} fit={fit_s:.1f}s predict={predict_s:.2f}s")
+    return {"train_size": len(x_train), "accuracy": acc, "fit_s": fit_s, "predict_s": predict_s}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exact SVC vs approximate-kernel SVM on MNIST")
+    parser.add_argument("--features", default="rff,nystroem", help="comma-separated: rff, nystroem")
+    parser.add_argument("--n-components", type=int, default=2000)
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--loss", default="hinge", help="hinge (linear SVM) or log_loss (probabilities)")
+    parser.add_argument("--train-size", type=int, default=0, help="approximate models (0 = all)")
+    parser.add_argument("--exact-subset", type=int, default=5000, help="exact SVC subset (0 = skip)")
+    parser.add_argument("--probability", action="store_true", help="exact SVC with probability=True")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    (x_train, y_train), (x_test, y_test) = load_mnist()
+    print(f"[INFO] MNIST: {len(x_train)} train / {len(x_test)} test")
+
+    results = {}
+    if args.exact_subset:
+        n = args.exact_subset
+        clf = svm.SVC(kernel="rbf", gamma="scale", probability=args.probability)
+        results[f"svc_rbf_{n}"] = run(f"SVC(rbf) on {n}", clf, x_train[:n], y_train[:n], x_test, y_test)
+
+    n = args.train_size or len(x_train)
+    for features in [f.strip() for f in args.features.split(",") if f.strip()]:
+        try:
+            clf = ApproxKernelSVM(features=features, n_components=args.n_components,
+                                  loss=args.loss, epochs=args.epochs)
+        except ValueError as exc:
+            print(f"[WARN] {exc}")
+            continue
+        results[f"{features}_{args.n_components}"] = run(
+            f"{features} x{args.n_components} + SGD({args.loss})", clf, x_train[:n], y_train[:n], x_test, y_test)
+
+    if not results:
+        print("[ERROR] Nothing to run")
+        sys.exit(1)
+
+    print(f"\n{'model':<20} {'train':>7} {'acc':>8} {'fit s':>8} {'pred s':>8}")
+    for name, r in results.items():
+        print(f"{name:<20} {r['train_size']:>7} {r['accuracy']:8.4f} {r['fit_s']:8.1f} {r['predict_s']:8.2f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"[OK] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()